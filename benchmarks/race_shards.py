@@ -0,0 +1,81 @@
+"""
+    Benchmark of the computation of team states with worker processes
+
+    A simulated race with synthetic teams is written in a temporary race file.
+    The race is started at half of its duration, then it moves forward a few seconds
+    before each read. Each version of the file is read in one process
+    with read_race_state and with a ShardedStateReader.
+
+    Usage : python benchmarks/race_shards.py config_path [--teams N] [--shards S] [--reads R] [--step SECONDS]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uctl2_back.race_feed import FileFeed
+from uctl2_back.race_shards import ShardedStateReader
+from uctl2_back.race_state import read_race_state
+from uctl2_back.simulate import create_simulator
+from uctl2_back.uctl2 import load_config
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compares the reading of the race file in one process and with workers')
+    parser.add_argument('config', help='path to the configuration file')
+    parser.add_argument('--teams', type=int, default=50000, help='number of synthetic teams')
+    parser.add_argument('--shards', type=int, default=4, help='number of worker processes')
+    parser.add_argument('--reads', type=int, default=10, help='number of reads')
+    parser.add_argument('--step', type=float, default=2, help='number of seconds of race between two reads')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+
+    with tempfile.TemporaryDirectory() as directory:
+        config.race_file = os.path.join(directory, 'race.csv')
+
+        sim = create_simulator(config, args.teams, seed=1)
+        simulation = sim.get_simulation(1)
+        simulation.tick(sim.race_duration / 2, True)
+
+        feed = FileFeed(config)
+        reader = ShardedStateReader(config, args.shards)
+        state = sharded_state = None
+        timings = []
+
+        try:
+            for i in range(args.reads + 1):
+                if i > 0:
+                    simulation.tick(args.step, False)
+
+                start = time.perf_counter()
+                state = read_race_state(feed.read_records(), config, args.step, state)
+                single = time.perf_counter() - start
+
+                start = time.perf_counter()
+                sharded_state = reader.read(args.step, sharded_state)
+                sharded = time.perf_counter() - start
+
+                changed = sum(1 for team_state in state.teams if team_state.current_stage.has_changed)
+
+                # The first read parses all lines
+                print('%s read : one process %.3fs, %d workers %.3fs (%d teams changed stage)' % (
+                    'first' if i == 0 else 'next', single, args.shards, sharded, changed))
+
+                if i > 0:
+                    timings.append((single, sharded))
+        finally:
+            reader.close()
+
+    single = sum(timing[0] for timing in timings) / len(timings)
+    sharded = sum(timing[1] for timing in timings) / len(timings)
+
+    print('%d teams, %d cpus : one process %.3fs per read, %d workers %.3fs per read (x%.1f)' % (
+        args.teams, os.cpu_count() or 1, single, args.shards, sharded, single / sharded))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from uctl2_back.async_manager import AsyncManager
+from uctl2_back.clock import VirtualClock
+from uctl2_back.config import Config
+from uctl2_back.control import SET_TICK_STEP
+from uctl2_back.stage import Stage
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config()
+    config.race_name = 'foo'
+    config.race_file = str(tmp_path / 'race.csv')
+    config.stages = [Stage(0, '', 0, 1000, True)]
+    config.teams = [
+        {'bibNumber': 1, 'name': 'foo', 'pace': 300},
+        {'bibNumber': 2, 'name': 'bar', 'pace': 200}
+    ]
+
+    return config
+
+
+@pytest.fixture
+def sio():
+    sio = MagicMock()
+    sio.emit = AsyncMock()
+
+    return sio
+
+
+def emitted_events(sio):
+    return [call[0][0] for call in sio.emit.call_args_list]
+
+
+def test_update_racefile(config, sio):
+    manager = AsyncManager(config, sio)
+
+    async def run():
+        await manager.update_racefile('sid', {'stages': [[[1], []]]})
+        await manager.update_racefile('sid', {'stages': [[[1, 2], [1]]]})
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    assert emitted_events(sio) == ['racefile', 'racefile_delta']
+    assert [record['Numéro'] for record in manager.feed.read_records()] == ['1', '2']
+    assert not manager.feed.read_records()[1]['21|1'] == '0'
+
+
+def test_toggle_sim_should_SendNewTickStep(config, sio):
+    manager = AsyncManager(config, sio, VirtualClock(start=0))
+
+    async def run():
+        await manager.toggle_sim('sid', {'tickStep': 10})
+        assert manager.sim.simulation_status == 1
+
+        await manager.toggle_sim('sid', {'tickStep': 10})
+        assert manager.sim.simulation_status == 0
+
+    asyncio.run(run())
+
+    assert config.tick_step == 10
+    assert manager.control.receive() == [(SET_TICK_STEP, 10)]
+    assert emitted_events(sio).count('sim_status_updated') == 2
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from uctl2_back.clock import Clock, Ticker, VirtualClock
+
+
+def test_clock_should_RaiseTypeError_when_MethodsAreMissing():
+    class PartialClock(Clock):
+        def time(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        PartialClock()
+
+
+def test_virtual_clock_should_AdvanceWhenAllParticipantsSleep():
+    clock = VirtualClock(start=0, participants=2)
+    wake_ups = []
+
+    async def participant(name, delay, count):
+        for i in range(count):
+            await clock.sleep(delay)
+            wake_ups.append((clock.time(), name))
+
+        clock.leave()
+
+    async def run():
+        await asyncio.gather(participant('a', 1, 4), participant('b', 2, 3))
+
+    asyncio.run(run())
+
+    assert [x[0] for x in wake_ups] == [1, 2, 2, 3, 4, 4, 6]
+    assert clock.time() == 6
+
+
+def test_virtual_clock_should_WaitForParticipantsThatAreNotSleeping():
+    clock = VirtualClock(start=0, participants=2)
+    wake_ups = []
+
+    async def sleeper():
+        await clock.sleep(10)
+        wake_ups.append(clock.time())
+
+    async def run():
+        task = asyncio.ensure_future(sleeper())
+        await asyncio.sleep(0.01)
+
+        # The second participant is still running
+        assert wake_ups == []
+        assert clock.time() == 0
+
+        clock.leave()
+        await task
+
+    asyncio.run(run())
+
+    assert wake_ups == [10]
+
+
+def test_virtual_clock_should_ForgetCancelledSleepers():
+    clock = VirtualClock(start=0, participants=2)
+
+    async def run():
+        task = asyncio.ensure_future(clock.sleep(5))
+        await asyncio.sleep(0)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        # Only one participant is sleeping, the time can not advance
+        sleeper = asyncio.ensure_future(clock.sleep(1))
+        await asyncio.sleep(0)
+        assert not sleeper.done()
+
+        clock.leave()
+        await sleeper
+
+    asyncio.run(run())
+
+    assert clock.time() == 1
+
+
+def test_ticker_should_KeepCadence():
+    clock = VirtualClock(start=0)
+    ticker = Ticker(clock, 2)
+
+    assert ticker.tick() == 0
+    clock.now = 0.5
+    assert ticker.delay() == 1.5
+
+    clock.now = 2
+    assert ticker.tick() == 2
+
+    # A tick that starts before it is due does not change the schedule
+    clock.now = 2.5
+    assert ticker.tick() == 0.5
+    assert ticker.delay() == 1.5
+    assert ticker.overruns == 0
+
+    clock.now = 5
+    assert ticker.remaining() == -1
+    assert ticker.overruns == 0
+
+    with pytest.raises(ValueError):
+        Ticker(clock, 0)
+
+
+def test_ticker_should_SkipMissedTicks():
+    clock = VirtualClock(start=0)
+    ticker = Ticker(clock, 2)
+    ticker.tick()
+
+    # The work lasts longer than the period
+    clock.now = 3
+    assert ticker.delay() == 0
+    assert ticker.tick() == 3
+    assert ticker.missed == 0
+
+    clock.now = 11
+    assert ticker.delay() == 0
+    assert ticker.tick() == 8
+
+    # Ticks due at 4, 6 and 8 are skipped, this tick replaces the one due at 10
+    assert ticker.missed == 3
+    assert ticker.skipped == 3
+    assert ticker.overruns == 2
+    assert ticker.delay() == 1
+
+
+
+def test_ticker_should_NotSkipTicks_when_Resynchronised():
+    clock = VirtualClock(start=0)
+    ticker = Ticker(clock, 0.25)
+    ticker.tick()
+
+    # The ticker has not been used for a while
+    clock.now = 6
+    ticker.resync()
+    assert ticker.tick() == 6
+    assert ticker.missed == 0
+    assert ticker.skipped == 0
+    assert ticker.delay() == 0.25
@@ -0,0 +1,35 @@
+from multiprocessing import Pipe
+
+from uctl2_back.config import Config
+from uctl2_back.control import SET_TICK_STEP, ControlChannel, ControlSender
+from uctl2_back.race import Race
+from uctl2_back.uctl2_race import apply_commands
+
+
+def test_control_channel():
+    receiver, sender = Pipe(duplex=False)
+    channel = ControlChannel(receiver)
+    control = ControlSender(sender)
+
+    assert channel.receive() == []
+
+    assert control.set_tick_step(5)
+    assert control.set_tick_step(10)
+    assert channel.receive() == [(SET_TICK_STEP, 5), (SET_TICK_STEP, 10)]
+
+    sender.close()
+    assert channel.receive() == []
+    assert channel.closed
+
+
+def test_apply_commands():
+    config = Config()
+    race = Race('foo', [], [], 1)
+
+    assert apply_commands([(SET_TICK_STEP, 10)], race, config)
+    assert race.tick_step == 10
+    assert config.tick_step == 10
+
+    # Invalid or unchanged speeds are ignored
+    assert not apply_commands([(SET_TICK_STEP, 10), (SET_TICK_STEP, 0)], race, config)
+    assert race.tick_step == 10
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import tracemalloc
+
+import pytest
+
+from uctl2_back.diagnostics import Diagnostics
+
+
+@pytest.fixture
+def stop_tracing():
+    yield
+    tracemalloc.stop()
+
+
+def test_profile_should_WriteStatistics(tmp_path):
+    async def run():
+        diagnostics = Diagnostics(asyncio.get_event_loop(), str(tmp_path), profile_duration=0.05)
+
+        assert diagnostics.start_profile()
+        assert not diagnostics.start_profile()
+
+        await asyncio.sleep(0.2)
+
+        assert diagnostics.stop_profile() is None
+
+    asyncio.run(run())
+
+    files = sorted(os.listdir(str(tmp_path)))
+    assert len(files) == 2
+    assert files[0].startswith('uctl2_profile_') and files[0].endswith('.prof')
+
+    with open(str(tmp_path / files[1]), 'r') as f:
+        assert 'cumulative' in f.read()
+
+
+def test_take_snapshot_should_CompareWithPreviousSnapshot(tmp_path, stop_tracing):
+    diagnostics = Diagnostics(asyncio.new_event_loop(), str(tmp_path))
+
+    try:
+        assert diagnostics.take_snapshot() is None
+
+        leak = [str(i) * 10 for i in range(10000)]
+        path = diagnostics.take_snapshot()
+
+        assert path is not None and os.path.basename(path).startswith('uctl2_memory_')
+        with open(path, 'r') as f:
+            assert f.readline().startswith('Traced memory')
+
+        assert len(leak) == 10000
+    finally:
+        diagnostics.loop.close()
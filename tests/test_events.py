@@ -4,7 +4,7 @@ from unittest.mock import MagicMock
 import jsonschema
 import pytest
 
-from uctl2_back.events import TEAM_END, create_team_end_race_event, create_team_end_stage_event, create_team_rank_event
+from uctl2_back.events import RACE_STATUS, TEAM_END, create_race_status_event, create_team_end_race_event, create_team_end_stage_event, create_team_rank_event
 from uctl2_back.events_schema import TEAM_OVERTAKE_SCHEMA, TEAM_RACE_END_SCHEMA, TEAM_STAGE_END_SCHEMA
 from uctl2_back.race import Race
 from uctl2_back.team import Team
@@ -63,3 +63,14 @@ def test_create_team_rank_event(default_team, default_race):
 
     event = create_team_rank_event(default_team, [])
     jsonschema.validate(instance=event, schema=TEAM_OVERTAKE_SCHEMA)
+
+
+def test_create_race_status_event(default_race):
+    default_race.name = 'foo'
+    default_race.start_time = 1587456000
+    default_race.tick_step = 5
+
+    event = create_race_status_event(default_race)
+
+    assert event['id'] == RACE_STATUS
+    assert event['payload'] == {'race': 'foo', 'status': default_race.status, 'startTime': 1587456000, 'tickStep': 5}
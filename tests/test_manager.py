@@ -0,0 +1,56 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from uctl2_back import manager
+from uctl2_back.config import Config
+from uctl2_back.simulator import Simulator
+from uctl2_back.stage import Stage
+
+
+@pytest.fixture
+def sim(tmp_path):
+    config = Config()
+    config.race_name = 'foo'
+    config.race_file = str(tmp_path / 'race.csv')
+    config.stages = [Stage(0, '', 0, 1000, True)]
+    config.teams = [
+        {'bibNumber': 1, 'name': 'foo', 'pace': 300},
+        {'bibNumber': 2, 'name': 'bar', 'pace': 200}
+    ]
+
+    sim = Simulator.create(config, MagicMock(), seed=1)
+    sim.compute_times()
+
+    return sim
+
+
+def test_race_file_updater_should_CoalescePendingRequests(monkeypatch, sim):
+    tasks = []
+    monkeypatch.setattr(manager.socketio, 'start_background_task', lambda target: tasks.append(target))
+
+    on_file_updated = MagicMock()
+    updater = manager.RaceFileUpdater(sim, on_file_updated)
+
+    updater.submit([([1], [])])
+    updater.submit([([2], [])])
+
+    stages = [({1, 2}, set())]
+    updater.submit(stages)
+
+    # The stages are copied on submit
+    stages[0][0].clear()
+
+    assert len(tasks) == 1
+    assert updater.coalesced == 2
+
+    tasks[0]()
+
+    on_file_updated.assert_called_once()
+    rows = on_file_updated.call_args[0][0]
+    assert all(not row['21|1'] == '0' for row in rows)
+
+    # A new task is started once the previous one has finished
+    updater.submit(stages)
+    assert len(tasks) == 2
+
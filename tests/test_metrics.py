@@ -0,0 +1,66 @@
+import json
+import logging
+
+import pytest
+
+from uctl2_back.metrics import Metrics, RollingHistogram
+
+
+def test_percentiles():
+    histogram = RollingHistogram()
+
+    assert histogram.percentiles([50, 99]) == [0, 0]
+
+    for value in range(1, 101):
+        histogram.add(value)
+
+    assert histogram.percentiles([50, 95, 99, 100]) == [50, 95, 99, 100]
+
+    summary = histogram.summary()
+    assert summary['count'] == 100
+    assert summary['sum'] == 5050
+    assert summary['max'] == 100
+    assert summary['p95'] == 95
+
+
+def test_histogram_should_KeepLastValues():
+    histogram = RollingHistogram(size=10)
+
+    for value in range(100):
+        histogram.add(value)
+
+    assert histogram.count == 100
+    assert histogram.percentiles([50]) == [94]
+
+
+def test_snapshot():
+    metrics = Metrics()
+
+    with metrics.timer('read'):
+        pass
+
+    with pytest.raises(ValueError):
+        with metrics.timer('read'):
+            raise ValueError()
+
+    metrics.increment('rows_parsed', 10)
+    metrics.increment('rows_parsed')
+    metrics.set_gauge('clients', 3)
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot['timings']['read']['count'] == 2
+    assert snapshot['counters'] == {'rows_parsed': 11}
+    assert snapshot['gauges'] == {'clients': 3}
+
+
+def test_log(caplog):
+    metrics = Metrics()
+    metrics.increment('events_emitted')
+
+    with caplog.at_level(logging.INFO):
+        metrics.log(logging.getLogger(__name__))
+
+    message = caplog.records[0].getMessage()
+    assert message.startswith('metrics ')
+    assert json.loads(message[len('metrics '):])['counters'] == {'events_emitted': 1}
@@ -0,0 +1,74 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from uctl2_back.metrics_server import METRICS_PATH, create_metrics_handler, format_labels, render_metrics
+from uctl2_back.notifier import Notifier
+
+
+def test_format_labels():
+    assert format_labels({}) == ''
+    assert format_labels({'race': 'solo', 'phase': 'read'}) == '{race="solo",phase="read"}'
+    assert format_labels({'race': 'a"b\\c'}) == '{race="a\\"b\\\\c"}'
+
+
+def create_notifier():
+    notifier = Notifier(MagicMock())
+
+    for duration in (0.1, 0.2, 0.3):
+        notifier.metrics.add_time('read', duration)
+
+    notifier.metrics.add_time('send_lag', 0.01)
+    notifier.metrics.increment('events_emitted', 4)
+    notifier.metrics.set_gauge('last_update', 100)
+
+    client = MagicMock()
+    client.remote_address = ('127.0.0.1', 4242)
+    notifier.clients.add(client)
+    notifier.client_lags[client] = 0.5
+
+    return notifier
+
+
+def test_render_metrics():
+    async def run():
+        notifier = create_notifier()
+        await notifier.broadcast_event(1, {})
+
+        return render_metrics({'solo': notifier, 'relay': Notifier(MagicMock())}, now=130)
+
+    lines = asyncio.run(run()).splitlines()
+
+    assert '# TYPE uctl2_loop_phase_seconds summary' in lines
+    assert 'uctl2_loop_phase_seconds{race="solo",phase="read",quantile="0.5"} 0.2' in lines
+    assert 'uctl2_loop_phase_seconds_count{race="solo",phase="read"} 3.0' in lines
+    assert 'uctl2_send_lag_seconds{race="solo",quantile="0.99"} 0.01' in lines
+    assert 'uctl2_events_emitted_total{race="solo"} 4.0' in lines
+    assert 'uctl2_clients{race="solo"} 1.0' in lines
+    assert 'uctl2_clients{race="relay"} 0.0' in lines
+    assert 'uctl2_event_queue_depth{race="solo"} 1.0' in lines
+    assert 'uctl2_race_file_age_seconds{race="solo"} 30.0' in lines
+    assert 'uctl2_client_send_lag_seconds{race="solo",client="127.0.0.1:4242"} 0.5' in lines
+
+    # Each family is described once, before its samples
+    assert lines.count('# TYPE uctl2_clients gauge') == 1
+    assert lines.index('# TYPE uctl2_clients gauge') < lines.index('uctl2_clients{race="solo"} 1.0')
+
+
+def test_metrics_handler():
+    async def run():
+        app = web.Application()
+        app.router.add_get(METRICS_PATH, create_metrics_handler({'solo': create_notifier()}))
+
+        async with TestClient(TestServer(app)) as client:
+            response = await client.get(METRICS_PATH)
+
+            return response.status, response.content_type, await response.text()
+
+    status, content_type, text = asyncio.run(run())
+
+    assert status == 200
+    assert content_type == 'text/plain'
+    assert 'uctl2_clients{race="solo"} 1.0' in text
@@ -0,0 +1,9 @@
+from uctl2_back.notifier import read_level
+
+
+def test_read_level():
+    assert read_level('/') == 0
+    assert read_level('/?lod=2') == 2
+    assert read_level('/?foo=bar&lod=3') == 3
+    assert read_level('/?lod=-1') == 0
+    assert read_level('/?lod=foo') == 0
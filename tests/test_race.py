@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import pytest
+
+from uctl2_back.race import Race, compute_location_table
+from uctl2_back.stage import Stage
+
+
+@pytest.fixture
+def racepoints():
+    return [
+        [
+            (46.667297, 0.057259, 0, 0),
+            (46.671451, 0.114163, 0, 50),
+            (46.689983, 0.145508, 0, 80)
+        ],
+        [
+            (46.688430, 0.148405, 0, 100),
+            (46.702982, 0.174257, 0, 160)
+        ]
+    ]
+
+
+@pytest.fixture
+def stages():
+    return [
+        Stage(0, '', 0, 100, True),
+        Stage(1, '', 100, 100, False)
+    ]
+
+
+def test_constructor_should_RaiseValueError_when_StagesAndRacepointsDoNotMatch(racepoints, stages):
+    with pytest.raises(ValueError):
+        Race('', racepoints[:1], stages, 1)
+
+
+def test_get_racepoints(racepoints, stages):
+    simplified = [[racepoints[0][0], racepoints[0][2]], racepoints[1]]
+    race = Race('', [np.array(x) for x in racepoints], stages, 1, [None, simplified])
+
+    assert race.get_racepoints(0) == [[list(x) for x in stagepoints] for stagepoints in racepoints]
+    assert race.get_racepoints(1) == [[list(x) for x in stagepoints] for stagepoints in simplified]
+
+    # Unknown levels use the closest one
+    assert race.get_racepoints(5) == race.get_racepoints(1)
+    assert race.get_racepoints(-1) == race.get_racepoints(0)
+
+
+def test_serialize(racepoints, stages):
+    race = Race('', racepoints, stages, 1)
+
+    serialized = race.serialize()
+    json.dumps(serialized)
+
+    assert serialized['racePoints'] == race.get_racepoints(0)
+
+
+def test_compute_location_table():
+    racepoints = np.array([
+        (46.0, 0.0, 0, 0),
+        (46.1, 0.2, 0, 10),
+        (46.1, 0.2, 0, 10),
+        (46.2, 0.2, 0, 12)
+    ])
+
+    result = compute_location_table(racepoints, 5)
+
+    assert result.shape == (4, 2)
+    assert np.allclose(result, [[46.0, 0.0], [46.05, 0.1], [46.1, 0.2], [46.2, 0.2]])
+
+    assert compute_location_table(np.empty((0, 4))).shape == (0, 2)
+
+
+def test_get_location(racepoints, stages):
+    race = Race('', racepoints, stages, 1)
+
+    assert race.get_location(0) == (46.667297, 0.057259)
+    assert race.get_location(-10) == (46.667297, 0.057259)
+    assert race.get_location(160) == pytest.approx((46.702982, 0.174257))
+    assert race.get_location(1000) == pytest.approx((46.702982, 0.174257))
+
+    assert Race('', [], [], 1).get_location(10) == (0, 0)
@@ -0,0 +1,89 @@
+import asyncio
+from multiprocessing import Pipe
+
+import pytest
+
+from uctl2_back.clock import WallClock
+from uctl2_back.config import Config
+from uctl2_back.race_feed import FileFeed, PipeFeed, PipeFeedSender, RaceFeed
+
+
+@pytest.fixture
+def rows():
+    return [
+        {'Numéro': 2, 'Nom': 'foo', 'Distance': 1.5},
+        {'Numéro': 1, 'Nom': 'bar', 'Distance': 1.5}
+    ]
+
+
+def test_race_feed_should_RaiseTypeError_when_ReadRecordsIsMissing():
+    class EmptyFeed(RaceFeed):
+        pass
+
+    with pytest.raises(TypeError):
+        EmptyFeed()
+
+
+def test_file_feed(tmp_path):
+    config = Config()
+    config.race_file = str(tmp_path / 'race.csv')
+
+    with open(config.race_file, 'w') as f:
+        f.write('Numéro\tNom\n1\tfoo\n2\tbar\n')
+
+    records = FileFeed(config).read_records()
+
+    assert records == [{'Numéro': '1', 'Nom': 'foo'}, {'Numéro': '2', 'Nom': 'bar'}]
+
+
+def test_pipe_feed(rows):
+    receiver, sender = Pipe(duplex=False)
+    feed = PipeFeed(receiver)
+    feed_sender = PipeFeedSender(sender)
+
+    assert feed.read_records() == []
+
+    # The first message is a snapshot, even if some bibs are given
+    feed_sender.send(rows, [1])
+    assert feed.read_records() == [
+        {'Numéro': '2', 'Nom': 'foo', 'Distance': '1.5'},
+        {'Numéro': '1', 'Nom': 'bar', 'Distance': '1.5'}
+    ]
+
+    rows[0]['Nom'] = 'baz'
+    rows[1]['Nom'] = 'qux'
+    feed_sender.send(rows, [1])
+
+    # Only the row of the team 1 has been sent, the order of teams is kept
+    assert [record['Nom'] for record in feed.read_records()] == ['foo', 'qux']
+
+    feed_sender.send(rows)
+    assert [record['Nom'] for record in feed.read_records()] == ['baz', 'qux']
+
+
+def test_pipe_feed_should_RaiseIOError_when_SenderIsClosed():
+    receiver, sender = Pipe(duplex=False)
+    feed = PipeFeed(receiver)
+
+    sender.close()
+
+    with pytest.raises(IOError):
+        feed.read_records()
+
+
+def test_pipe_feed_wait_should_Return_when_RecordsAreReceived(rows):
+    receiver, sender = Pipe(duplex=False)
+    feed = PipeFeed(receiver)
+    feed_sender = PipeFeedSender(sender)
+
+    async def run():
+        loop = asyncio.get_event_loop()
+        loop.call_later(0.05, feed_sender.send, rows)
+
+        start = loop.time()
+        await feed.wait(WallClock(), 10)
+
+        return loop.time() - start
+
+    assert asyncio.run(run()) < 5
+    assert len(feed.read_records()) == 2
@@ -1,6 +1,10 @@
+import csv
+import os
+import stat
+
 import pytest
 import sys
-from uctl2_back.race_file import EMPTY_VALUE_FORMAT, STAGE_START_FORMAT, read_time, read_stage_start_times
+from uctl2_back.race_file import EMPTY_VALUE_FORMAT, STAGE_START_FORMAT, RaceFileWriter, RacefileDeltas, read_time, read_stage_start_times, stage_columns
 
 
 def test_read_time():
@@ -31,3 +35,118 @@ def test_read_stage_start_times():
 
     result = read_stage_start_times(record)
     assert len(result) == 1
+
+
+@pytest.fixture
+def racefile_teams():
+    return [{'bibNumber': 1}, {'bibNumber': 2}]
+
+
+@pytest.fixture
+def racefile_rows():
+    rows = {}
+
+    for bib in (1, 2):
+        rows[bib] = {'Numéro': bib, 'Nom': 'team %d' % (bib,)}
+        rows[bib].update((column, 'S%d' % (bib,)) for column in stage_columns(1))
+
+    return rows
+
+
+def read_racefile(path):
+    with open(path, 'r', newline='') as f:
+        return list(csv.DictReader(f, delimiter='\t'))
+
+
+def test_race_file_writer(tmp_path, racefile_teams, racefile_rows):
+    path = str(tmp_path / 'race.csv')
+    headers = ['Numéro', 'Nom'] + stage_columns(1)
+    writer = RaceFileWriter(path, headers)
+
+    rows = writer.write(racefile_teams, racefile_rows, [([1, 2], [1])])
+
+    assert writer.changed_bibs == [1, 2]
+    assert rows[0] == racefile_rows[1]
+    assert rows[1]['21|1'] == 'S2'
+    assert rows[1]['31|1'] == EMPTY_VALUE_FORMAT
+
+    records = read_racefile(path)
+    assert [record['Numéro'] for record in records] == ['1', '2']
+    assert records[1]['21|1'] == 'S2'
+    assert records[1]['31|1'] == EMPTY_VALUE_FORMAT
+
+    # The temporary file has replaced the race file
+    assert [x.name for x in tmp_path.iterdir()] == ['race.csv']
+
+
+def test_race_file_writer_should_NotShareTemporaryFile(tmp_path, racefile_teams, racefile_rows):
+    path = str(tmp_path / 'race.csv')
+    headers = ['Numéro', 'Nom'] + stage_columns(1)
+
+    # Temporary file of another writer
+    (tmp_path / 'race.csv.tmp').write_text('foo')
+
+    RaceFileWriter(path, headers).write(racefile_teams, racefile_rows, [([1, 2], [1])])
+
+    assert (tmp_path / 'race.csv.tmp').read_text() == 'foo'
+    assert sorted(x.name for x in tmp_path.iterdir()) == ['race.csv', 'race.csv.tmp']
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='permissions are not supported')
+def test_race_file_writer_should_KeepPermissions(tmp_path, racefile_teams, racefile_rows):
+    path = tmp_path / 'race.csv'
+    writer = RaceFileWriter(str(path), ['Numéro', 'Nom'] + stage_columns(1))
+    umask = os.umask(0o077)
+
+    try:
+        writer.write(racefile_teams, racefile_rows, [([1, 2], [1])])
+    finally:
+        os.umask(umask)
+
+    # A new race file follows the umask
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+
+    path.chmod(0o640)
+    writer.write(racefile_teams, racefile_rows, [([1, 2], [1, 2])])
+
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+
+
+def test_race_file_writer_should_EncodeChangedRowsOnly(tmp_path, racefile_teams, racefile_rows):
+    path = str(tmp_path / 'race.csv')
+    writer = RaceFileWriter(path, ['Numéro', 'Nom'] + stage_columns(1))
+
+    writer.write(racefile_teams, racefile_rows, [([], [])])
+    writer.write(racefile_teams, racefile_rows, [([2], [])])
+    assert writer.changed_bibs == [2]
+
+    records = read_racefile(path)
+    assert records[0]['21|1'] == EMPTY_VALUE_FORMAT
+    assert records[1]['21|1'] == 'S2'
+
+    writer.write(racefile_teams, racefile_rows, [([2], [])])
+    assert writer.changed_bibs == []
+
+    writer.invalidate()
+    writer.write(racefile_teams, racefile_rows, [([2], [])])
+    assert writer.changed_bibs == [1, 2]
+
+
+def test_racefile_deltas():
+    deltas = RacefileDeltas()
+    rows = [{'Numéro': 1, 'Nom': 'foo', '21|1': '0'}, {'Numéro': 2, 'Nom': 'bar', '21|1': '0'}]
+
+    # The first rows must be sent entirely
+    assert deltas.update(rows) is None
+    assert deltas.snapshot() == {'version': 1, 'rows': rows}
+
+    new_rows = [rows[0], dict(rows[1], **{'21|1': '10:00:00'})]
+    assert deltas.update(new_rows) == {2: {'21|1': '10:00:00'}}
+    assert deltas.version == 2
+
+    # Nothing has changed, the version is kept
+    assert deltas.update(list(new_rows)) == {}
+    assert deltas.version == 2
+
+    assert deltas.update(new_rows[:1]) is None
+    assert deltas.version == 3
@@ -0,0 +1,119 @@
+import asyncio
+import csv
+
+import pytest
+
+from uctl2_back.clock import VirtualClock
+from uctl2_back.config import Config
+from uctl2_back.race_feed import encode_records
+from uctl2_back.race_file import EMPTY_VALUE_FORMAT, stage_columns
+from uctl2_back.race_shards import ShardedStateReader, get_shard_bounds, read_lines
+from uctl2_back.race_state import read_race_state
+from uctl2_back.simulate import create_simulator
+from uctl2_back.stage import Stage
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config()
+    config.race_name = 'foo'
+    config.race_file = str(tmp_path / 'race.csv')
+    config.stages = [
+        Stage(0, '', 0, 1000, True),
+        Stage(1, '', 1000, 500, False),
+        Stage(2, '', 1500, 2000, True)
+    ]
+    config.tick_step = 200
+
+    return config
+
+
+def test_get_shard_bounds():
+    assert get_shard_bounds(10, 3) == [(0, 3), (3, 6), (6, 10)]
+    assert get_shard_bounds(2, 3) == [(0, 0), (0, 1), (1, 2)]
+
+
+def test_read_lines(tmp_path):
+    path = tmp_path / 'lines.txt'
+    path.write_bytes(b'aa\nbbb\ncc\n')
+
+    with open(str(path), 'rb') as f:
+        assert read_lines(f, 0, 3) == b'aa\n'
+        assert read_lines(f, 1, 4) == b'bbb\n'
+        assert read_lines(f, 3, 7) == b'bbb\n'
+        assert read_lines(f, 4, 7) == b''
+        assert read_lines(f, 7, 10) == b'cc\n'
+        assert [read_lines(f, start, end) for start, end in get_shard_bounds(10, 3)] == [b'aa\n', b'bbb\n', b'cc\n']
+
+
+def assert_same_states(sharded_state, state):
+    assert sharded_state.status.get_value() == state.status.get_value()
+    assert sharded_state.stages_number == state.stages_number
+    assert len(sharded_state.teams) == len(state.teams)
+
+    for team_state, sharded_team_state in zip(state.teams, sharded_state.teams):
+        assert sharded_team_state.bib_number == team_state.bib_number
+        assert sharded_team_state.current_stage.get_value() == team_state.current_stage.get_value()
+        assert sharded_team_state.current_stage.has_changed == team_state.current_stage.has_changed
+        assert sharded_team_state.team_finished.has_changed == team_state.team_finished.has_changed
+        assert sharded_team_state.intermediate_times == team_state.intermediate_times
+        assert sharded_team_state.covered_distance == pytest.approx(team_state.covered_distance)
+
+
+def test_read_should_GiveSameStatesThanReadRaceState(config):
+    sim = create_simulator(config, teams=20, seed=1)
+    reader = ShardedStateReader(config, 3)
+    reads = 0
+    state = sharded_state = None
+
+    def on_file_updated(rows):
+        nonlocal reads, state, sharded_state
+
+        state = read_race_state(encode_records(rows), config, 1, state)
+        sharded_state = reader.read(1, sharded_state)
+        reads += 1
+
+        assert_same_states(sharded_state, state)
+
+    try:
+        simulation = sim.get_simulation(config.tick_step)
+        asyncio.run(simulation.run_async(VirtualClock(), on_file_updated=on_file_updated))
+    finally:
+        reader.close()
+
+    assert reads > 2
+    assert len(sharded_state.teams) == 20
+
+
+def test_read_should_KeepModifiedDistances_when_FileHasInvalidLines(config):
+    headers = ['Numéro', 'Nom', 'Distance'] + stage_columns(1)
+    started = {'21|1': '10:00:00', '31|1': EMPTY_VALUE_FORMAT, 'Interm (S1)': EMPTY_VALUE_FORMAT, 'Clt Interm-1 (S1)': EMPTY_VALUE_FORMAT}
+    rows = [dict(started, **{'Numéro': bib, 'Nom': 'Team %s' % (bib,), 'Distance': 3.5}) for bib in ['foo', 1, 2, 3]]
+
+    def write_rows():
+        with open(config.race_file, 'w', encoding=config.encoding, newline='') as f:
+            writer = csv.DictWriter(f, headers, delimiter='\t')
+            writer.writeheader()
+            writer.writerows(rows)
+
+    write_rows()
+    reader = ShardedStateReader(config, 2)
+
+    try:
+        state = reader.read(1, None)
+        assert [team_state.bib_number for team_state in state.teams] == [1, 2, 3]
+
+        # Distances corrected by the broadcaster (gps positions, extrapolations)
+        for team_state in state.teams:
+            team_state.covered_distance = 100 * team_state.bib_number
+
+        # The line of the team 3 has changed
+        rows[3]['Nom'] = 'bar'
+        write_rows()
+
+        state = reader.read(0, state)
+        assert [team_state.covered_distance for team_state in state.teams] == [100, 200, 300]
+        assert [team_state.current_stage.has_changed for team_state in state.teams] == [False, False, False]
+        assert state.teams[2].name == 'bar'
+    finally:
+        reader.close()
@@ -0,0 +1,69 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from uctl2_back.config import Config
+from uctl2_back.registry import RaceRegistry, read_race_id
+
+
+@pytest.fixture
+def config():
+    return Config()
+
+
+def test_read_race_id():
+    assert read_race_id('/') == ''
+    assert read_race_id('/?lod=2') == ''
+    assert read_race_id('/relay') == 'relay'
+    assert read_race_id('/relay/?lod=1') == 'relay'
+
+
+def test_get_should_FindRaceFromPath(config):
+    async def run():
+        registry = RaceRegistry()
+        solo = registry.add('solo', config, MagicMock())
+        relay = registry.add('relay', config, MagicMock())
+
+        assert registry.get('/relay?lod=2') is relay
+        assert registry.get('/solo') is solo
+        assert registry.get('/') is solo
+        assert registry.get('/kids') is None
+
+        with pytest.raises(ValueError):
+            registry.add('solo', config, MagicMock())
+
+    asyncio.run(run())
+
+
+def test_get_should_GiveOnlyRace_when_RegistryHasOneRace(config):
+    async def run():
+        registry = RaceRegistry()
+        race = registry.add('', config, MagicMock())
+
+        assert registry.get('/') is race
+        assert registry.get('/?lod=2') is race
+        assert registry.get('/kids') is race
+
+    asyncio.run(run())
+
+
+def test_stop_should_StopOnlyGivenRace(config):
+    async def run():
+        registry = RaceRegistry()
+        solo = registry.add('solo', config, MagicMock())
+        relay = registry.add('relay', config, MagicMock())
+
+        registry.stop('relay')
+        assert not solo.stop.is_set()
+        assert relay.stop.is_set()
+
+        registry.stop()
+        assert solo.stop.is_set()
+
+        # Stopped races end their broadcast and their notifier
+        await asyncio.wait_for(registry.run(None), 1)
+        assert solo.notifier.stop.done()
+        assert relay.notifier.stop.done()
+
+    asyncio.run(run())
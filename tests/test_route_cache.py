@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from uctl2_back.route_cache import compute_route_key, get_cache_path, read_route_cache, write_route_cache
+from uctl2_back.stage import Stage
+
+
+@pytest.fixture
+def stages():
+    return [
+        Stage(0, '', 0, 2000, True),
+        Stage(1, '', 2000, 500, False)
+    ]
+
+
+@pytest.fixture
+def route():
+    return {
+        'points': np.array([(48.531333, -1.409535, 4), (48.457520, -1.557404, 0), (48.430432, -1.674234, 1)]),
+        'distances': np.array([0, 800.5, 2000.25]),
+        'stage_bounds': np.array([[0, 2], [1, 3]], dtype=np.int64),
+        'empty': np.empty((0, 4))
+    }
+
+
+def test_compute_route_key(tmp_path, stages):
+    route_file = tmp_path / 'route.gpx'
+    route_file.write_bytes(b'<gpx></gpx>')
+
+    key = compute_route_key(str(route_file), stages)
+    assert key == compute_route_key(str(route_file), stages)
+
+    # The key depends on the stages layout
+    assert not key == compute_route_key(str(route_file), stages[:1])
+
+    # The key depends on the content of the route file
+    route_file.write_bytes(b'<gpx> </gpx>')
+    assert not key == compute_route_key(str(route_file), stages)
+
+
+def test_get_cache_path():
+    assert get_cache_path('samples/uctl2.gpx') == 'samples/uctl2.routecache'
+
+
+def test_read_route_cache(tmp_path, route):
+    path = str(tmp_path / 'route.routecache')
+
+    write_route_cache(path, 'foo', route)
+    result = read_route_cache(path, 'foo')
+
+    assert result is not None
+    assert set(result) == set(route)
+
+    for name, array in route.items():
+        assert result[name].dtype == array.dtype
+        assert np.array_equal(result[name], array)
+
+    # Arrays are read-only views on the file
+    assert not result['distances'].flags.writeable
+
+
+def test_read_route_cache_should_ReturnNone_when_KeyDoesNotMatch(tmp_path, route):
+    path = str(tmp_path / 'route.routecache')
+
+    write_route_cache(path, 'foo', route)
+
+    assert read_route_cache(path, 'bar') is None
+
+
+def test_read_route_cache_should_ReturnNone_when_FileIsNotValid(tmp_path):
+    path = tmp_path / 'route.routecache'
+
+    assert read_route_cache(str(path), 'foo') is None
+
+    path.write_bytes(b'')
+    assert read_route_cache(str(path), 'foo') is None
+
+    path.write_bytes(b'not a cache file')
+    assert read_route_cache(str(path), 'foo') is None
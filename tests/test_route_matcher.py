@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from uctl2_back.route_matcher import RouteMatcher
+from uctl2_back.uctl2_setup import compute_distances_array
+
+
+def make_racepoints(points):
+    points = np.array([(lat, lon, 0) for lat, lon in points])
+    return np.column_stack((points, compute_distances_array(points)))
+
+
+@pytest.fixture
+def straight_route():
+    # ~1.1km to the north, one point every ~11m
+    return make_racepoints([(48.0 + i * 0.0001, -1.0) for i in range(101)])
+
+
+@pytest.fixture
+def loop_route():
+    # ~1.1km to the north and back on the same road
+    going = [(48.0 + i * 0.0001, -1.0) for i in range(101)]
+    return make_racepoints(going + going[-2::-1])
+
+
+def test_constructor_should_RaiseValueError_when_GivenNegativeCellSize(straight_route):
+    with pytest.raises(ValueError):
+        RouteMatcher(straight_route, cell_size=0)
+
+
+def test_match(straight_route):
+    matcher = RouteMatcher(straight_route)
+
+    # On a racepoint
+    assert matcher.match(48.005, -1.0) == pytest.approx(straight_route[50, 3])
+
+    # Between two racepoints, ~20m to the east of the route
+    offset = matcher.match(48.00505, -0.99973)
+    assert offset == pytest.approx((straight_route[50, 3] + straight_route[51, 3]) / 2, abs=0.5)
+
+    # Before the start of the route
+    assert matcher.match(47.9999, -1.0) == 0
+
+
+def test_match_should_ReturnNone_when_PositionIsFarFromRoute(straight_route):
+    matcher = RouteMatcher(straight_route)
+
+    assert matcher.match(48.005, -0.99) is None
+    assert matcher.match(0, 0) is None
+
+
+def test_match_should_StayNearPreviousOffset(loop_route):
+    matcher = RouteMatcher(loop_route)
+    total = loop_route[-1, 3]
+
+    middle = loop_route[50, 3]
+    assert matcher.match(48.005, -1.0) == pytest.approx(middle)
+
+    # The same place on the way back
+    assert matcher.match(48.005, -1.0, total - middle - 20) == pytest.approx(total - middle)
+
+    # Too far from the previous offset, the whole route is considered
+    assert matcher.match(48.005, -1.0, total) == pytest.approx(middle)
+
+
+def test_match_when_GivenEmptyRoute():
+    assert RouteMatcher(np.empty((0, 4))).match(48.0, -1.0) is None
+    assert RouteMatcher(make_racepoints([(48.0, -1.0)])).match(48.0, -1.0) is None
@@ -0,0 +1,80 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from uctl2_back import shared_route
+from uctl2_back.route_cache import MAGIC, build_header
+from uctl2_back.shared_route import attach_route, get_block_name, release_shared_routes, share_route
+
+pytestmark = pytest.mark.skipif(shared_route.shared_memory is None, reason='shared memory is not available')
+
+
+@pytest.fixture
+def route():
+    return {
+        'distances': np.array([0, 800.5, 2000.25]),
+        'stage_bounds': np.array([[0, 2], [1, 3]], dtype=np.int64)
+    }
+
+
+@pytest.fixture
+def key(request):
+    yield 'test%08x' % (abs(hash(request.node.name)),)
+    release_shared_routes()
+
+
+def read_distances(key, queue):
+    route = attach_route(key)
+    queue.put(None if route is None else route['distances'].tolist())
+
+
+def test_share_route(key, route):
+    assert attach_route(key) is None
+
+    result = share_route(key, route)
+
+    assert result is not None
+    for name, array in route.items():
+        assert np.array_equal(result[name], array)
+
+    # Another process attaches the block
+    queue = multiprocessing.get_context('spawn').Queue()
+    process = multiprocessing.get_context('spawn').Process(target=read_distances, args=(key, queue))
+    process.start()
+    process.join()
+
+    assert queue.get() == [0, 800.5, 2000.25]
+
+    # The block still exists after the exit of the other process
+    assert attach_route(key) is not None
+
+
+def test_share_route_should_AttachBlock_when_ItAlreadyExists(key, route):
+    share_route(key, route)
+    other = dict(route, distances=np.zeros(3))
+
+    assert np.array_equal(share_route(key, other)['distances'], route['distances'])
+    assert attach_route('bar') is None
+
+
+def test_attach_route_should_GiveNone_when_HeaderIsIncomplete(key, route):
+    # Another process is sharing the route
+    header, offsets, size = build_header(key, route)
+    block = shared_route.SharedBlock(get_block_name(key), create=True, size=size)
+    shared_route._created_blocks.append(block)
+    shared_route._attached_blocks[block.name] = block
+
+    for offset, array in zip(offsets, route.values()):
+        block.buf[offset:offset + array.nbytes] = array.tobytes()
+
+    assert attach_route(key) is None
+
+    block.buf[len(MAGIC):len(header)] = header[len(MAGIC):]
+    assert attach_route(key) is None
+
+    # The caller keeps the route it has built
+    assert share_route(key, route) is None
+
+    block.buf[:len(MAGIC)] = MAGIC
+    assert np.array_equal(attach_route(key)['distances'], route['distances'])
@@ -0,0 +1,79 @@
+import logging
+
+import numpy as np
+import pytest
+
+from uctl2_back.config import Config
+from uctl2_back.simulate import MAX_PACE, MIN_PACE, create_simulator, generate_teams, main
+from uctl2_back.stage import Stage
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config()
+    config.race_name = 'foo'
+    config.race_file = str(tmp_path / 'race.csv')
+    config.stages = [
+        Stage(0, '', 0, 1000, True),
+        Stage(1, '', 1000, 500, False),
+        Stage(2, '', 1500, 2000, True)
+    ]
+    config.teams = [{'bibNumber': 1, 'name': 'foo', 'pace': 300}]
+
+    return config
+
+
+def test_generate_teams():
+    teams = generate_teams(100, np.random.default_rng(1))
+
+    assert [team['bibNumber'] for team in teams] == list(range(1, 101))
+    assert all(MIN_PACE <= team['pace'] <= MAX_PACE for team in teams)
+    assert teams == generate_teams(100, np.random.default_rng(1))
+
+    with pytest.raises(ValueError):
+        generate_teams(0, np.random.default_rng(1))
+
+
+def test_create_simulator(config):
+    sim = create_simulator(config, teams=50, seed=1)
+
+    assert sim.socketio is None
+    assert len(sim.race_teams) == 50
+    assert sim.split_times.shape == (3, 50)
+
+    # The configuration is not modified, its teams are kept by default
+    assert len(config.teams) == 1
+    assert len(create_simulator(config).race_teams) == 1
+
+
+def test_create_simulator_should_DrawPacesAndTimesIndependently(config):
+    sim = create_simulator(config, teams=1000, seed=1)
+
+    paces = np.array([team['pace'] for team in sim.race_teams], dtype=np.float64)
+    stage_paces = sim.split_times[0] * 1000 / config.stages[0].length
+
+    # Variations of the first stage do not depend on paces of teams
+    assert abs(np.corrcoef(paces, stage_paces / paces)[0, 1]) < 0.1
+
+    assert create_simulator(config, teams=1000, seed=1).race_teams == sim.race_teams
+
+
+def test_run_should_WriteRaceFile_when_SimulatorHasNoSocketio(config):
+    sim = create_simulator(config, teams=10, seed=1)
+    sleeps = []
+
+    simulation = sim.get_simulation(10 ** 6)
+    simulation.run(sleep=sleeps.append)
+
+    assert len(sleeps) > 0 and set(sleeps) == {1}
+    assert sim.simulation_status == 0
+
+    with open(config.race_file, 'r') as f:
+        assert len(f.readlines()) == 11
+
+
+def test_main_should_LogError_when_ConfigCannotBeRead(tmp_path, caplog):
+    with caplog.at_level(logging.ERROR):
+        assert main([str(tmp_path)]) == -1
+
+    assert len(caplog.records) == 1
@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from uctl2_back.clock import VirtualClock
+from uctl2_back.simulation import STAGE_ENTRANCE, STAGE_EXIT, Simulation, compute_crossings
+from uctl2_back.stage import Stage
+
+
+@pytest.fixture
+def simulator():
+    start_time = datetime(2020, 4, 21, hour=10)
+
+    sim = MagicMock()
+    sim.start_time = start_time
+    sim.race_stages = [
+        Stage(0, '', 0, 100, True),
+        Stage(1, '', 100, 100, False),
+        Stage(2, '', 200, 100, True)
+    ]
+    sim.race_teams = [{'bibNumber': 1}, {'bibNumber': 2}]
+
+    # Each row contains the time (in seconds since the start) of each team at the end of a stage
+    sim.inter_times = np.array([
+        [600, 720],
+        [900, 1200],
+        [1500, 1800]
+    ], dtype=np.float64)
+
+    return sim
+
+
+def test_constructor_should_RaiseValueError_when_GivenNegativeTickStep(simulator):
+    with pytest.raises(ValueError):
+        Simulation(simulator, 0)
+
+
+def test_compute_crossings(simulator):
+    result = compute_crossings(simulator)
+
+    assert len(result) == 8
+    assert (0, 1, 0, STAGE_ENTRANCE) in result
+    assert (720, 2, 0, STAGE_EXIT) in result
+    # A team enters the second timed stage when it leaves the non timed stage
+    assert (900, 1, 1, STAGE_ENTRANCE) in result
+    assert (1800, 2, 1, STAGE_EXIT) in result
+
+
+def test_advance(simulator):
+    simulation = Simulation(simulator, 1)
+    start_time = simulator.start_time
+
+    assert simulation.advance(start_time) == 2
+    assert simulation.stages_with_times == [({1, 2}, set()), (set(), set())]
+
+    assert simulation.advance(start_time + timedelta(minutes=11)) == 1
+    assert simulation.stages_with_times == [({1, 2}, {1}), (set(), set())]
+
+    # Nothing happened since the last call
+    assert simulation.advance(start_time + timedelta(minutes=11)) == 0
+
+    assert simulation.advance(start_time + timedelta(minutes=25)) == 4
+    assert simulation.stages_with_times == [({1, 2}, {1, 2}), ({1, 2}, {1})]
+    assert simulation.remaining_teams == {2}
+
+    simulation.advance(start_time + timedelta(hours=1))
+    assert simulation.remaining_teams == set()
+    assert len(simulation.crossings) == 0
+
+
+def test_run_async_should_FinishRace_when_ClockIsVirtual(simulator):
+    clock = VirtualClock(start=0)
+    simulation = Simulation(simulator, 1)
+    on_race_finished = MagicMock()
+
+    asyncio.run(simulation.run_async(clock, on_race_finished=on_race_finished))
+
+    on_race_finished.assert_called_once()
+    assert len(simulation.remaining_teams) == 0
+    assert clock.time() >= simulator.inter_times.max() - 1
+
+
+class SteppedClock(VirtualClock):
+
+    """ Virtual clock whose system time is set back one hour after the start """
+
+    def time(self):
+        return self.now - 3600 if self.now > 0 else self.now
+
+
+def test_run_async_should_IgnoreChangesOfSystemTime(simulator):
+    clock = SteppedClock(start=0)
+    simulation = Simulation(simulator, 1)
+
+    asyncio.run(simulation.run_async(clock))
+
+    assert len(simulation.remaining_teams) == 0
+    assert simulator.inter_times.max() - 1 <= clock.monotonic() <= simulator.inter_times.max() + 1
@@ -0,0 +1,97 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from uctl2_back.config import Config
+from uctl2_back.race_file import read_split_time
+from uctl2_back.simulator import Simulator
+from uctl2_back.stage import Stage
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config()
+    config.race_name = 'foo'
+    config.race_file = str(tmp_path / 'race.csv')
+    config.stages = [
+        Stage(0, '', 0, 1000, True),
+        Stage(1, '', 1000, 500, False),
+        Stage(2, '', 1500, 2000, True)
+    ]
+    config.teams = [
+        {'bibNumber': 1, 'name': 'foo', 'pace': 300},
+        {'bibNumber': 2, 'name': 'bar', 'pace': 200},
+        {'bibNumber': 5, 'name': 'baz', 'pace': 400}
+    ]
+
+    return config
+
+
+def test_compute_times(config):
+    sim = Simulator.create(config, MagicMock(), seed=1)
+    sim.compute_times()
+
+    assert sim.split_times.shape == (3, 3)
+    assert np.allclose(sim.inter_times, np.cumsum(sim.split_times, axis=0))
+
+    # Paces change by 20% at most on each stage
+    assert np.all(sim.split_times[0] >= np.array([300, 200, 400]) * 0.8)
+    assert np.all(sim.split_times[0] <= np.array([300, 200, 400]) * 1.2)
+
+    for i in range(3):
+        assert sorted(sim.stage_ranks[i]) == [1, 2, 3]
+        assert sim.stage_ranks[i, np.argmin(sim.split_times[i])] == 1
+
+
+def test_compute_times_should_BeReproducible_when_GivenSameSeed(config):
+    sim1 = Simulator.create(config, MagicMock(), seed=42)
+    sim2 = Simulator.create(config, MagicMock(), seed=42)
+
+    sim1.compute_times()
+    sim2.compute_times()
+    assert np.array_equal(sim1.split_times, sim2.split_times)
+
+    # A new call gives a new race
+    sim1.compute_times()
+    assert not np.array_equal(sim1.split_times, sim2.split_times)
+
+
+def test_rows(config):
+    sim = Simulator.create(config, MagicMock(), seed=1)
+    sim.compute_times()
+
+    assert list(sim.rows) == [1, 2, 5]
+
+    row = sim.rows[2]
+    assert row['Numéro'] == 2
+    assert row['Nom'] == 'bar'
+    assert row['Distance'] == 3
+    assert read_split_time(row['Interm (S1)']) == int(sim.split_times[0, 1])
+    assert read_split_time(row['Interm (S2)']) == int(sim.split_times[2, 1])
+    assert row['Clt Interm-1 (S2)'] == sim.stage_ranks[2, 1]
+    assert row['2%d|1' % (1,)] == sim.start_time.strftime('%H:%M:%S')
+
+
+def test_stages_inter_times(config):
+    sim = Simulator.create(config, MagicMock(), seed=1)
+    sim.compute_times()
+
+    assert len(sim.stages_inter_times) == 3
+    assert (sim.stages_inter_times[2][0] - sim.start_time).total_seconds() == pytest.approx(sim.inter_times[2, 0])
+    assert sim.race_duration == int(np.max(sim.inter_times[2] - sim.inter_times[0]))
+
+
+def test_to_json_should_BeCachedUntilNewTimes(config):
+    sim = Simulator.create(config, MagicMock(), seed=1)
+    sim.compute_times()
+
+    result = sim.to_json()
+    assert result['simulation_status'] == 0
+    assert sim.to_json()['rows'] is result['rows']
+
+    sim.get_simulation(1).running = True
+    assert sim.to_json()['simulation_status'] == 1
+
+    sim.compute_times()
+    assert not sim.to_json()['rows'] is result['rows']
@@ -1,6 +1,8 @@
 import json
 import pytest
 
+import numpy as np
+
 from uctl2_back.race import Race
 from uctl2_back.stage import Stage
 from uctl2_back.team import Team
@@ -76,26 +78,35 @@ def test_covered_distance_should_RaiseValueError_when_GivenNegativeDistance(defa
         team.covered_distance = -0.1
 
 
-def test_covered_distance(default_race):
+def interpolate(p1, p2, distance):
+    ratio = (distance - p1[3]) / (p2[3] - p1[3])
+    return tuple(np.array(p1[:2]) + ratio * (np.array(p2[:2]) - np.array(p1[:2])))
+
+
+def test_covered_distance(default_race, racepoints):
     team = Team(default_race, 1, 'foo')
 
+    # Locations are interpolated every 5 meters
     team.covered_distance = 10.5
-
-    assert team.current_location == (46.667297, 0.057259)
+    assert team.current_location == pytest.approx(interpolate(racepoints[0][0], racepoints[0][1], 10))
 
     team.covered_distance = 50
-    assert team.current_location == (46.671451, 0.114163)
+    assert team.current_location == pytest.approx((46.671451, 0.114163))
 
     team.covered_distance = 85
-    assert team.current_location == (46.689983, 0.145508)
+    assert team.current_location == pytest.approx(interpolate(racepoints[0][2], racepoints[1][0], 85))
 
     team.current_stage_index = 1
 
     team.covered_distance = 100
-    assert team.current_location == (46.688430, 0.148405)
+    assert team.current_location == pytest.approx((46.688430, 0.148405))
 
     team.covered_distance = 200
-    assert team.current_location == (46.702982, 0.174257)
+    assert team.current_location == pytest.approx(interpolate(racepoints[1][1], racepoints[2][0], 200))
+
+    # The location stays at the end of the route
+    team.covered_distance = 1000
+    assert team.current_location == pytest.approx((46.762367, 0.332877))
 
 def test_covered_distance_should_UpdateProgression(default_race):
     team = Team(default_race, 1, 'foo')
@@ -86,6 +86,20 @@ def test_update_covered_distance(team_state, stages):
     team_state.update_covered_distance(stages, 4, 60)
     assert 1100 == team_state.covered_distance
 
+
+def test_extrapolate_should_UseLastSpeed(team_state, stages):
+    team_state.start_time = datetime(2020, 4, 21)
+
+    team_state.update_covered_distance(stages, 4, 60, default_pace=240)
+    team_state.extrapolate(4, 0.25)
+    assert 1000 + 1000 / 240 == team_state.covered_distance
+
+    # A team that has finished does not move anymore
+    team_state.team_finished.set_value(True)
+    team_state.update_covered_distance(stages, 4, 60)
+    team_state.extrapolate(4, 0.25)
+    assert 500 == team_state.covered_distance
+
 def test_update_stage_times(team_state, stages):
     inter1 = datetime(2020, 4, 21, hour=12)
     inter2 = datetime(2020, 4, 21, hour=14)
@@ -0,0 +1,95 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from uctl2_back.race_state import RaceState
+from uctl2_back.team_state import TeamState
+from uctl2_back.tracker import Ping, TrackerPositions, parse_ping
+
+
+@pytest.fixture
+def matcher():
+    m = MagicMock()
+    m.match.side_effect = lambda lat, lon, previous_offset: None if lat == 0 else lat * 100
+
+    return m
+
+
+def test_parse_ping():
+    assert parse_ping('12,1587459600.5,48.1,-1.7\n') == Ping(bib=12, timestamp=1587459600.5, lat=48.1, lon=-1.7)
+
+    with pytest.raises(ValueError):
+        parse_ping('12,1587459600.5,48.1')
+
+    with pytest.raises(ValueError):
+        parse_ping('foo,1587459600.5,48.1,-1.7')
+
+
+@pytest.mark.parametrize('line', ['12,nan,48.1,-1.7', '12,1587459600.5,inf,-1.7', '12,1587459600.5,48.1,-inf'])
+def test_parse_ping_should_RaiseValueError_when_NumberIsNotFinite(line, matcher):
+    with pytest.raises(ValueError):
+        parse_ping(line)
+
+    positions = TrackerPositions(matcher)
+
+    assert positions.update_from_line(line) is None
+    assert positions.rejected == 1
+
+
+def test_update(matcher):
+    positions = TrackerPositions(matcher)
+
+    assert positions.update(Ping(1, 10, 2, 0)) == 200
+    assert positions.get_offset(1) == 200
+    assert positions.get_offset(2) is None
+
+    # The previous offset is used to match the next position
+    positions.update(Ping(1, 11, 3, 0))
+    matcher.match.assert_called_with(3, 0, 200)
+    assert positions.get_offset(1) == 300
+
+
+def test_update_should_IgnorePosition_when_PositionIsNotValid(matcher):
+    positions = TrackerPositions(matcher)
+    positions.update(Ping(1, 10, 2, 0))
+
+    # Older than the last position
+    assert positions.update(Ping(1, 9, 3, 0)) is None
+    # Far from the route
+    assert positions.update(Ping(1, 11, 0, 0)) is None
+    # Invalid line
+    assert positions.update_from_line('1,foo') is None
+
+    assert positions.get_offset(1) == 200
+    assert positions.received == 4
+    assert positions.rejected == 3
+
+
+def test_get_offset_should_ReturnNone_when_PositionIsTooOld(matcher, monkeypatch):
+    positions = TrackerPositions(matcher, max_age=10)
+    positions.update(Ping(1, 10, 2, 0))
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+
+    assert positions.get_offset(1) is None
+
+
+def test_update_race_state(matcher):
+    positions = TrackerPositions(matcher)
+    positions.update(Ping(1, 10, 2, 0))
+    positions.update(Ping(2, 10, 3, 0))
+
+    running, waiting = TeamState(1, 'foo'), TeamState(2, 'bar')
+    running.start_time = 0
+    running.covered_distance = 150
+    waiting.covered_distance = 0
+
+    state = RaceState()
+    state.teams = [running, waiting]
+
+    positions.update_race_state(state)
+
+    assert running.covered_distance == 200
+    assert waiting.covered_distance == 0
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import signal
+from multiprocessing import Pipe
+
+from uctl2_back.clock import VirtualClock
+from uctl2_back.race_feed import PipeFeed, PipeFeedSender
+from uctl2_back.simulate import create_simulator
+from uctl2_back.config import Config
+from uctl2_back.uctl2 import get_metrics_port, load_config, setup
+
+
+def test_setup_should_ReadRecordsFromGivenFeed(tmp_path, caplog):
+    # Loading a configuration creates its race file : it must not be written into the repository
+    with open('samples/config.json') as f:
+        json_config = json.load(f)
+
+    json_config['routeFile'] = str(tmp_path / 'uctl2.gpx')
+    json_config['raceFile'] = str(tmp_path / 'race.csv')
+    shutil.copy('samples/uctl2.gpx', json_config['routeFile'])
+    (tmp_path / 'config.json').write_text(json.dumps(json_config))
+
+    config = load_config(str(tmp_path / 'config.json'))
+    config.tick_step = 10 ** 4
+
+    sim = create_simulator(config, seed=1)
+    files = []
+    asyncio.run(sim.get_simulation(config.tick_step).run_async(VirtualClock(), on_file_updated=files.append))
+
+    # Records are only given by the pipe, the race file does not exist
+    os.remove(config.race_file)
+
+    receiver, sender = Pipe(duplex=False)
+    feed = PipeFeed(receiver)
+    PipeFeedSender(sender).send(files[-1])
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.call_later(0.5, os.kill, os.getpid(), signal.SIGINT)
+
+    try:
+        with caplog.at_level(logging.INFO):
+            assert setup(config, loop=loop, feed=feed, port=None)
+    finally:
+        asyncio.set_event_loop(None)
+
+    assert feed.last_update is not None
+    assert not receiver.poll()
+    assert not any(record.levelno >= logging.ERROR for record in caplog.records)
+
+
+def test_get_metrics_port_should_WarnAboutIgnoredPorts(caplog):
+    configs = {race_id: Config() for race_id in ['solo', 'relais', 'enfants']}
+
+    assert get_metrics_port(configs) is None
+
+    configs['relais'].metrics_port = 9100
+    configs['enfants'].metrics_port = 9100
+    assert get_metrics_port(configs) == 9100
+    assert caplog.records == []
+
+    configs['enfants'].metrics_port = 9101
+    assert get_metrics_port(configs) == 9100
+    assert [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING] == [
+        'Metrics of all races are exported on port 9100, metricsPort of enfants is ignored'
+    ]
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+
+import numpy as np
+import pytest
+
+from uctl2_back import events
+from uctl2_back.clock import VirtualClock
+from uctl2_back.config import Config
+from uctl2_back.control import CommandQueue
+from uctl2_back.notifier import Notifier
+from uctl2_back.race import Race
+from uctl2_back.race_feed import FileFeed, MemoryFeed
+from uctl2_back.race_state import RaceStatus
+from uctl2_back.simulate import create_simulator
+from uctl2_back.stage import Stage
+from uctl2_back.uctl2_race import REQUESTS_DELAY, broadcast_race
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config()
+    config.race_name = 'foo'
+    config.race_file = str(tmp_path / 'race.csv')
+    config.stages = [
+        Stage(0, '', 0, 1000, True),
+        Stage(1, '', 1000, 500, False),
+        Stage(2, '', 1500, 2000, True)
+    ]
+    config.teams = [
+        {'bibNumber': 1, 'name': 'foo', 'pace': 300},
+        {'bibNumber': 2, 'name': 'bar', 'pace': 200}
+    ]
+
+    return config
+
+
+@pytest.fixture
+def race(config):
+    racepoints = [
+        np.array([(46.6, 0.1, 0, stage.dst_from_start), (46.6, 0.2, 0, stage.dst_from_start + stage.length)])
+        for stage in config.stages
+    ]
+
+    return Race(config.race_name, racepoints, config.stages, config.tick_step)
+
+
+@pytest.fixture
+def simulation(config):
+    config.tick_step = 50
+    sim = create_simulator(config, teams=20, seed=1)
+
+    return sim.get_simulation(config.tick_step)
+
+
+def record_reads(feed, clock):
+    """
+        Records the time of each read of a feed
+
+        :return: list of times of reads
+    """
+    reads = []
+    read_records = feed.read_records
+
+    def read():
+        reads.append(clock.time())
+        return read_records()
+
+    feed.read_records = read
+
+    return reads
+
+
+def broadcast(race, config, feed, driver, control=None, clock=None):
+    """
+        Broadcasts a race on a virtual clock until the driver returns
+
+        :return: (time, event) for each event given to the notifier, and the notifier
+    """
+    if clock is None:
+        clock = VirtualClock(start=0, participants=2)
+
+    received = []
+    notifier = None
+
+    async def run():
+        nonlocal notifier
+        notifier = Notifier(race)
+        stop = asyncio.Event()
+
+        # Events are recorded when they are sent, the clock may move before they are consumed
+        async def put(item):
+            received.extend((clock.time(), event) for event in item[1])
+
+        notifier.events.put = put
+
+        async def drive():
+            await driver(clock, feed)
+            stop.set()
+            clock.leave()
+
+        await asyncio.gather(broadcast_race(race, config, notifier, None, clock=clock, feed=feed, control=control, stop=stop), drive())
+
+    asyncio.run(run())
+
+    return received, notifier
+
+
+def test_broadcast_race_should_ApplyCommands_when_RaceIsEmpty(race, config):
+    control = CommandQueue()
+    control.set_tick_step(10)
+
+    async def driver(clock, feed):
+        await clock.sleep(5)
+
+    received, _ = broadcast(race, config, MemoryFeed(), driver, control)
+
+    assert config.tick_step == 10
+    assert [(time, event['id'], event['payload']['tickStep']) for time, event in received] == [(0, events.RACE_STATUS, 10)]
+
+
+def test_broadcast_race_should_ReadEveryRequestsDelay_when_RaceIsRunning(race, config, simulation):
+    clock = VirtualClock(start=0, participants=2)
+    feed = FileFeed(config)
+    reads = record_reads(feed, clock)
+    simulation.tick(0, True)
+
+    async def driver(clock, feed):
+        await simulation.run_async(clock)
+        await clock.sleep(2 * REQUESTS_DELAY)
+
+    received, notifier = broadcast(race, config, feed, driver, clock=clock)
+
+    assert race.status == RaceStatus.FINISHED
+    assert len(reads) > 5
+    assert reads == [i * REQUESTS_DELAY for i in range(len(reads))]
+
+    # Covered distances are extrapolated between two reads, only rank events are sent
+    extrapolated = [event for time, event in received if time not in reads]
+    assert len(extrapolated) > 0
+    assert all(event['id'] == events.TEAM_OVERTAKE for event in extrapolated)
+    assert notifier.metrics.timings['extrapolation'].count > len(reads)
+
+
+def test_broadcast_race_should_NotExtrapolate_when_RaceIsFinished(race, config, simulation, caplog):
+    clock = VirtualClock(start=0, participants=2)
+    feed = FileFeed(config)
+    reads = record_reads(feed, clock)
+    simulation.tick(0, True)
+    simulation.tick(10 ** 6, False)
+
+    async def driver(clock, feed):
+        await clock.sleep(20)
+
+    with caplog.at_level(logging.WARNING):
+        _, notifier = broadcast(race, config, feed, driver, clock=clock)
+
+    assert race.status == RaceStatus.FINISHED
+    assert reads == [i * REQUESTS_DELAY for i in range(11)]
+    assert 'extrapolation' not in notifier.metrics.timings
+    assert caplog.records == []
+
+
+def test_broadcast_race_should_ReadRecords_when_FeedIsUpdated(race, config, simulation):
+    clock = VirtualClock(start=0, participants=2)
+    feed = MemoryFeed()
+    reads = record_reads(feed, clock)
+    updates = []
+    simulation.tick(0, True, on_file_updated=updates.append)
+    simulation.tick(5, False, on_file_updated=updates.append)
+    feed.update(updates[0])
+
+    async def driver(clock, feed):
+        await clock.sleep(0.6)
+        feed.update(updates[1])
+
+        # The virtual time must not move before the broadcast is woken up
+        while len(reads) < 2:
+            await asyncio.sleep(0)
+
+        await clock.sleep(REQUESTS_DELAY)
+
+    broadcast(race, config, feed, driver, clock=clock)
+
+    # The update wakes the broadcast between two extrapolations, the cadence of reads does not change
+    assert race.status == RaceStatus.RUNNING
+    assert reads[:3] == [0, 0.6, REQUESTS_DELAY]
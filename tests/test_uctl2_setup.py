@@ -1,10 +1,15 @@
+from io import BytesIO
 from unittest.mock import MagicMock
 
 import gpxpy
+import numpy as np
 import pytest
+from haversine import haversine
 
+from uctl2_back.exceptions import RaceError
 from uctl2_back.stage import Stage
-from uctl2_back.uctl2_setup import compute_distances, coords_from_point, extract_trackpoints, group_racepoints
+from uctl2_back.uctl2_setup import (SIMPLIFICATION_TOLERANCES, build_route, compute_distances, compute_distances_array, compute_stage_bounds, coords_from_point,
+                                    extract_trackpoints, group_racepoints, read_trackpoints, simplify_points)
 
 
 @pytest.fixture
@@ -59,6 +64,29 @@ def test_compute_distances():
     assert points[2] == result[2][:-1]
     assert result[2][3] > result[1][3]
 
+def test_compute_distances_array():
+    points = [
+        (48.531333, -1.409535, 4),
+        (48.457520, -1.557404, 0),
+        (48.430432, -1.674234, 1)
+    ]
+
+    result = compute_distances_array(points)
+
+    assert result.dtype == np.float64
+    assert result.shape == (3,)
+    assert result[0] == 0
+
+    d1 = haversine(coords_from_point(points[0]), coords_from_point(points[1])) * 1000
+    d2 = haversine(coords_from_point(points[1]), coords_from_point(points[2])) * 1000
+
+    assert result[1] == pytest.approx(d1)
+    assert result[2] == pytest.approx(d1 + d2)
+
+def test_compute_distances_array_when_GivenLessThanTwoPoints():
+    assert compute_distances_array([]).shape == (0,)
+    assert list(compute_distances_array([(48.531333, -1.409535, 4)])) == [0]
+
 def test_extract_trackpoints(gpx_factory):
     points = [
         make_mock_point((48.531333, -1.409535, 4)),
@@ -78,6 +106,49 @@ def test_extract_trackpoints(gpx_factory):
 
     assert result == expected
 
+GPX_CONTENT = b"""<?xml version="1.0" encoding="utf-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+<wpt lat="1.0" lon="1.0"><ele>12</ele></wpt>
+<trk>
+  <trkseg>
+    <trkpt lat="48.531333" lon="-1.409535"><ele>4</ele></trkpt>
+    <trkpt lat="48.457520" lon="-1.557404"></trkpt>
+  </trkseg>
+  <trkseg>
+    <trkpt lat="48.430432" lon="-1.674234"><ele>1</ele></trkpt>
+  </trkseg>
+</trk>
+<rte><rtept lat="2.0" lon="2.0"></rtept></rte>
+<trk>
+  <trkseg>
+    <trkpt lat="48.542577" lon="-2.078059"><ele>0</ele><extensions><speed>2</speed></extensions></trkpt>
+  </trkseg>
+</trk>
+</gpx>"""
+
+def test_read_trackpoints():
+    expected = [
+        (48.531333, -1.409535, 4),
+        (48.457520, -1.557404, 0),
+        (48.430432, -1.674234, 1),
+        (48.542577, -2.078059, 0)
+    ]
+
+    result = read_trackpoints(BytesIO(GPX_CONTENT))
+
+    assert result.shape == (4, 3)
+    assert list(map(tuple, result.tolist())) == expected
+
+    # Both parsers must give the same points
+    assert list(map(tuple, result.tolist())) == extract_trackpoints(gpxpy.parse(GPX_CONTENT.decode()))
+
+def test_read_trackpoints_should_RaiseRaceError_when_GivenInvalidFile():
+    with pytest.raises(RaceError):
+        read_trackpoints(BytesIO(b'<gpx><trk><trkseg><trkpt lat="1" lon="2"></trkseg>'))
+
+    with pytest.raises(RaceError):
+        read_trackpoints(BytesIO(b'<gpx><trk><trkseg><trkpt lat="a" lon="2"></trkpt></trkseg></trk></gpx>'))
+
 def test_group_racepoints():
     stages = [
         Stage(0, '', 0, 2000, True),
@@ -98,3 +169,90 @@ def test_group_racepoints():
     assert len(result) == 2
     assert result[0] == [points[0], points[1], points[2]]
     assert result[1] == [points[2], points[3]]
+
+def test_group_racepoints_should_ReturnViews_when_GivenArray():
+    stages = [
+        Stage(0, '', 0, 2000, True),
+        Stage(1, '', 2000, 500, True)
+    ]
+
+    points = np.array([
+        (48.531333, -1.409535, 4, 0),
+        (48.457520, -1.557404, 0, 800),
+        (48.430432, -1.674234, 1, 2000),
+        (48.542577, -2.078059, 0, 2500)
+    ])
+
+    result = group_racepoints(points, stages)
+
+    assert [len(x) for x in result] == [3, 2]
+    assert all(np.shares_memory(x, points) for x in result)
+
+def test_compute_stage_bounds():
+    stages = [
+        Stage(0, '', 0, 1000, True),
+        Stage(1, '', 1000, 100, False),
+        Stage(2, '', 1100, 1000, True),
+        Stage(3, '', 2100, 1000, False)
+    ]
+
+    distances = np.array([0, 500, 1000, 1500, 2000, 2050])
+
+    result = compute_stage_bounds(distances, stages)
+
+    # A point at the exact end of a stage belongs to this stage and starts the next one
+    assert result[0].tolist() == [0, 3]
+    # A stage without racepoints only contains the boundary point
+    assert result[1].tolist() == [2, 3]
+    assert result[2].tolist() == [2, 6]
+    # The route is shorter than the last stage
+    assert result[3].tolist() == [5, 6]
+
+def test_compute_stage_bounds_when_FirstPointIsAfterFirstStage():
+    stages = [
+        Stage(0, '', 0, 100, True),
+        Stage(1, '', 100, 100, False)
+    ]
+
+    result = compute_stage_bounds(np.array([150, 180]), stages)
+
+    assert result.tolist() == [[0, 0], [0, 2]]
+    assert compute_stage_bounds(np.array([]), stages).tolist() == [[0, 0], [0, 0]]
+
+def test_simplify_points():
+    # Points on a straight line (every ~11m) with a peak of ~55m in the middle
+    points = np.array([(48.0 + i * 0.0001, -1.0, 0) for i in range(11)])
+    points[5, 1] += 0.00075
+
+    assert simplify_points(points, 0).tolist() == list(range(11))
+    assert simplify_points(points, 10).tolist() == [0, 4, 5, 6, 10]
+    assert simplify_points(points, 100).tolist() == [0, 10]
+
+def test_simplify_points_when_GivenLessThanThreePoints():
+    assert simplify_points(np.empty((0, 3)), 10).tolist() == []
+    assert simplify_points(np.array([(48.0, -1.0, 0), (48.1, -1.0, 0)]), 10).tolist() == [0, 1]
+
+def test_build_route():
+    stages = [
+        Stage(0, '', 0, 300, True),
+        Stage(1, '', 300, 300, False)
+    ]
+
+    # Points on a straight line, every ~11m
+    points = np.array([(48.0 + i * 0.0001, -1.0, 0) for i in range(50)])
+
+    route = build_route(points, stages)
+
+    assert route['distances'].shape == (50,)
+    assert route['racepoints'].shape[1] == 4
+    assert route['stage_bounds'].shape == (2, 2)
+
+    for level in range(1, len(SIMPLIFICATION_TOLERANCES)):
+        indices, offsets = route['lod%d_indices' % (level,)], route['lod%d_offsets' % (level,)]
+
+        for stage in range(len(stages)):
+            start, end = route['stage_bounds'][stage]
+            stage_indices = indices[offsets[stage]:offsets[stage + 1]]
+
+            # Boundaries of each stage are kept, a straight line only needs them
+            assert stage_indices.tolist() == [start, end - 1]
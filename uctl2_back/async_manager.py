@@ -0,0 +1,275 @@
+"""
+    This module defines a manager running in the event loop of the broadcaster
+
+    It is an alternative to the Flask manager (manager.py) with the same
+    Socket.IO events. The simulation, the broadcast and the Socket.IO server
+    share one asyncio event loop : there is no broadcast process, records are
+    given to the broadcaster in memory and commands are applied immediately.
+
+    Usage : python uctl2_back/async_manager.py config_path [--port PORT]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import sys
+from typing import Any, Dict, List, Optional
+
+import socketio
+from aiohttp import web
+
+from uctl2_back import race_file, registry, uctl2, uctl2_race
+from uctl2_back.clock import Clock, WallClock
+from uctl2_back.config import Config
+from uctl2_back.control import CommandQueue
+from uctl2_back.diagnostics import Diagnostics
+from uctl2_back.exceptions import InvalidConfigError, RaceError
+from uctl2_back.metrics_server import METRICS_PATH, create_metrics_handler
+from uctl2_back.notifier import Notifier
+from uctl2_back.race import Race
+from uctl2_back.race_feed import MemoryFeed
+from uctl2_back.race_file import RacefileDeltas
+from uctl2_back.shared_route import release_shared_routes
+from uctl2_back.simulator import Simulator
+from uctl2_back.uctl2_setup import read_race
+
+DEFAULT_PORT = 5000
+BROADCAST_PORT = registry.DEFAULT_PORT
+
+
+class AsyncManager:
+
+    """
+        Controls a simulator from Socket.IO events
+
+        Rows of the race file are given to the broadcaster through
+        a memory feed, new tick steps through a command queue.
+    """
+
+    def __init__(self, config: Config, sio: socketio.AsyncServer, clock: Optional[Clock] = None) -> None:
+        """
+            Creates a new manager and registers its events
+
+            :param config: an instance to a configuration
+            :param sio: Socket.IO server
+            :param clock: clock used by the simulation, the real time by default
+        """
+        self.config = config
+        self.sio = sio
+        self.clock = WallClock() if clock is None else clock
+
+        self.sim = Simulator.create(config)
+        self.sim.compute_times()
+
+        self.deltas = RacefileDeltas()
+        self.feed = MemoryFeed()
+        self.control = CommandQueue()
+        self.stop = asyncio.Event()
+
+        self._simulation_task: Optional[asyncio.Future] = None
+
+        sio.on('connect', self.new_client)
+        sio.on('toggle_sim', self.toggle_sim)
+        sio.on('refresh', self.refresh_sim)
+        sio.on('stop_sim', self.stop_sim)
+        sio.on('update_racefile', self.update_racefile)
+        sio.on('racefile_resync', self.racefile_resync)
+
+    async def broadcast(self, race: Race, notifier: Notifier) -> None:
+        """
+            Broadcasts the simulated race
+
+            :param race: instance of the race
+            :param notifier: notifier used to send events to broadcast clients
+        """
+        await uctl2_race.broadcast_race(race, self.config, notifier, None, clock=self.clock, feed=self.feed, control=self.control,
+                                         stop=self.stop)
+        await notifier.stop_notifier()
+
+    def on_file_updated(self, rows: List[Dict[str, Any]]) -> None:
+        """
+            Gives new rows to the broadcaster and to clients
+
+            :param rows: rows of the race file
+        """
+        self.feed.update(rows, self.sim.race_file_writer.changed_bibs)
+
+        changes = self.deltas.update(rows)
+
+        if changes is None:
+            asyncio.ensure_future(self.sio.emit('racefile', self.deltas.snapshot()))
+        elif len(changes) > 0:
+            asyncio.ensure_future(self.sio.emit('racefile_delta', {
+                'version': self.deltas.version,
+                'rows': changes
+            }))
+
+    async def notify_simulation_status(self) -> None:
+        """
+            Emits an event 'sim_status_updated' with the current
+            simulation status (0=off, 1=on)
+        """
+        await self.sio.emit('sim_status_updated', {
+            'status': self.sim.simulation_status
+        })
+
+    async def start_simulation(self) -> None:
+        """
+            Starts or resumes the simulation with the tick step of the configuration
+        """
+        simulation = self.sim.get_simulation(self.config.tick_step)
+        simulation.tick_step = self.config.tick_step
+
+        # The status is sent before the first tick of the simulation
+        simulation.running = True
+
+        self._simulation_task = asyncio.ensure_future(simulation.run_async(self.clock, on_file_updated=self.on_file_updated,
+                                                                           on_race_finished=lambda: asyncio.ensure_future(self.notify_simulation_status())))
+        await self.notify_simulation_status()
+
+    def cancel_simulation(self) -> None:
+        """
+            Stops the task of the simulation
+        """
+        if self._simulation_task is not None:
+            self._simulation_task.cancel()
+            self._simulation_task = None
+
+    async def new_client(self, sid: str, environ: Dict[str, Any]) -> None:
+        await self.sio.emit('initialize', self.sim.to_json(), room=sid)
+
+        if self.deltas.version > 0:
+            await self.sio.emit('racefile', self.deltas.snapshot(), room=sid)
+
+    async def toggle_sim(self, sid: str, data: Dict[str, Any]) -> None:
+        """
+            Starts / stops the simulation according to its current status
+
+            The parameter 'data' should contain a key 'tickStep'. A new tick step
+            is given to the broadcaster before the next read of the race.
+        """
+        try:
+            tick_step = int(data['tickStep'])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        if self.sim.simulation_status == 1:
+            self.sim.stop_simulation()
+            self.cancel_simulation()
+            await self.notify_simulation_status()
+            return
+
+        if not self.config.tick_step == tick_step and tick_step > 0:
+            self.config.tick_step = tick_step
+            self.control.set_tick_step(tick_step)
+            self.feed.wake()
+
+        await self.start_simulation()
+
+    async def refresh_sim(self, sid: str) -> None:
+        """
+            Generates new times for the simulation
+        """
+        self.sim.compute_times()
+        await self.sio.emit('initialize', self.sim.to_json())
+
+    async def stop_sim(self, sid: str) -> None:
+        """
+            Stops the simulation, it will start from the beginning next time
+        """
+        self.sim.reset_simulation()
+        self.cancel_simulation()
+        await self.notify_simulation_status()
+
+    async def update_racefile(self, sid: str, data: Dict[str, Any]) -> None:
+        """
+            Updates the race file with some selected stages
+
+            The data parameter should contains a 'stages' key, see manager.py.
+        """
+        if 'stages' in data:
+            self.on_file_updated(race_file.process_file(self.sim, data['stages']))
+
+    async def racefile_resync(self, sid: str) -> None:
+        """
+            Sends the whole race file to a client that missed an update
+        """
+        await self.sio.emit('racefile', self.deltas.snapshot(), room=sid)
+
+
+async def serve(config: Config, race: Race, port: int = DEFAULT_PORT, broadcast_port: int = BROADCAST_PORT) -> None:
+    """
+        Runs the Socket.IO server of the manager and the broadcast
+
+        The broadcast is stopped when the event loop receives a SIGINT or SIGTERM signal.
+
+        :param config: an instance to a configuration
+        :param race: instance of the race
+        :param port: port of the Socket.IO server
+        :param broadcast_port: port of the websockets server of the broadcaster
+    """
+    sio = socketio.AsyncServer(async_mode='aiohttp', cors_allowed_origins='*')
+    app = web.Application()
+    sio.attach(app)
+
+    notifier = Notifier(race)
+    manager = AsyncManager(config, sio)
+
+    # Metrics of the broadcast are exported by the server of the manager
+    app.router.add_get(METRICS_PATH, create_metrics_handler({'': notifier}))
+
+    loop = asyncio.get_event_loop()
+    loop.add_signal_handler(signal.SIGINT, manager.stop.set)
+    loop.add_signal_handler(signal.SIGTERM, manager.stop.set)
+    Diagnostics(loop).register()
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+
+    try:
+        await asyncio.gather(notifier.start_notifier(broadcast_port), notifier.broadcaster(), manager.broadcast(race, notifier))
+    finally:
+        manager.cancel_simulation()
+        await runner.cleanup()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+        Starts the manager
+
+        :param argv: command line arguments, None to use sys.argv
+        :return: exit code
+    """
+    parser = argparse.ArgumentParser(description='Runs the manager and the broadcaster in one event loop')
+    parser.add_argument('config', help='path to the configuration file')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port of the Socket.IO server')
+    args = parser.parse_args(argv)
+    logger = logging.getLogger(__name__)
+
+    try:
+        config = uctl2.load_config(args.config)
+        race = read_race(config)
+    except (FileNotFoundError, json.JSONDecodeError, InvalidConfigError):
+        # The error has already been logged by load_config
+        return -1
+    except (OSError, RaceError) as e:
+        logger.error('Unable to read the race %s : %s', args.config, e)
+        return -1
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    try:
+        loop.run_until_complete(serve(config, race, args.port))
+    finally:
+        release_shared_routes()
+        loop.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='[%(levelname)s] %(name)s - %(message)s', level=logging.INFO)
+    sys.exit(main())
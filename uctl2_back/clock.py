@@ -0,0 +1,244 @@
+"""
+    This module defines clocks used by the simulation
+    and the broadcast loops.
+
+    A clock gives the current time and lets a coroutine wait
+    for a given number of seconds. The virtual clock is used to replay
+    a race as fast as possible. A ticker schedules the iterations
+    of a loop at a fixed cadence.
+"""
+import abc
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import List, Optional, Tuple
+
+
+class Clock(abc.ABC):
+
+    """
+        Gives the time to the loops of the program
+
+        A loop that uses a clock is called a participant.
+    """
+
+    @abc.abstractmethod
+    def time(self) -> float:
+        """
+            Gets the current time
+
+            :return: number of seconds since the epoch
+        """
+
+    @abc.abstractmethod
+    def monotonic(self) -> float:
+        """
+            Gets the time of a clock that cannot go backwards
+
+            It should be used to measure elapsed times.
+
+            :return: number of seconds since an arbitrary point
+        """
+
+    @abc.abstractmethod
+    async def sleep(self, delay: float) -> None:
+        """
+            Waits for the given number of seconds
+
+            :param delay: number of seconds
+        """
+
+    def join(self) -> None:
+        """
+            Adds a participant to the clock
+        """
+
+    def leave(self) -> None:
+        """
+            Removes a participant from the clock
+
+            It must be called when a participant stops using the clock.
+        """
+
+
+class WallClock(Clock):
+
+    """
+        Real time clock
+    """
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+
+
+class VirtualClock(Clock):
+
+    """
+        Clock whose time only advances when all participants are sleeping
+
+        When the last participant starts to sleep, the time jumps to the
+        earliest wake up time and participants that were waiting for this time
+        are woken up. Loops using this clock run as fast as possible
+        while seeing the same times as with a real clock.
+    """
+
+    def __init__(self, start: Optional[float] = None, participants: int = 1) -> None:
+        """
+            Creates a new virtual clock
+
+            :param start: initial time, the current time by default
+            :param participants: number of participants that will use the clock
+        """
+        self.now = time.time() if start is None else start
+        self.participants = participants
+
+        # (wake up time, order of arrival, future resolved at wake up)
+        self._sleepers: List[Tuple[float, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        """
+            Waits until the clock reaches the current time plus the given delay
+
+            :param delay: number of seconds
+        """
+        sleeper = (self.now + max(delay, 0), next(self._counter), asyncio.get_event_loop().create_future())
+        heapq.heappush(self._sleepers, sleeper)
+        self._advance()
+
+        try:
+            await sleeper[2]
+        except asyncio.CancelledError:
+            if sleeper in self._sleepers:
+                self._sleepers.remove(sleeper)
+                heapq.heapify(self._sleepers)
+            raise
+
+    def join(self) -> None:
+        self.participants += 1
+
+    def leave(self) -> None:
+        self.participants -= 1
+        self._advance()
+
+    def _advance(self) -> None:
+        """
+            Moves the time forward if all participants are sleeping
+        """
+        if len(self._sleepers) == 0 or len(self._sleepers) < self.participants:
+            return
+
+        self.now = max(self.now, self._sleepers[0][0])
+
+        while len(self._sleepers) > 0 and self._sleepers[0][0] <= self.now:
+            _, _, future = heapq.heappop(self._sleepers)
+
+            if not future.done():
+                future.set_result(None)
+
+
+class Ticker:
+
+    """
+        Schedules the ticks of a loop at a fixed cadence
+
+        Ticks are due at start + n * period, measured with the monotonic time
+        of a clock : the cadence does not drift with the duration of the work.
+        When the work of a tick lasts longer than the period (an overrun), the next
+        tick starts immediately and ticks that have been entirely missed are skipped.
+        A tick can also start before it is due, for example when new data is received.
+    """
+
+    def __init__(self, clock: Clock, period: float) -> None:
+        """
+            Creates a new ticker, the first tick is due immediately
+
+            :param clock: clock used to measure time
+            :param period: number of seconds between two ticks
+            :raises ValueError: if the period is not strictly positive
+        """
+        if period <= 0:
+            raise ValueError('period must be strictely positive')
+
+        self.clock = clock
+        self.period = period
+
+        self.overruns = 0
+        self.skipped = 0
+
+        # Number of ticks skipped before the last tick
+        self.missed = 0
+
+        self._last = clock.monotonic()
+        self._next = self._last
+
+    def tick(self) -> float:
+        """
+            Starts a new tick
+
+            :return: number of seconds since the previous tick
+        """
+        logger = logging.getLogger(__name__)
+
+        now = self.clock.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        self.missed = 0
+
+        if now >= self._next:
+            self.missed = int((now - self._next) // self.period)
+            self._next += (self.missed + 1) * self.period
+
+            if self.missed > 0:
+                self.skipped += self.missed
+                logger.warning('%d ticks skipped (%.3fs late)', self.missed, elapsed - self.period)
+
+        return elapsed
+
+    def resync(self) -> None:
+        """
+            Restarts the cadence from now, after a period where the ticker has not been used
+
+            The next tick is due immediately and ticks missed meanwhile are not counted.
+            The next tick still returns the number of seconds since the previous tick.
+        """
+        self._next = self.clock.monotonic()
+
+    def remaining(self) -> float:
+        """
+            Gets the time before the next tick
+
+            :return: number of seconds, negative if the next tick is late
+        """
+        return self._next - self.clock.monotonic()
+
+    def delay(self) -> float:
+        """
+            Computes the delay before the next tick
+
+            Calling this method at the end of the work of a tick
+            counts overruns.
+
+            :return: number of seconds to wait, 0 if the next tick is already due
+        """
+        delay = self.remaining()
+
+        if delay < 0:
+            self.overruns += 1
+            return 0.0
+
+        return delay
@@ -10,6 +10,9 @@ from uctl2_back.config_schema import CONFIG_SCHEMA
 from uctl2_back.exceptions import InvalidConfigError
 from uctl2_back.stage import Stage
 
+# Number of seconds between two extrapolations of covered distances (4 Hz)
+DEFAULT_EXTRAPOLATION_PERIOD = 0.25
+
 
 class Config:
 
@@ -29,6 +32,11 @@ class Config:
         self.route_file = 'not set'
         self.encoding = 'utf-8'
         self.teams = []
+        self.tracker: Optional[Dict[str, Any]] = None
+        self.simulator_feed = 'file'
+        self.state_shards = 1
+        self.metrics_port: Optional[int] = None
+        self.extrapolation_period = DEFAULT_EXTRAPOLATION_PERIOD
 
     @classmethod
     def read_from_json(cls, json_config: Dict[str, Any]) -> 'Config':
@@ -69,6 +77,11 @@ class Config:
         validate_bibs([team['bibNumber'] for team in config.teams])
 
         config.encoding = json_config['encoding']
+        config.tracker = json_config.get('tracker')
+        config.simulator_feed = json_config.get('simulatorFeed', 'file')
+        config.state_shards = json_config.get('stateShards', 1)
+        config.metrics_port = json_config.get('metricsPort')
+        config.extrapolation_period = json_config.get('extrapolationPeriod', DEFAULT_EXTRAPOLATION_PERIOD)
 
         return config
 
@@ -76,7 +89,7 @@ class Config:
         """
             Serializes a config
         """
-        return {
+        serialized = {
             'raceName': self.race_name,
             'stages': self.stages,
             'raceFile': self.race_file,
@@ -85,6 +98,23 @@ class Config:
             'teams': self.teams
         }
 
+        if self.tracker is not None:
+            serialized['tracker'] = self.tracker
+
+        if not self.simulator_feed == 'file':
+            serialized['simulatorFeed'] = self.simulator_feed
+
+        if self.state_shards > 1:
+            serialized['stateShards'] = self.state_shards
+
+        if self.metrics_port is not None:
+            serialized['metricsPort'] = self.metrics_port
+
+        if not self.extrapolation_period == DEFAULT_EXTRAPOLATION_PERIOD:
+            serialized['extrapolationPeriod'] = self.extrapolation_period
+
+        return serialized
+
 
 def validate_bibs(bibs: List[int]):
     """
@@ -72,6 +72,53 @@ CONFIG_SCHEMA = {
         'encoding': {
             'title': 'Encodage du fichier de course (utf-8, iso8859_3, ...)',
             'type': 'string'
+        },
+        'tracker': {
+            'title': 'Réception des positions GPS des équipes (optionnel)',
+            'type': 'object',
+            'properties': {
+                'udpPort': {
+                    'title': 'Port udp (localhost) sur lequel les positions sont reçues',
+                    'type': 'integer',
+                    'minimum': 1,
+                    'maximum': 65535
+                },
+                'replayFile': {
+                    'title': 'Chemin vers un fichier de positions à rejouer à la place du port udp',
+                    'type': 'string'
+                },
+                'replaySpeed': {
+                    'title': 'Vitesse de lecture du fichier de positions',
+                    'type': 'number',
+                    'exclusiveMinimum': 0
+                },
+                'maxAge': {
+                    'title': 'Nombre de secondes après lequel une position n\'est plus utilisée',
+                    'type': 'number',
+                    'exclusiveMinimum': 0
+                }
+            }
+        },
+        'simulatorFeed': {
+            'title': 'Transmission des données du simulateur au broadcaster : fichier de course (file) ou tube (pipe)',
+            'type': 'string',
+            'enum': ['file', 'pipe']
+        },
+        'stateShards': {
+            'title': "Nombre de processus utilisés pour lire l'état des équipes",
+            'type': 'integer',
+            'minimum': 1
+        },
+        'metricsPort': {
+            'title': 'Port du serveur http qui expose les métriques du broadcaster (localhost)',
+            'type': 'integer',
+            'minimum': 1,
+            'maximum': 65535
+        },
+        'extrapolationPeriod': {
+            'title': 'Nombre de secondes entre deux estimations des distances parcourues entre les lectures du fichier de course (0 pour désactiver)',
+            'type': 'number',
+            'minimum': 0
         }
     }
 }
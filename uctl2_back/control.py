@@ -0,0 +1,139 @@
+"""
+    This module defines a channel used by the manager
+    to control a running broadcaster.
+
+    A command is a pair (kind of command, value)
+    sent through a multiprocessing pipe, or through a queue
+    when the manager and the broadcaster share the same event loop.
+"""
+import logging
+from multiprocessing.connection import Connection
+from typing import Any, List, Tuple
+
+# Kinds of commands
+SET_TICK_STEP = 0
+
+Command = Tuple[int, Any]
+
+
+class ControlChannel:
+
+    """
+        Receives commands sent by the manager
+    """
+
+    def __init__(self, connection: Connection) -> None:
+        """
+            Creates a new control channel
+
+            :param connection: receiving end of the pipe
+        """
+        self.connection = connection
+        self.closed = False
+
+    def receive(self) -> List[Command]:
+        """
+            Reads commands waiting in the pipe
+
+            Once the manager has closed the pipe, no more commands are read.
+
+            :return: received commands, in the order they have been sent
+        """
+        commands: List[Command] = []
+
+        if self.closed:
+            return commands
+
+        try:
+            while self.connection.poll():
+                commands.append(self.connection.recv())
+        except EOFError:
+            logger = logging.getLogger(__name__)
+            logger.warning('The control channel has been closed by the manager')
+            self.closed = True
+
+        return commands
+
+
+class ControlSender:
+
+    """
+        Sends commands to a broadcaster
+    """
+
+    def __init__(self, connection: Connection) -> None:
+        """
+            Creates a new sender
+
+            :param connection: sending end of the pipe
+        """
+        self.connection = connection
+
+    def send(self, kind: int, value: Any) -> bool:
+        """
+            Sends a command
+
+            :param kind: kind of the command
+            :param value: value of the command
+            :return: False if the broadcaster is not listening anymore
+        """
+        try:
+            self.connection.send((kind, value))
+        except (BrokenPipeError, EOFError, OSError) as e:
+            logger = logging.getLogger(__name__)
+            logger.warning('Unable to send a command to the broadcaster : %s', e)
+            return False
+
+        return True
+
+    def set_tick_step(self, tick_step: int) -> bool:
+        """
+            Changes the speed of the race in the broadcaster
+
+            :param tick_step: number of simulated seconds for one real second
+            :return: False if the broadcaster is not listening anymore
+        """
+        return self.send(SET_TICK_STEP, tick_step)
+
+
+class CommandQueue:
+
+    """
+        Passes commands to a broadcaster running in the same process
+
+        It can be used instead of a control channel and of its sender.
+    """
+
+    def __init__(self) -> None:
+        self._commands: List[Command] = []
+
+    def receive(self) -> List[Command]:
+        """
+            Reads waiting commands
+
+            :return: commands, in the order they have been sent
+        """
+        commands, self._commands = self._commands, []
+
+        return commands
+
+    def send(self, kind: int, value: Any) -> bool:
+        """
+            Sends a command
+
+            :param kind: kind of the command
+            :param value: value of the command
+            :return: always True
+        """
+        self._commands.append((kind, value))
+
+        return True
+
+    def set_tick_step(self, tick_step: int) -> bool:
+        """
+            Changes the speed of the race in the broadcaster
+
+            :param tick_step: number of simulated seconds for one real second
+            :return: always True
+        """
+        return self.send(SET_TICK_STEP, tick_step)
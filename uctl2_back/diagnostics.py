@@ -0,0 +1,176 @@
+"""
+    This module defines diagnostics that can be triggered
+    while the broadcaster is running.
+
+    SIGUSR1 profiles the event loop with cProfile for a limited duration,
+    SIGUSR2 compares memory allocations with the previous SIGUSR2 (tracemalloc).
+    Results are written to timestamped files.
+
+    Example : kill -USR1 <pid of the broadcaster>
+"""
+import asyncio
+import cProfile
+import datetime
+import io
+import logging
+import os
+import pstats
+import signal
+import tracemalloc
+from typing import Optional
+
+# Duration of a profiling session (in seconds)
+PROFILE_DURATION = 30
+
+# Number of lines written in summaries
+TOP_LINES = 30
+
+# Number of frames kept by tracemalloc for each allocation
+TRACE_FRAMES = 10
+
+
+class Diagnostics:
+
+    """
+        Profiles the event loop and tracks memory allocations on demand
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, directory: str = '.', profile_duration: float = PROFILE_DURATION) -> None:
+        """
+            Creates new diagnostics
+
+            :param loop: event loop of the broadcaster
+            :param directory: directory of written files
+            :param profile_duration: duration of a profiling session (in seconds)
+        """
+        self.loop = loop
+        self.directory = directory
+        self.profile_duration = profile_duration
+
+        self._profiler: Optional[cProfile.Profile] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def register(self) -> None:
+        """
+            Registers signal handlers in the event loop
+
+            Nothing is done on systems without SIGUSR1 and SIGUSR2 (Windows).
+        """
+        if not hasattr(signal, 'SIGUSR1') or not hasattr(signal, 'SIGUSR2'):
+            return
+
+        self.loop.add_signal_handler(signal.SIGUSR1, self.start_profile)
+        self.loop.add_signal_handler(signal.SIGUSR2, self.take_snapshot)
+
+    def get_path(self, kind: str, extension: str) -> str:
+        """
+            Gets the path of a new file
+
+            :param kind: kind of diagnostic
+            :param extension: extension of the file
+            :return: path of the file, with the current date and time
+        """
+        timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+
+        return os.path.join(self.directory, 'uctl2_%s_%s.%s' % (kind, timestamp, extension))
+
+    def start_profile(self) -> bool:
+        """
+            Starts to profile the event loop
+
+            The session is stopped after :attr:`profile_duration` seconds.
+
+            :return: False if a session is already running
+        """
+        logger = logging.getLogger(__name__)
+
+        if self._profiler is not None:
+            logger.warning('A profiling session is already running')
+            return False
+
+        logger.info('Profiling the broadcaster for %ds', self.profile_duration)
+
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        self.loop.call_later(self.profile_duration, self.stop_profile)
+
+        return True
+
+    def stop_profile(self) -> Optional[str]:
+        """
+            Stops the profiling session and writes its statistics
+
+            Raw statistics (readable with pstats or snakeviz) are written in a .prof file,
+            functions with the highest cumulative time in a .txt file.
+
+            :return: path of the .prof file, None if there is no session
+        """
+        logger = logging.getLogger(__name__)
+
+        if self._profiler is None:
+            return None
+
+        profiler, self._profiler = self._profiler, None
+        profiler.disable()
+
+        path = self.get_path('profile', 'prof')
+
+        try:
+            profiler.dump_stats(path)
+
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(TOP_LINES)
+
+            with open(os.path.splitext(path)[0] + '.txt', 'w') as f:
+                f.write(summary.getvalue())
+        except OSError as e:
+            logger.error('Unable to write profiling statistics : %s', e)
+            return None
+
+        logger.info('Profiling statistics written to %s', path)
+
+        return path
+
+    def take_snapshot(self) -> Optional[str]:
+        """
+            Compares memory allocations with the previous snapshot
+
+            The first call starts tracemalloc and takes the first snapshot,
+            next ones write the biggest differences in a file.
+
+            :return: path of the written file, None for the first snapshot
+        """
+        logger = logging.getLogger(__name__)
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            self._snapshot = None
+
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')
+        ])
+
+        previous, self._snapshot = self._snapshot, snapshot
+
+        if previous is None:
+            logger.info('Memory allocations are traced, send SIGUSR2 again to compare them')
+            return None
+
+        path = self.get_path('memory', 'txt')
+        current, peak = tracemalloc.get_traced_memory()
+
+        try:
+            with open(path, 'w') as f:
+                f.write('Traced memory : %d bytes (peak %d bytes)\n\n' % (current, peak))
+
+                for statistic in snapshot.compare_to(previous, 'lineno')[:TOP_LINES]:
+                    f.write('%s\n' % (statistic,))
+        except OSError as e:
+            logger.error('Unable to write memory allocations : %s', e)
+            return None
+
+        logger.info('Memory allocations written to %s', path)
+
+        return path
@@ -21,6 +21,24 @@ TEAM_END = 4
 TEAM_OVERTAKE = 5
 
 
+def create_race_status_event(race: 'Race') -> Dict[str, Any]:
+    """
+        Creates an event for notifying the status of the race
+
+        :param race: instance of the current race
+        :return: the event
+    """
+    return {
+        'id': RACE_STATUS,
+        'payload': {
+            'race': race.name,
+            'status': race.status,
+            'startTime': race.start_time,
+            'tickStep': race.tick_step
+        }
+    }
+
+
 def create_team_end_race_event(race: 'Race', team_state: 'TeamState') -> Dict[str, Any]:
     """
         Creates an event for notifying that team finished the race
@@ -26,3 +26,10 @@ class RaceFileFieldError(Exception):
         Exception raised when there were an error while
         retreiving a column from a row of a race file.
     """
+
+
+class RaceFileChangedError(Exception):
+    """
+        Exception raised when the race file has been replaced
+        while it was being read by several processes
+    """
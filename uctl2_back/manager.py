@@ -1,16 +1,22 @@
 import asyncio
+import collections
 import logging
 import os
 import signal
 import sys
-from multiprocessing import Process
-from typing import TYPE_CHECKING, Any, Dict, List
+import threading
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from flask import Flask
 from flask_socketio import SocketIO, emit
 
 from uctl2_back import race_file, uctl2
 from uctl2_back.config import Config
+from uctl2_back.control import ControlChannel, ControlSender
+from uctl2_back.race_feed import PipeFeed, PipeFeedSender
+from uctl2_back.race_file import RacefileDeltas
 from uctl2_back.simulator import Simulator
 
 if TYPE_CHECKING:
@@ -19,14 +25,21 @@ if TYPE_CHECKING:
 
 socketio = SocketIO()
 
+# A broadcast process with the ends of its pipes, feed_sender is None when the broadcaster reads the race file
+Broadcast = collections.namedtuple('Broadcast', ['process', 'feed_sender', 'control'])
 
-def start_broadcast(config: Config) -> None:
+
+def start_broadcast(config: Config, connection: Optional[Connection] = None, control_connection: Optional[Connection] = None) -> None:
     """
         Starts race broadcast
 
         This function should be runned in another process.
         A new event loop is created and set to asyncio, it will
         be used by the broadcast script.
+
+        :param config: an instance to a configuration
+        :param connection: receiving end of a pipe used to receive records from the simulator, None to read the race file
+        :param control_connection: receiving end of a pipe used to receive commands from the manager, could be None
     """
     print('Starting broadcast')
     loop = asyncio.new_event_loop()
@@ -36,60 +49,161 @@ def start_broadcast(config: Config) -> None:
     formatter = logging.Formatter('[%(levelname)s] %(name)s - %(message)s')
     handler.setFormatter(formatter)
 
-    uctl2.setup(config, handlers=[handler], loop=loop)
+    feed = None if connection is None else PipeFeed(connection)
+    control = None if control_connection is None else ControlChannel(control_connection)
 
+    uctl2.setup(config, handlers=[handler], loop=loop, feed=feed, control=control)
 
-def update_racefile_thread(sim: Simulator, stages: 'StagesWithInts') -> None:
+
+def spawn_broadcast(config: Config) -> Broadcast:
     """
-        Updates the race file with the selected stages for each teams
+        Starts race broadcast in a new process
 
-        An event 'rows' is emitted to all connected clients with updated rows.
+        When the field simulatorFeed of the configuration is 'pipe', records
+        are sent to the broadcaster through a pipe instead of being read from the race file.
+        Commands (a new tick step for example) are sent through another pipe.
 
-        :param sim: an instance to the Simulator
-        :param stages: selected stages for each teams
+        :param config: an instance to a configuration
+        :return: the new process with the ends of its pipes
     """
-    rows = race_file.process_file(sim, stages)
-    socketio.emit('racefile', {
-        'rows': rows
-    }, broadcast=True)
+    control_receiver, control_sender = Pipe(duplex=False)
+
+    if config.simulator_feed == 'pipe':
+        receiver, sender = Pipe(duplex=False)
+    else:
+        receiver, sender = None, None
+
+    p = Process(target=start_broadcast, args=(config, receiver, control_receiver))
+    p.start()
+
+    control_receiver.close()
+    if receiver is not None:
+        receiver.close()
+
+    return Broadcast(p, None if sender is None else PipeFeedSender(sender), ControlSender(control_sender))
+
+
+class RaceFileUpdater:
+
+    """
+        Owns the race file of a simulator
+
+        Updates requested by the simulation and by clients are written
+        by a single background task. Only the latest request is kept :
+        requests submitted while the file is written are coalesced into one write.
+    """
+
+    def __init__(self, sim: Simulator, on_file_updated: Optional[Callable[[List[Dict[str, Any]]], Any]] = None) -> None:
+        """
+            Creates a new updater
+
+            :param sim: an instance to the Simulator
+            :param on_file_updated: function to call with new rows after each write
+        """
+        self.sim = sim
+        self.on_file_updated = on_file_updated
+
+        # Number of requests replaced by a more recent one before being written
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._pending: Optional['StagesWithInts'] = None
+        self._writing = False
+
+    def submit(self, stages: Iterable[Tuple[Iterable[int], Iterable[int]]]) -> None:
+        """
+            Requests an update of the race file with the given stages
+
+            Stages are copied, they can be modified once this method returns.
+
+            :param stages: for each timed stage, bibs of teams that have started it and bibs of teams that have finished it
+        """
+        stages = [(set(started), set(finished)) for started, finished in stages]
 
+        with self._lock:
+            if self._pending is not None:
+                self.coalesced += 1
 
-def create_app(config: Config, pid: int) -> Flask:
+            self._pending = stages
+
+            if self._writing:
+                return
+
+            self._writing = True
+
+        socketio.start_background_task(self.write_pending)
+
+    def write_pending(self) -> None:
+        """
+            Writes the race file until there is no pending request
+        """
+        while True:
+            with self._lock:
+                stages = self._pending
+                self._pending = None
+
+                if stages is None:
+                    self._writing = False
+                    return
+
+            rows = race_file.process_file(self.sim, stages)
+
+            if self.on_file_updated is not None:
+                self.on_file_updated(rows)
+
+
+def create_app(config: Config, broadcast: Broadcast) -> Flask:
     """
         Creates a new Flask app
 
         This app only contains socketio events, there is not http route.
 
+        :param config: an instance to a configuration
+        :param broadcast: the broadcast process
         :return: instance of the new Flask app
     """
     app = Flask(__name__)
-    app.broadcast_pid = pid
+    app.broadcast = broadcast
     socketio.init_app(app, cors_allowed_origins="*")
 
     sim = Simulator.create(config, socketio)
     sim.compute_times()
 
-    def restart_broadcast(on_file_updated, on_race_finished) -> None:
-        stop_broadcast()
+    deltas = RacefileDeltas()
+
+    def on_file_updated(rows: List[Dict[str, Any]]) -> None:
+        if broadcast.feed_sender is not None:
+            broadcast.feed_sender.send(rows, sim.race_file_writer.changed_bibs)
+
+        changes = deltas.update(rows)
 
-        p = Process(target=start_broadcast, args=(config,))
-        p.start()
+        if changes is None:
+            socketio.emit('racefile', deltas.snapshot(), broadcast=True)
+        elif len(changes) > 0:
+            socketio.emit('racefile_delta', {
+                'version': deltas.version,
+                'rows': changes
+            }, broadcast=True)
 
-        app.broadcast_pid = p.pid
-        
-        start_simulation(on_file_updated, on_race_finished)
+    updater = RaceFileUpdater(sim, on_file_updated)
 
-    def start_simulation(on_file_updated, on_race_finished):
+    def start_simulation(on_race_finished):
         simulation = sim.get_simulation(config.tick_step)
-        socketio.start_background_task(simulation.run, on_file_updated=on_file_updated, on_race_finished=on_race_finished)
+
+        # A paused simulation keeps its instance, its speed may have changed since
+        simulation.tick_step = config.tick_step
+
+        socketio.start_background_task(simulation.run, on_race_finished=on_race_finished, update_file=updater.submit)
         sim.notify_simulation_status()
 
     def stop_broadcast(*args):
+        pid = broadcast.process.pid
+
         try:
-            os.kill(app.broadcast_pid, signal.SIGTERM)
+            os.kill(pid, signal.SIGTERM)
             socketio.sleep(5)
-            print('Killing process with pid', app.broadcast_pid)
-            os.kill(app.broadcast_pid, signal.SIGKILL)
+            print('Killing process with pid', pid)
+            os.kill(pid, signal.SIGKILL)
         except OSError:
             pass
 
@@ -97,6 +211,19 @@ def create_app(config: Config, pid: int) -> Flask:
     def new_client():
         emit('initialize', sim.to_json())
 
+        if deltas.version > 0:
+            emit('racefile', deltas.snapshot())
+
+    @socketio.on('racefile_resync')
+    def racefile_resync():
+        """
+            This event is emitted by the client when it has missed
+            an event 'racefile_delta'.
+
+            The whole race file is sent back to the client.
+        """
+        emit('racefile', deltas.snapshot())
+
     @socketio.on('toggle_sim')
     def toggle_sim(data: Dict[str, Any]):
         """
@@ -112,8 +239,11 @@ def create_app(config: Config, pid: int) -> Flask:
             When the simulation will finish, then another 'sim_status_updated' event
             will be emitted.
 
-            When the race file is updated by the simulation, an event 'racefile' with
-            all rows will be emitted to all connected clients.
+            A new tick step is sent to the running broadcaster, which
+            emits a new race status to its clients.
+
+            When the race file is updated by the simulation, an event 'racefile_delta' with
+            changed cells will be emitted to all connected clients.
         """
         try:
             tick_step = int(data['tickStep'])
@@ -124,13 +254,11 @@ def create_app(config: Config, pid: int) -> Flask:
             sim.stop_simulation()
             sim.notify_simulation_status()
         else:
-            if config.tick_step == tick_step:
-                start_simulation(on_file_updated=lambda rows: socketio.emit('racefile', {'rows': rows}), 
-                    on_race_finished=sim.notify_simulation_status)
-            else:
+            if not config.tick_step == tick_step:
                 config.tick_step = tick_step
-                socketio.start_background_task(restart_broadcast, on_file_updated=lambda rows: socketio.emit('racefile', {'rows': rows}),
-                    on_race_finished=sim.notify_simulation_status)
+                broadcast.control.set_tick_step(tick_step)
+
+            start_simulation(on_race_finished=sim.notify_simulation_status)
 
     @socketio.on('refresh')
     def refresh_sim():
@@ -165,11 +293,14 @@ def create_app(config: Config, pid: int) -> Flask:
             that have started the stage and the last one is for teams that
             have finished the stage.
 
+            Requests are coalesced : when many requests are received
+            while the file is written, only the last one is written.
+
             :param data: event data
         """
         if 'stages' in data:
             app.logger.info('Update race file')
-            socketio.start_background_task(update_racefile_thread, sim, data['stages'])
+            updater.submit(data['stages'])
 
     signal.signal(signal.SIGTERM, stop_broadcast)
     return app
@@ -189,11 +320,10 @@ if __name__ == '__main__':
         print('Config error')
         sys.exit(-1)
 
-    p = Process(target=start_broadcast, args=(config,))
-    p.start()
+    broadcast = spawn_broadcast(config)
 
-    if not p.pid:
+    if not broadcast.process.pid:
         sys.exit(-1)
 
-    app = create_app(config, p.pid)
+    app = create_app(config, broadcast)
     socketio.run(app)
@@ -0,0 +1,151 @@
+"""
+    This module defines metrics measured by the broadcaster
+
+    Durations of each phase of the broadcast loop are kept in rolling
+    histograms : only the last measures are used to compute percentiles.
+    Counters are only incremented, gauges keep their last value.
+"""
+import collections
+import contextlib
+import json
+import logging
+import time
+from typing import Any, Deque, Dict, Iterator, List
+
+# Number of measures kept by a histogram
+HISTOGRAM_SIZE = 1000
+
+# Percentiles given by a histogram
+PERCENTILES = (50, 95, 99)
+
+
+class RollingHistogram:
+
+    """
+        Keeps the last measures of a value
+    """
+
+    def __init__(self, size: int = HISTOGRAM_SIZE) -> None:
+        """
+            Creates a new histogram
+
+            :param size: maximum number of measures
+        """
+        self.values: Deque[float] = collections.deque(maxlen=size)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float) -> None:
+        """
+            Adds a measure
+
+            :param value: measured value
+        """
+        self.values.append(value)
+        self.count += 1
+        self.sum += value
+
+    def percentiles(self, percentiles: List[int]) -> List[float]:
+        """
+            Computes percentiles of the last measures (nearest rank)
+
+            :param percentiles: percentiles between 0 and 100
+            :return: values of the percentiles, 0 if there is no measure
+        """
+        if len(self.values) == 0:
+            return [0.0 for _ in percentiles]
+
+        values = sorted(self.values)
+
+        return [values[min(len(values) - 1, max(0, -(-p * len(values) // 100) - 1))] for p in percentiles]
+
+    def summary(self) -> Dict[str, float]:
+        """
+            Summarizes measures
+
+            count and sum include all measures, percentiles and max only the last ones.
+
+            :return: count, sum, max and percentiles (p50, p95, p99)
+        """
+        summary = {'count': self.count, 'sum': self.sum, 'max': max(self.values, default=0.0)}
+
+        for percentile, value in zip(PERCENTILES, self.percentiles(list(PERCENTILES))):
+            summary['p%d' % (percentile,)] = value
+
+        return summary
+
+
+class Metrics:
+
+    """
+        Timers, counters and gauges of a broadcast
+    """
+
+    def __init__(self) -> None:
+        self.timings: Dict[str, RollingHistogram] = {}
+        self.counters: Dict[str, int] = collections.defaultdict(int)
+        self.gauges: Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        """
+            Measures the duration of a phase
+
+            :param phase: name of the phase
+        """
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def add_time(self, phase: str, duration: float) -> None:
+        """
+            Adds the duration of a phase
+
+            :param phase: name of the phase
+            :param duration: duration in seconds
+        """
+        if phase not in self.timings:
+            self.timings[phase] = RollingHistogram()
+
+        self.timings[phase].add(duration)
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        """
+            Increments a counter
+
+            :param counter: name of the counter
+            :param value: value added to the counter
+        """
+        self.counters[counter] += value
+
+    def set_gauge(self, gauge: str, value: float) -> None:
+        """
+            Sets the value of a gauge
+
+            :param gauge: name of the gauge
+            :param value: new value
+        """
+        self.gauges[gauge] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+            Gets the current values of all metrics
+
+            :return: summaries of timings (in seconds), counters and gauges
+        """
+        return {
+            'timings': {phase: histogram.summary() for phase, histogram in self.timings.items()},
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges)
+        }
+
+    def log(self, logger: logging.Logger) -> None:
+        """
+            Logs a snapshot of metrics as a json line
+
+            :param logger: logger used to write the line
+        """
+        logger.info('metrics %s', json.dumps(self.snapshot(), separators=(',', ':')))
@@ -0,0 +1,176 @@
+"""
+    This module defines an http endpoint that exports metrics
+    of the broadcaster in the text format of Prometheus.
+
+    The server runs in the event loop of the broadcaster and only
+    listens on localhost. Each sample has a label with the race id.
+"""
+import collections
+import os
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from uctl2_back.notifier import Notifier
+
+METRICS_PATH = '/metrics'
+PREFIX = 'uctl2_'
+
+# (quantile label, key in the summary of a histogram)
+QUANTILES = (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99'))
+
+COUNTERS_HELP = {
+    'rows_parsed': 'Lines of the race file read by the broadcaster',
+    'teams_changed': 'Teams whose stage or rank has changed',
+    'events_emitted': 'Events given to the notifier',
+    'events_dropped': 'Events that could not be sent to a client',
+    'bytes_sent': 'Bytes sent to websockets clients',
+    'tick_overruns': 'Loops that lasted longer than the period of the broadcast',
+    'ticks_skipped': 'Reads of the race file skipped because the broadcast was late'
+}
+
+# name -> (type, help, samples)
+Families = Dict[str, Tuple[str, str, List[Tuple[Dict[str, str], float]]]]
+
+
+def get_rss() -> Optional[int]:
+    """
+        Gets the resident memory of the process
+
+        :return: number of bytes, None if it is not available on this system
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # Peak memory, in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    """
+        Formats labels of a sample
+
+        :param labels: values of labels
+        :return: labels between braces, an empty string if there is no label
+    """
+    if len(labels) == 0:
+        return ''
+
+    escaped = (
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_metrics(notifiers: Dict[str, 'Notifier'], now: Optional[float] = None) -> str:
+    """
+        Renders metrics of notifiers in the text format of Prometheus
+
+        :param notifiers: notifiers of broadcasted races, by race id
+        :param now: current time (since the epoch), used to compute the age of race files
+        :return: content of the metrics page
+    """
+    if now is None:
+        now = time.time()
+
+    families: Families = collections.OrderedDict()
+
+    def add_sample(name: str, kind: str, help: str, labels: Dict[str, str], value: float) -> None:
+        families.setdefault(PREFIX + name, (kind, help, []))[2].append((labels, value))
+
+    for race_id, notifier in notifiers.items():
+        race_labels = {'race': race_id}
+        snapshot = notifier.metrics.snapshot()
+
+        for phase, summary in snapshot['timings'].items():
+            name = 'send_lag_seconds' if phase == 'send_lag' else 'loop_phase_seconds'
+            help = 'Delay between the creation of events and their sending' if phase == 'send_lag' else 'Duration of the phases of the broadcast loop'
+            labels = race_labels if phase == 'send_lag' else dict(race_labels, phase=phase)
+
+            for quantile, key in QUANTILES:
+                add_sample(name, 'summary', help, dict(labels, quantile=quantile), summary[key])
+
+            add_sample(name + '_sum', 'summary', help, labels, summary['sum'])
+            add_sample(name + '_count', 'summary', help, labels, summary['count'])
+
+        for counter, value in snapshot['counters'].items():
+            add_sample(counter + '_total', 'counter', COUNTERS_HELP.get(counter, counter), race_labels, value)
+
+        add_sample('clients', 'gauge', 'Connected websockets clients', race_labels, len(notifier.clients))
+        add_sample('event_queue_depth', 'gauge', 'Events waiting to be sent', race_labels, notifier.events.qsize())
+
+        if 'last_update' in snapshot['gauges']:
+            add_sample('race_file_age_seconds', 'gauge', 'Age of the last change of the race file', race_labels,
+                       max(0.0, now - snapshot['gauges']['last_update']))
+
+        for client, lag in list(notifier.client_lags.items()):
+            address = getattr(client, 'remote_address', None)
+            client_id = '%s:%s' % address[:2] if address else str(id(client))
+
+            add_sample('client_send_lag_seconds', 'gauge', 'Delay of the last event sent to a client', dict(race_labels, client=client_id), lag)
+
+    rss = get_rss()
+    if rss is not None:
+        add_sample('process_resident_memory_bytes', 'gauge', 'Resident memory of the broadcaster', {}, rss)
+
+    lines = []
+    described = set()
+
+    for name, (kind, help, samples) in families.items():
+        # _sum and _count samples belong to the family of their summary
+        family = name[:-len('_sum')] if kind == 'summary' and name.endswith('_sum') else name
+        family = family[:-len('_count')] if kind == 'summary' and family.endswith('_count') else family
+
+        if family not in described:
+            described.add(family)
+            lines.append('# HELP %s %s' % (family, help))
+            lines.append('# TYPE %s %s' % (family, kind))
+
+        for labels, value in samples:
+            lines.append('%s%s %s' % (name, format_labels(labels), repr(float(value))))
+
+    return '\n'.join(lines) + '\n'
+
+
+def create_metrics_handler(notifiers: Dict[str, 'Notifier']) -> Callable[[web.Request], Awaitable[web.Response]]:
+    """
+        Creates an aiohttp handler that renders metrics
+
+        :param notifiers: notifiers of broadcasted races, by race id
+        :return: request handler
+    """
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=render_metrics(notifiers), content_type='text/plain', charset='utf-8')
+
+    return handle_metrics
+
+
+async def start_metrics_server(notifiers: Dict[str, 'Notifier'], port: int, host: str = '127.0.0.1') -> web.AppRunner:
+    """
+        Starts the http server of metrics in the current event loop
+
+        :param notifiers: notifiers of broadcasted races, by race id
+        :param port: port of the server
+        :param host: interface of the server, localhost by default
+        :return: runner of the server, it should be cleaned up to stop the server
+    """
+    app = web.Application()
+    app.router.add_get(METRICS_PATH, create_metrics_handler(notifiers))
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    return runner
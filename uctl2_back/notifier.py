@@ -1,11 +1,14 @@
 import asyncio
 import json
 import logging
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
 
 import websockets
 
 import uctl2_back.events as customEvent
+from uctl2_back.metrics import Metrics
 
 if TYPE_CHECKING:
     from uctl2_back.race import Race
@@ -15,10 +18,17 @@ EventList = List[Dict[str, Any]]
 
 class Notifier:
 
-    def __init__(self, race: 'Race'):
+    def __init__(self, race: 'Race', metrics: Optional[Metrics] = None):
         self.race = race
+        self.metrics = Metrics() if metrics is None else metrics
         self.clients: Set[websockets.WebSocketServerProtocol] = set()
-        self.events: asyncio.Queue[Optional[EventList]] = asyncio.Queue(50)
+        self.client_levels: Dict[websockets.WebSocketServerProtocol, int] = {}
+
+        # Number of seconds between the creation of the last event sent to a client and its sending
+        self.client_lags: Dict[websockets.WebSocketServerProtocol, float] = {}
+
+        # Events are queued with their creation time (perf_counter)
+        self.events: asyncio.Queue[Optional[Tuple[float, EventList]]] = asyncio.Queue(50)
         self.delayedEvents: EventList = []
         self.stop = asyncio.get_event_loop().create_future()
 
@@ -29,10 +39,10 @@ class Notifier:
             :param id: id of the event
             :param payload: optional data for this event, could be None
         """
-        await self.events.put([{
+        await self.events.put((time.perf_counter(), [{
             'id': id,
             'payload': payload
-        }])
+        }]))
 
 
     def broadcast_event_later(self, event: Dict[str, Any]) -> None:
@@ -40,7 +50,7 @@ class Notifier:
 
     async def broadcast_events(self) -> None:
         if len(self.delayedEvents) > 0:
-            await self.events.put(self.delayedEvents.copy())
+            await self.events.put((time.perf_counter(), self.delayedEvents.copy()))
             self.delayedEvents = []
 
 
@@ -52,29 +62,77 @@ class Notifier:
         logger = logging.getLogger(__name__)
 
         while True:
-            event = await self.events.get()
+            item = await self.events.get()
 
-            if event is None:
+            if item is None:
                 break
 
+            created_at, event = item
+
             logger.debug(event)
 
-            raw_event = json.dumps(event)
+            send_start = time.perf_counter()
+            self.metrics.increment('events_emitted', len(event))
+            self.metrics.set_gauge('clients', len(self.clients))
+
+            # The race setup contains racepoints with the level of detail requested by each client
+            has_setup = any(item['id'] == customEvent.RACE_SETUP for item in event)
+            raw_events: Dict[int, str] = {}
 
             for client in list(self.clients):
+                level = self.client_levels.get(client, 0) if has_setup else 0
+
+                if level not in raw_events:
+                    raw_events[level] = json.dumps(self.render_event(event, level) if has_setup else event)
+
                 try:
-                    await client.send(raw_event)
+                    await client.send(raw_events[level])
                 except websockets.ConnectionClosed:
                     self.clients.remove(client)
+                    self.client_levels.pop(client, None)
+                    self.client_lags.pop(client, None)
+                    self.metrics.increment('events_dropped', len(event))
+                else:
+                    lag = time.perf_counter() - created_at
+                    self.client_lags[client] = lag
+                    self.metrics.add_time('send_lag', lag)
+                    self.metrics.increment('bytes_sent', len(raw_events[level]))
+
+            self.metrics.add_time('send', time.perf_counter() - send_start)
+
+    def render_event(self, event: EventList, level: int) -> EventList:
+        """
+            Replaces racepoints of race setup events with the given level of detail
+
+            :param event: list of events
+            :param level: level of detail of racepoints
+            :return: list of events
+        """
+        return [
+            dict(item, payload=dict(item['payload'], racePoints=self.race.get_racepoints(level))) if item['id'] == customEvent.RACE_SETUP else item
+            for item in event
+        ]
 
 
-    async def _consumer_handler(self, ws: websockets.WebSocketServerProtocol, path: str) -> None:
+    async def add_client(self, ws: websockets.WebSocketServerProtocol, path: str) -> None:
+        """
+            Adds a client and sends it the race setup
+
+            The coroutine ends when the notifier is stopped.
+
+            :param ws: connection of the client
+            :param path: path of the websocket request, with the level of detail of racepoints
+        """
+        level = read_level(path)
+
         self.clients.add(ws)
+        self.client_levels[ws] = level
+        self.metrics.set_gauge('clients', len(self.clients))
 
         if self.race is not None:
             await ws.send(json.dumps([{
                 'id': customEvent.RACE_SETUP,
-                'payload': self.race.serialize()
+                'payload': self.race.serialize(level)
             }]))
 
         # The handler needs to wait the end of the server in order
@@ -88,7 +146,7 @@ class Notifier:
             :param port: port of the websockets server
             :type port: int
         """
-        async with websockets.serve(self._consumer_handler, '127.0.0.1', port):
+        async with websockets.serve(self.add_client, '127.0.0.1', port):
             await self.stop
 
     async def stop_notifier(self) -> None:
@@ -97,3 +155,19 @@ class Notifier:
         """
         self.stop.set_result(1)
         await self.events.put(None)
+
+
+def read_level(path: str) -> int:
+    """
+        Reads the level of detail requested by a client
+
+        The level is given with the query parameter "lod", for example : /?lod=2.
+        If there is no valid level then 0 (all racepoints) is returned.
+
+        :param path: path of the websocket request
+        :return: requested level of detail
+    """
+    try:
+        return max(int(parse_qs(urlsplit(path).query)['lod'][0]), 0)
+    except (KeyError, ValueError):
+        return 0
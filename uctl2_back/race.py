@@ -1,7 +1,9 @@
 """
     This module defines the Race class
 """
-from typing import TYPE_CHECKING, Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
 
 from uctl2_back.race_state import RaceStatus
 from uctl2_back.team import Team
@@ -10,6 +12,9 @@ if TYPE_CHECKING:
     from uctl2_back.stage import Stage
     from uctl2_back.uctl2_setup import PointsWithDistance
 
+# Distance (in meters) between two entries of the location table of a race
+LOCATION_RESOLUTION = 5
+
 
 class Race:
 
@@ -17,7 +22,8 @@ class Race:
         Represents a race
     """
 
-    def __init__(self, name: str, racepoints: List['PointsWithDistance'], stages: List['Stage'], tick_step: int) -> None:
+    def __init__(self, name: str, racepoints: List['PointsWithDistance'], stages: List['Stage'], tick_step: int,
+                 levels: Optional[List[List['PointsWithDistance']]] = None, locations: Optional[np.ndarray] = None) -> None:
         """
             Creates a new race
 
@@ -29,10 +35,20 @@ class Race:
             In a real race, this parameter equals 1.
             The tick_step must be strictely positive.
 
+            The levels parameter contains simplified racepoints, grouped by stages,
+            for each level of detail. Level 0 is always the given racepoints.
+            They are only sent to clients, positions of teams are computed
+            with all racepoints.
+
+            The locations parameter is a table computed by :func:`compute_location_table`.
+            If it is not given, it will be computed from racepoints.
+
             :param name: name of the race
-            :param racepoints: gps points grouped by stages
+            :param racepoints: gps points grouped by stages, each group is a list or an array of points
             :param stages: list of stages
             :param tick_step: speed of the race (equals to 1 when it is a real race)
+            :param levels: racepoints grouped by stages for each level of detail
+            :param locations: gps position of the route every :const:`LOCATION_RESOLUTION` meters
             :raises ValueError: if a stage is not associated to a list of racepoints
             :raises ValueError: if tick_step is negative
         """
@@ -45,7 +61,6 @@ class Race:
         self.name = name
         self.distance = 0
         self.racepoints = racepoints
-        self.plain_racepoints = [(item[0], item[1]) for sublist in self.racepoints for item in sublist]
         self.status = RaceStatus.WAITING
         self.start_time: int = 0
         self.teams: Dict[int, Team] = {}
@@ -54,6 +69,15 @@ class Race:
         self.real_length = sum(stage.length for stage in stages)
         self.tick_step = tick_step
 
+        self.levels = [racepoints] + list(levels[1:]) if levels else [racepoints]
+        self._serialized_levels: Dict[int, List[Any]] = {}
+
+        if locations is None:
+            locations = compute_location_table(np.concatenate([np.asarray(stagepoints, dtype=np.float64).reshape(-1, 4) for stagepoints in racepoints] or [np.empty((0, 4))]))
+
+        # Teams share this table to find their position from their covered distance
+        self.locations = locations
+
     def add_team(self, bib: int, name: str) -> None:
         """
             Adds a new team
@@ -75,10 +99,47 @@ class Race:
         for bib in self.teams:
             self.teams[bib] = Team(self, bib, self.teams[bib].name)
 
-    def serialize(self) -> Dict[str, Any]:
+    def get_location(self, distance: float) -> Tuple[float, float]:
+        """
+            Gets the gps position on the route at the given distance from the start
+
+            The position is read from the location table, it is interpolated
+            between racepoints. Distances outside of the route give the position
+            of its first or last point.
+
+            :param distance: distance from the start (in meters)
+            :return: gps position (latitude, longitude), (0, 0) if the route is empty
+        """
+        if len(self.locations) == 0:
+            return (0, 0)
+
+        index = min(max(int(distance / LOCATION_RESOLUTION + 0.5), 0), len(self.locations) - 1)
+        lat, lon = self.locations[index].tolist()
+
+        return (lat, lon)
+
+    def get_racepoints(self, level: int = 0) -> List[Any]:
+        """
+            Gets serialized racepoints for the given level of detail
+
+            Serialized racepoints are computed only once per level.
+            If the level does not exist, then the closest one will be used.
+
+            :param level: level of detail (0 = all racepoints)
+            :return: racepoints grouped by stages (lat, lon, alt, distance from start)
+        """
+        level = min(max(level, 0), len(self.levels) - 1)
+
+        if level not in self._serialized_levels:
+            self._serialized_levels[level] = [np.asarray(stagepoints, dtype=np.float64).reshape(-1, 4).tolist() for stagepoints in self.levels[level]]
+
+        return self._serialized_levels[level]
+
+    def serialize(self, level: int = 0) -> Dict[str, Any]:
         """
             Serializes instance
 
+            :param level: level of detail of racepoints
             :return: serialized instance
         """
         return {
@@ -86,9 +147,29 @@ class Race:
             'distance': self.distance,
             'realDistance': self.real_length,
             'stages': [stage.serialize() for stage in self.stages],
-            'racePoints': self.racepoints,
+            'racePoints': self.get_racepoints(level),
             'startTime': self.start_time,
             'teams': list(team.serialize() for team in self.teams.values()),
             'status': self.status,
             'tickStep': self.tick_step
         }
+
+
+def compute_location_table(racepoints: np.ndarray, resolution: float = LOCATION_RESOLUTION) -> np.ndarray:
+    """
+        Computes the gps position of the route at regular distances
+
+        The entry i of the table is the position at i * resolution meters from
+        the start. It is interpolated between the two surrounding racepoints.
+
+        :param racepoints: array of racepoints (lat, lon, alt, distance from start), sorted by distance
+        :param resolution: distance (in meters) between two entries
+        :return: array of shape (n, 2) containing positions (latitude, longitude)
+    """
+    if len(racepoints) == 0:
+        return np.empty((0, 2))
+
+    distances = racepoints[:, 3]
+    offsets = np.arange(int(np.ceil(distances[-1] / resolution)) + 1) * resolution
+
+    return np.column_stack((np.interp(offsets, distances, racepoints[:, 0]), np.interp(offsets, distances, racepoints[:, 1])))
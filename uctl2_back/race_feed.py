@@ -0,0 +1,297 @@
+"""
+    This module defines feeds that give records of the race
+    to the broadcaster.
+
+    The file feed reads the race file written by the timing software.
+    The pipe feed receives records directly from a simulator
+    through a multiprocessing pipe : the first message is a snapshot
+    of all records, next ones only contain records that changed.
+    The memory feed is used when the simulator runs in the same event loop.
+"""
+import abc
+import asyncio
+import csv
+import logging
+import os
+import time
+from multiprocessing.connection import Connection
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from uctl2_back import race_file
+
+if TYPE_CHECKING:
+    from uctl2_back.clock import Clock
+    from uctl2_back.config import Config
+
+# Kinds of messages sent through a pipe
+SNAPSHOT = 0
+UPDATE = 1
+
+# (kind of message, records)
+Message = Tuple[int, List[race_file.Record]]
+
+
+class RaceFeed(abc.ABC):
+
+    """
+        Gives records of the race, one per team
+
+        The attribute last_update is the time (since the epoch)
+        of the last change of records, None if it is unknown.
+    """
+
+    last_update: Optional[float] = None
+
+    @abc.abstractmethod
+    def read_records(self) -> Iterable[race_file.Record]:
+        """
+            Reads the current records of the race
+
+            :return: records, in the order of teams
+            :raises IOError: if records could not be read
+        """
+
+    async def wait(self, clock: 'Clock', delay: float) -> bool:
+        """
+            Waits before reading records again
+
+            :param clock: clock used to wait
+            :param delay: maximum number of seconds to wait
+            :return: True if the wait has been interrupted by new records
+        """
+        await clock.sleep(delay)
+
+        return False
+
+
+class FileFeed(RaceFeed):
+
+    """
+        Reads records from the race file
+    """
+
+    def __init__(self, config: 'Config') -> None:
+        """
+            Creates a new file feed
+
+            :param config: configuration with the path and the encoding of the race file
+        """
+        self.config = config
+
+    def read_records(self) -> Iterable[race_file.Record]:
+        """
+            Reads records from the race file
+
+            A race file is a csv file where values are separated by a tabulation (\t).
+
+            :return: records of the file
+            :raises FileNotFoundError: if the file does not exist
+            :raises IOError: if an error occured while reading the file
+        """
+        with open(self.config.race_file, 'r', encoding=self.config.encoding) as f:
+            self.last_update = os.fstat(f.fileno()).st_mtime
+
+            return list(csv.DictReader(f, delimiter='\t'))
+
+
+class PipeFeed(RaceFeed):
+
+    """
+        Receives records from a simulator through a pipe
+
+        Records are kept in memory and updated with each received message.
+    """
+
+    def __init__(self, connection: Connection) -> None:
+        """
+            Creates a new pipe feed
+
+            :param connection: receiving end of the pipe
+        """
+        self.connection = connection
+        self._records: Dict[Any, race_file.Record] = {}
+
+    def receive(self) -> int:
+        """
+            Applies messages waiting in the pipe
+
+            :return: number of received messages
+            :raises IOError: if the pipe has been closed by the simulator
+        """
+        count = 0
+
+        try:
+            while self.connection.poll():
+                kind, records = self.connection.recv()
+
+                if kind == SNAPSHOT:
+                    self._records = {}
+
+                for record in records:
+                    self._records[record[race_file.BIB_NUMBER_FORMAT]] = record
+
+                count += 1
+        except EOFError:
+            raise IOError('The simulator has closed the feed')
+
+        if count > 0:
+            self.last_update = time.time()
+
+        return count
+
+    def read_records(self) -> Iterable[race_file.Record]:
+        """
+            Reads the last records received from the simulator
+
+            :return: records, in the order of the last snapshot
+            :raises IOError: if the pipe has been closed by the simulator
+        """
+        self.receive()
+
+        return list(self._records.values())
+
+    async def wait(self, clock: 'Clock', delay: float) -> bool:
+        """
+            Waits for a new message or for the given delay
+
+            :param clock: clock used to wait
+            :param delay: maximum number of seconds to wait
+            :return: True if a message has been received
+        """
+        if self.connection.poll():
+            return True
+
+        loop = asyncio.get_event_loop()
+        readable = loop.create_future()
+        fd = self.connection.fileno()
+
+        loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        sleep = asyncio.ensure_future(clock.sleep(delay))
+
+        try:
+            await asyncio.wait([readable, sleep], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            loop.remove_reader(fd)
+            sleep.cancel()
+
+        return readable.done()
+
+
+class MemoryFeed(RaceFeed):
+
+    """
+        Receives records from a simulator running in the same event loop
+    """
+
+    def __init__(self) -> None:
+        self._records: List[race_file.Record] = []
+        self._updated: Optional[asyncio.Event] = None
+
+    def update(self, rows: List[race_file.Record], changed_bibs: Optional[Iterable[int]] = None) -> None:
+        """
+            Replaces records with rows of the race file
+
+            The broadcast loop waiting for new records is woken up.
+
+            :param rows: rows of the race file, in the order of teams
+            :param changed_bibs: bibs of teams whose row changed, None to convert all rows again
+        """
+        if changed_bibs is None or not len(rows) == len(self._records):
+            self._records = encode_records(rows)
+        else:
+            changed_bibs = set(changed_bibs)
+            self._records = [
+                encode_records([row])[0] if row[race_file.BIB_NUMBER_FORMAT] in changed_bibs else record
+                for row, record in zip(rows, self._records)
+            ]
+
+        self.last_update = time.time()
+        self.wake()
+
+    def wake(self) -> None:
+        """
+            Wakes up the broadcast loop waiting for new records
+        """
+        if self._updated is not None:
+            self._updated.set()
+
+    def read_records(self) -> Iterable[race_file.Record]:
+        return self._records
+
+    async def wait(self, clock: 'Clock', delay: float) -> bool:
+        """
+            Waits for new records or for the given delay
+
+            :param clock: clock used to wait
+            :param delay: maximum number of seconds to wait
+            :return: True if new records have been received
+        """
+        self._updated = asyncio.Event()
+        updated = asyncio.ensure_future(self._updated.wait())
+        sleep = asyncio.ensure_future(clock.sleep(delay))
+
+        try:
+            await asyncio.wait([updated, sleep], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._updated = None
+            updated.cancel()
+            sleep.cancel()
+
+        return updated.done() and not updated.cancelled()
+
+
+class PipeFeedSender:
+
+    """
+        Sends records of a simulator through a pipe
+    """
+
+    def __init__(self, connection: Connection) -> None:
+        """
+            Creates a new sender
+
+            :param connection: sending end of the pipe
+        """
+        self.connection = connection
+        self._snapshot_sent = False
+
+    def send(self, rows: List[race_file.Record], changed_bibs: Optional[Iterable[int]] = None) -> None:
+        """
+            Sends rows of the race file
+
+            The first call sends all rows, next ones only send rows of the given bibs.
+            Values are converted to strings, like in the race file.
+
+            :param rows: rows of the race file, in the order of teams
+            :param changed_bibs: bibs of teams whose row changed, None to send all rows
+        """
+        logger = logging.getLogger(__name__)
+
+        if not self._snapshot_sent or changed_bibs is None:
+            kind, selected_rows = SNAPSHOT, rows
+        else:
+            changed_bibs = set(changed_bibs)
+            kind, selected_rows = UPDATE, [row for row in rows if row[race_file.BIB_NUMBER_FORMAT] in changed_bibs]
+
+            if len(selected_rows) == 0:
+                return
+
+        records = encode_records(selected_rows)
+
+        try:
+            self.connection.send((kind, records))
+        except (BrokenPipeError, EOFError, OSError) as e:
+            logger.warning('Unable to send records to the broadcaster : %s', e)
+            return
+
+        self._snapshot_sent = True
+
+
+def encode_records(rows: Iterable[race_file.Record]) -> List[race_file.Record]:
+    """
+        Converts values of rows to strings, like in the race file
+
+        :param rows: rows of the race file
+        :return: records
+    """
+    return [{column: str(value) for column, value in row.items()} for row in rows]
@@ -1,6 +1,10 @@
 import csv
 import datetime
-from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, TypeVar
+import io
+import os
+import stat
+import tempfile
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, TypeVar
 
 from uctl2_back.exceptions import RaceFileFieldError
 
@@ -23,6 +27,11 @@ T = TypeVar('T')
 Converter = Callable[[Any], T]
 Record = Dict[str, Any]
 
+# Visibility of a stage in a row of the race file
+STAGE_HIDDEN = 0
+STAGE_STARTED = 1
+STAGE_FINISHED = 2
+
 
 def compute_checkpoints_number(record):
     """
@@ -109,34 +118,13 @@ def process_file(simulator: 'Simulator', stages: 'StagesWithInts') -> List[Dict[
 
         This function is used with a simulator.
         The simulator must have its lists headers and rows
-        update to date.
+        update to date. The file is written by the race file writer
+        of the simulator.
 
         :param simulator: an instance to the Simulator class
         :return: new rows for the racefile
     """
-    rows = []
-
-    with open(simulator.race_file, 'w') as f:
-        writer = csv.DictWriter(f, simulator.headers, delimiter='\t')
-        writer.writeheader()
-
-        for team in simulator.race_teams:
-            row = dict(simulator.rows[team['bibNumber']])
-
-            for i, stage in enumerate(stages):
-                stage_cols = stage_columns(i + 1)
-
-                if not team['bibNumber'] in stage[0]:
-                    for stage_col in stage_cols:
-                        row[stage_col] = '0'
-                elif not team['bibNumber'] in stage[1]:
-                    for stage_col in filter(lambda x: not x.startswith('2'), stage_cols):
-                        row[stage_col] = '0'
-
-            rows.append(row)
-            writer.writerow(row)
-
-    return rows
+    return simulator.race_file_writer.write(simulator.race_teams, simulator.rows, stages)
 
 
 def read_split_times(record: Record) -> List[int]:
@@ -280,3 +268,225 @@ def stage_columns(index: int) -> List[str]:
 
     columns = ('Interm (S%d)', 'Clt Interm-1 (S%d)', '2%d|1', '3%d|1')
     return [x % (index,) for x in columns]
+
+
+class RaceFileWriter:
+
+    """
+        Writes a race file from complete rows and visible stages
+
+        Encoded rows are kept in memory : a row is only encoded again
+        when the visibility of one of its stages changes.
+        The file is written in a temporary file that replaces
+        the race file once complete, so readers never see a partial file.
+    """
+
+    def __init__(self, path: str, headers: List[str], encoding: str = 'utf-8') -> None:
+        """
+            Creates a new writer
+
+            :param path: path to the race file
+            :param headers: columns of the race file
+            :param encoding: encoding of the race file
+        """
+        self.path = path
+        self.headers = headers
+        self.encoding = encoding
+
+        # Bibs of teams whose row changed during the last write
+        self.changed_bibs: List[int] = []
+
+        self._buffer = io.StringIO()
+        self._writer = csv.DictWriter(self._buffer, headers, delimiter='\t')
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        self._lines: Dict[int, str] = {}
+        self._visibilities: Dict[int, Tuple[int, ...]] = {}
+
+    def encode_row(self, row: Dict[str, Any]) -> str:
+        """
+            Encodes a row into a line of the race file
+
+            :param row: values of the row
+            :return: encoded line
+        """
+        self._buffer.seek(0)
+        self._buffer.truncate(0)
+        self._writer.writerow(row)
+
+        return self._buffer.getvalue()
+
+    def invalidate(self) -> None:
+        """
+            Forgets encoded rows
+
+            It should be called when complete rows change.
+        """
+        self._rows.clear()
+        self._lines.clear()
+        self._visibilities.clear()
+
+    def write(self, teams: Iterable[Dict[str, Any]], rows: Mapping[int, Dict[str, Any]], stages: Iterable[Tuple[Iterable[int], Iterable[int]]]) -> List[Dict[str, Any]]:
+        """
+            Writes the race file with some stages for each team
+
+            Columns of a stage that a team has not started are replaced with
+            :const:`EMPTY_VALUE_FORMAT`. When the team has started
+            the stage without finishing it, only its entrance time is kept.
+
+            :param teams: teams of the race
+            :param rows: complete rows of the race file, indexed by bib number
+            :param stages: for each timed stage, bibs of teams that have started it and bibs of teams that have finished it
+            :return: rows of the race file
+        """
+        stages = [(set(started), set(finished)) for started, finished in stages]
+        written_rows = []
+        self.changed_bibs = []
+
+        for team in teams:
+            bib = team['bibNumber']
+            visibility = tuple(compute_stage_visibility(bib, stage) for stage in stages)
+
+            if not self._visibilities.get(bib) == visibility:
+                self._visibilities[bib] = visibility
+                self._rows[bib] = hide_stages(rows[bib], visibility)
+                self._lines[bib] = self.encode_row(self._rows[bib])
+                self.changed_bibs.append(bib)
+
+            written_rows.append(self._rows[bib])
+
+        header = self.encode_row(dict(zip(self.headers, self.headers)))
+        # Each write has its own temporary file, several writers could update the same race file
+        directory, name = os.path.split(os.path.abspath(self.path))
+        f = tempfile.NamedTemporaryFile('w', encoding=self.encoding, newline='', dir=directory, prefix=name + '.', suffix='.tmp', delete=False)
+
+        try:
+            with f:
+                f.write(header)
+                f.write(''.join(self._lines[team['bibNumber']] for team in teams))
+
+            # Temporary files are only readable by their owner, the race file keeps its permissions
+            os.chmod(f.name, get_file_mode(self.path))
+            os.replace(f.name, self.path)
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+        return written_rows
+
+
+def get_file_mode(path: str) -> int:
+    """
+        Gets the permissions of a file that replaces another one
+
+        The permissions of the replaced file are kept. When it does not exist,
+        the permissions are the ones of a file created with open.
+
+        :param path: path of the replaced file
+        :return: permission bits
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        # The umask can only be read by setting it
+        umask = os.umask(0)
+        os.umask(umask)
+
+        return 0o666 & ~umask
+
+
+def compute_stage_visibility(bib: int, stage: Tuple[Iterable[int], Iterable[int]]) -> int:
+    """
+        Computes the visibility of a stage for a team
+
+        :param bib: bib number of the team
+        :param stage: bibs of teams that have started the stage and bibs of teams that have finished it
+        :return: :const:`STAGE_HIDDEN`, :const:`STAGE_STARTED` or :const:`STAGE_FINISHED`
+    """
+    if not bib in stage[0]:
+        return STAGE_HIDDEN
+
+    return STAGE_FINISHED if bib in stage[1] else STAGE_STARTED
+
+
+def hide_stages(row: Dict[str, Any], visibility: Tuple[int, ...]) -> Dict[str, Any]:
+    """
+        Replaces values of stages that are not visible
+
+        :param row: complete row of the race file
+        :param visibility: visibility of each timed stage
+        :return: a new row
+    """
+    row = dict(row)
+
+    for i, stage_visibility in enumerate(visibility):
+        if stage_visibility == STAGE_FINISHED:
+            continue
+
+        for stage_col in stage_columns(i + 1):
+            # The entrance time is kept when the team is in the stage
+            if stage_visibility == STAGE_HIDDEN or not stage_col.startswith('2'):
+                row[stage_col] = EMPTY_VALUE_FORMAT
+
+    return row
+
+
+class RacefileDeltas:
+
+    """
+        Tracks rows of the race file emitted to clients
+
+        Clients receive the whole race file once, then only the cells
+        that changed. Each update has a version number : a client that
+        misses an update asks for the whole race file again.
+    """
+
+    def __init__(self) -> None:
+        self.version = 0
+        self.rows: List[Dict[str, Any]] = []
+        self._bibs: List[Any] = []
+
+    def update(self, rows: List[Dict[str, Any]]) -> Optional[Dict[Any, Dict[str, Any]]]:
+        """
+            Computes cells that changed since the last update
+
+            The version is incremented when something has changed.
+
+            :param rows: new rows of the race file
+            :return: changed cells indexed by bib number and column, or None if teams have changed (the whole race file must be sent)
+        """
+        bibs = [row[BIB_NUMBER_FORMAT] for row in rows]
+        previous_rows = self.rows
+        self.rows = list(rows)
+
+        if not bibs == self._bibs:
+            self._bibs = bibs
+            self.version += 1
+            return None
+
+        changes = {}
+
+        for previous_row, row in zip(previous_rows, rows):
+            # The race file writer returns the same instance for rows that did not change
+            if previous_row is row:
+                continue
+
+            cells = {column: value for column, value in row.items() if not previous_row.get(column) == value}
+
+            if len(cells) > 0:
+                changes[row[BIB_NUMBER_FORMAT]] = cells
+
+        if len(changes) > 0:
+            self.version += 1
+
+        return changes
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+            Gets the whole race file with its version
+
+            :return: payload of an event 'racefile'
+        """
+        return {
+            'version': self.version,
+            'rows': self.rows
+        }
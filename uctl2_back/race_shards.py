@@ -0,0 +1,312 @@
+"""
+    This module defines a reader that computes states of teams
+    in several worker processes.
+
+    The race file is split into contiguous ranges of bytes, one per worker.
+    Each worker reads the lines that start in its range directly from the file
+    and only parses lines that have changed since its last read : it returns
+    the bib number of teams whose line has not changed and the parsed times
+    of the other ones. The main process keeps the states of unchanged teams,
+    updates covered distances, ranks all teams and keeps track of changes
+    between two reads.
+"""
+import collections
+import csv
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+from uctl2_back.exceptions import RaceEmptyError, RaceFileChangedError, RaceFileFieldError
+from uctl2_back.race_state import RaceState, parse_team_state, read_race_header, update_race_status
+from uctl2_back.team_state import TeamState
+
+if TYPE_CHECKING:
+    from uctl2_back.config import Config
+    from uctl2_back.stage import Stage
+
+# Parsed line of a team, computed by a worker
+TeamResult = collections.namedtuple('TeamResult', ['bib_number', 'name', 'current_stage', 'current_time_index', 'start_time',
+                                                   'intermediate_times', 'split_times', 'stage_ranks', 'team_finished'])
+
+# Version of the race file : (inode, modification time in nanoseconds, size)
+FileVersion = Tuple[int, int, int]
+
+# Number of reads of the race file before giving up when it is replaced during each read
+MAX_ATTEMPTS = 3
+
+# State of a worker process
+_path = ''
+_encoding = 'utf-8'
+_stages: List['Stage'] = []
+
+# Lines read by the worker at its last read, with the bib number of their team (None for invalid lines)
+_lines: Dict[str, Optional[int]] = {}
+
+
+def init_worker(path: str, encoding: str, stages: List['Stage']) -> None:
+    """
+        Initializes a worker process
+
+        :param path: path of the race file
+        :param encoding: encoding of the race file
+        :param stages: list of stages
+    """
+    global _path, _encoding, _stages, _lines
+
+    _path = path
+    _encoding = encoding
+    _stages = stages
+    _lines = {}
+
+
+def get_file_version(stat: os.stat_result) -> FileVersion:
+    """
+        Gets the version of a file from its status
+
+        A file replaced with os.replace has a new inode.
+
+        :param stat: status of the file
+        :return: version of the file
+    """
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def read_lines(f: IO[bytes], start: int, end: int) -> bytes:
+    """
+        Reads lines that start in a range of bytes of a file
+
+        The last line is read until its end, even after the end of the range.
+
+        :param f: file opened in binary mode
+        :param start: first byte of the range
+        :param end: end of the range (excluded)
+        :return: lines, with their line endings
+    """
+    f.seek(max(start - 1, 0))
+
+    # Skips the end of a line that has started before the range
+    if start > 0:
+        f.readline()
+
+    position = f.tell()
+    if position >= end:
+        return b''
+
+    data = f.read(end - position)
+    if len(data) > 0 and not data.endswith(b'\n'):
+        data += f.readline()
+
+    return data
+
+
+def read_shard(version: FileVersion, start: int, end: int, stages_number: int, reset: bool) -> List[Union[int, TeamResult]]:
+    """
+        Reads the lines of the race file that start in a range of bytes, in a worker process
+
+        :param version: version of the race file seen by the main process
+        :param start: first byte of the range
+        :param end: end of the range (excluded)
+        :param stages_number: number of timed stages in the race file
+        :param reset: True to parse all lines again
+        :return: for each valid line, the bib number of the team if its line has not changed, its parsed times otherwise
+        :raises RaceFileChangedError: if the race file has been replaced since the main process has seen it
+        :raises IOError: if the race file could not be read
+    """
+    global _lines
+
+    logger = logging.getLogger(__name__)
+
+    with open(_path, 'rb') as f:
+        if not get_file_version(os.fstat(f.fileno())) == version:
+            raise RaceFileChangedError('The race file has been replaced')
+
+        header = f.readline().decode(_encoding)
+        data = read_lines(f, max(start, f.tell()), end)
+
+    fieldnames = next(csv.reader([header], delimiter='\t'), [])
+    last_lines = {} if reset else _lines
+    lines: Dict[str, Optional[int]] = {}
+    results: List[Union[int, TeamResult]] = []
+
+    for line in data.decode(_encoding).splitlines():
+        if line == '':
+            continue
+
+        if line in last_lines:
+            bib_number = last_lines[line]
+            lines[line] = bib_number
+
+            if bib_number is not None:
+                results.append(bib_number)
+
+            continue
+
+        lines[line] = None
+        record = next(csv.DictReader([line], fieldnames=fieldnames, delimiter='\t'))
+
+        try:
+            team_state = parse_team_state(record, _stages, stages_number, None)
+        except RaceFileFieldError as e:
+            logger.error('Bib error : %s', e)
+            continue
+
+        lines[line] = team_state.bib_number
+        results.append(TeamResult(team_state.bib_number, team_state.name, team_state.current_stage.get_value(), team_state.current_time_index,
+                                  team_state.start_time, team_state.intermediate_times, team_state.split_times, team_state.stage_ranks,
+                                  team_state.team_finished.get_value()))
+
+    _lines = lines
+
+    return results
+
+
+def restore_team_state(result: TeamResult, last_team_state: Optional[TeamState]) -> TeamState:
+    """
+        Creates a team state from the result of a worker
+
+        The covered distance is not updated.
+
+        :param result: parsed line of the team
+        :param last_team_state: last state of the team, could be None
+        :return: state of the team
+    """
+    team_state = TeamState(result.bib_number, result.name, last_team_state)
+    team_state.current_stage.set_value(result.current_stage)
+    team_state.current_time_index = result.current_time_index
+    team_state.start_time = result.start_time
+    team_state.intermediate_times = result.intermediate_times
+    team_state.split_times = result.split_times
+    team_state.stage_ranks = result.stage_ranks
+    team_state.team_finished.set_value(result.team_finished)
+
+    return team_state
+
+
+def get_shard_bounds(count: int, shards: int) -> List[Tuple[int, int]]:
+    """
+        Splits a sequence into contiguous shards of the same size
+
+        :param count: size of the sequence
+        :param shards: number of shards
+        :return: (start, end) indexes of each shard
+    """
+    return [(count * i // shards, count * (i + 1) // shards) for i in range(shards)]
+
+
+class ShardedStateReader:
+
+    """
+        Reads states of the race with several worker processes
+
+        Each range of the race file is given to the same worker at each read,
+        so that the worker can skip lines that it has already parsed.
+        Lines that move to another range are parsed again by their new worker.
+    """
+
+    def __init__(self, config: 'Config', shards: int) -> None:
+        """
+            Creates a new reader and starts its workers
+
+            :param config: a valid configuration
+            :param shards: number of worker processes
+            :raises ValueError: if the number of shards is not strictly positive
+        """
+        if shards <= 0:
+            raise ValueError('shards must be strictely positive')
+
+        self.config = config
+
+        # Time (since the epoch) of the last change of the race file
+        self.last_update: Optional[float] = None
+
+        # One executor per shard : a shard is always read by the same process
+        self.executors = [
+            ProcessPoolExecutor(max_workers=1, initializer=init_worker, initargs=(config.race_file, config.encoding, config.stages))
+            for _ in range(shards)
+        ]
+
+        # Workers only know lines of the last state given by this reader
+        self._last_state: Optional[RaceState] = None
+
+    def read(self, loop_time: float, last_state: Optional[RaceState]) -> RaceState:
+        """
+            Extracts the state of the race from the race file
+
+            It gives the same state as :func:`uctl2_back.race_state.read_race_state`.
+            States of teams whose line has not changed are kept : covered distances
+            modified since the last read (with gps positions or extrapolations) are used.
+
+            :param loop_time: elapsed time in seconds since the last read
+            :param last_state: last state of the race, could be None
+            :return: the current state of the race
+            :raises RaceEmptyError: if there is no valid line
+            :raises IOError: if the race file could not be read
+        """
+        logger = logging.getLogger(__name__)
+
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return self._read(loop_time, last_state)
+            except RaceFileChangedError:
+                logger.debug('The race file has been replaced during the read (attempt %d)', attempt + 1)
+
+        raise IOError('The race file has been replaced during %d reads' % (MAX_ATTEMPTS,))
+
+    def _read(self, loop_time: float, last_state: Optional[RaceState]) -> RaceState:
+        stat = os.stat(self.config.race_file)
+        race_state = RaceState(last_state)
+
+        reset = last_state is None or last_state is not self._last_state
+        self._last_state = None
+
+        if last_state is None:
+            with open(self.config.race_file, 'r', encoding=self.config.encoding) as f:
+                record = next(csv.DictReader(f, delimiter='\t'), None)
+
+            if record is None:
+                raise RaceEmptyError('coup dur')
+
+            read_race_header(race_state, record)
+
+        version = get_file_version(stat)
+        futures = [
+            executor.submit(read_shard, version, start, end, race_state.stages_number, reset)
+            for executor, (start, end) in zip(self.executors, get_shard_bounds(stat.st_size, len(self.executors)))
+        ]
+
+        # Teams are found by bib number : lines may move between two reads
+        last_teams = {} if last_state is None else {team_state.bib_number: team_state for team_state in last_state.teams}
+        stages = self.config.stages
+        tick_step = self.config.tick_step
+
+        # Results are all received before the last states are modified
+        results = [future.result() for future in futures]
+
+        for shard_results in results:
+            for result in shard_results:
+                if isinstance(result, int):
+                    team_state = last_teams[result]
+                    team_state.clear_changes()
+                else:
+                    team_state = restore_team_state(result, last_teams.get(result.bib_number))
+
+                team_state.update_covered_distance(stages, tick_step, loop_time)
+                race_state.teams.append(team_state)
+
+        if len(race_state.teams) == 0:
+            raise RaceEmptyError('coup dur')
+
+        update_race_status(race_state)
+
+        self.last_update = stat.st_mtime
+        self._last_state = race_state
+
+        return race_state
+
+    def close(self) -> None:
+        """
+            Stops worker processes
+        """
+        for executor in self.executors:
+            executor.shutdown()
@@ -148,6 +148,95 @@ def get_current_stage_index(started_stages: int, completed_stages: int, stages:
     return stage_index if started_stages == completed_stages else stage_index + 1
 
 
+def read_team_state(record: race_file.Record, stages: List['Stage'], tick_step: int, stages_number: int, loop_time: float,
+                    last_team_state: Optional[TeamState]) -> TeamState:
+    """
+        Extracts the state of a team from a line of the race file
+
+        :param record: line of the race file
+        :param stages: list of stages
+        :param tick_step: speed of the simulation (=1 if it is a real race)
+        :param stages_number: number of timed stages in the race file
+        :param loop_time: elapsed time in seconds since the last call to this function
+        :param last_team_state: last state of the team, could be None
+        :return: the current state of the team
+        :raises RaceFileFieldError: if the bib number is not valid
+    """
+    team_state = parse_team_state(record, stages, stages_number, last_team_state)
+
+    # The covered distance of a team that has not started is 0
+    team_state.update_covered_distance(stages, tick_step, loop_time)
+
+    return team_state
+
+
+def parse_team_state(record: race_file.Record, stages: List['Stage'], stages_number: int, last_team_state: Optional[TeamState]) -> TeamState:
+    """
+        Extracts times and the current stage of a team from a line of the race file
+
+        The covered distance is not updated.
+
+        :param record: line of the race file
+        :param stages: list of stages
+        :param stages_number: number of timed stages in the race file
+        :param last_team_state: last state of the team, could be None
+        :return: the current state of the team
+        :raises RaceFileFieldError: if the bib number is not valid
+    """
+    bib_number: int = race_file.get_key(record, race_file.BIB_NUMBER_FORMAT, convert=int)
+
+    split_times = race_file.read_split_times(record)
+    stages_rank = race_file.read_stage_ranks(record)
+
+    started_stage_times = race_file.read_stage_start_times(record)
+    ended_stage_times = race_file.read_stage_end_times(record)
+
+    team_started = len(started_stage_times) > 0
+    team_finished = len(ended_stage_times) == stages_number
+
+    if team_finished:
+        current_stage = len(stages) - 1
+    else:
+        current_stage = get_current_stage_index(len(started_stage_times), len(ended_stage_times), stages)
+
+    start_time = started_stage_times[0] if team_started else None
+
+    intermediate_times = list(ended_stage_times)
+    current_time_index = 0 if len(ended_stage_times) == 0 else current_stage - 1
+
+    # Creates a new team state for each team in the file
+    team_state = TeamState(bib_number, record[race_file.TEAM_NAME_FORMAT], last_team_state)
+    team_state.current_time_index = current_time_index
+    team_state.current_stage.set_value(current_stage)
+    team_state.intermediate_times = intermediate_times
+    team_state.split_times = split_times
+    team_state.start_time = start_time
+    team_state.stage_ranks = stages_rank
+    team_state.team_finished.set_value(team_finished)
+
+    transition_times = compute_transition_times(current_stage, started_stage_times, ended_stage_times, stages)
+    team_state.update_stage_times(transition_times)
+
+    return team_state
+
+
+def read_race_header(race_state: RaceState, record: race_file.Record) -> None:
+    """
+        Reads the number of stages and the distance of the race from the first line of the race file
+
+        :param race_state: state of the race to update
+        :param record: first line of the race file
+    """
+    logger = logging.getLogger(__name__)
+
+    race_state.stages_number = race_file.compute_checkpoints_number(record)
+
+    try:
+        race_state.distance = race_file.get_key(record, race_file.DISTANCE_FORMAT, convert=float)
+    except RaceFileFieldError as e:
+        logger.error(e)
+
+
 def read_race_state(reader: Iterable[race_file.Record], config: 'Config', loop_time: float, last_state: Optional[RaceState]) -> RaceState:
     """
         Extracts the state of the race from the given DictReader
@@ -164,86 +253,45 @@ def read_race_state(reader: Iterable[race_file.Record], config: 'Config', loop_t
 
     race_state = RaceState(last_state)
 
-    race_started = False
-    race_finished = True
-
     for index, record in enumerate(reader):
         if last_state is None and index == 0:
-            race_state.stages_number = race_file.compute_checkpoints_number(record)
+            read_race_header(race_state, record)
 
-            try:
-                race_state.distance = race_file.get_key(record, race_file.DISTANCE_FORMAT, convert=float)
-            except RaceFileFieldError as e:
-                logger.error(e)
+        if last_state is not None and index < len(last_state.teams):
+            last_team_state: Optional[TeamState] = last_state.teams[index]
+        else:
+            last_team_state = None
 
         try:
-            bib_number: int = race_file.get_key(record, race_file.BIB_NUMBER_FORMAT, convert=int)
+            team_state = read_team_state(record, config.stages, config.tick_step, race_state.stages_number, loop_time, last_team_state)
         except RaceFileFieldError as e:
-            logger.error('Bib error : ', e)
+            logger.error('Bib error : %s', e)
             continue
 
-        split_times = race_file.read_split_times(record)
-        stages_rank = race_file.read_stage_ranks(record)
-
-        started_stage_times = race_file.read_stage_start_times(record)
-        ended_stage_times = race_file.read_stage_end_times(record)
-
-        team_started = len(started_stage_times) > 0
-        team_finished = len(ended_stage_times) == race_state.stages_number
-
-        # Computes race state based on team state
-        if team_started:
-            race_started = True
-
-        if not team_finished:
-            race_finished = False
-
-        if team_finished:
-            current_stage = len(config.stages) - 1
-        else:
-            current_stage = get_current_stage_index(len(started_stage_times), len(ended_stage_times), config.stages)
-
-        start_time = started_stage_times[0] if team_started else None
-        current_time_index = current_stage - 1
+        race_state.teams.append(team_state)
 
-        try:
-            if last_state is not None:
-                last_team_state: Optional[TeamState] = last_state.teams[index]
-            else:
-                last_team_state = None
-        except ValueError:
-            last_team_state = None
+    if len(race_state.teams) == 0:
+        raise RaceEmptyError('coup dur')
 
-        intermediate_times = list(ended_stage_times)
-        current_time_index = 0 if len(ended_stage_times) == 0 else current_stage - 1
+    update_race_status(race_state)
 
-        # Creates a new team state for each team in the file
-        team_state = TeamState(bib_number, record[race_file.TEAM_NAME_FORMAT], last_team_state)
-        team_state.current_time_index = current_time_index
-        team_state.current_stage.set_value(current_stage)
-        team_state.intermediate_times = intermediate_times
-        team_state.split_times = split_times
-        team_state.start_time = start_time
-        team_state.stage_ranks = stages_rank
-        team_state.team_finished.set_value(team_finished)
+    return race_state
 
-        transition_times = compute_transition_times(current_stage, started_stage_times, ended_stage_times, config.stages)
-        team_state.update_stage_times(transition_times)
 
-        if race_started:
-            team_state.update_covered_distance(config.stages, config.tick_step, loop_time)
-        else:
-            team_state.covered_distance = 0
+def update_race_status(race_state: RaceState) -> None:
+    """
+        Updates the status of the race from the states of its teams
 
-        race_state.teams.append(team_state)
+        The race is started when a team has started,
+        it is finished when all teams have finished.
 
-    if len(race_state.teams) == 0:
-        raise RaceEmptyError('coup dur')
+        :param race_state: state of the race
+    """
+    race_started = any(team_state.start_time is not None for team_state in race_state.teams)
+    race_finished = all(team_state.team_finished.get_value() for team_state in race_state.teams)
 
     race_state.update_race_status(race_started, race_finished)
 
-    return race_state
-
 
 def read_race_state_from_file(config: 'Config', loop_time: float, last_state: Optional[RaceState]) -> RaceState:
     """
@@ -0,0 +1,193 @@
+"""
+    This module defines a registry of races broadcasted by one process
+
+    Each race has its own broadcast loop, notifier and tracker : parsing,
+    ranking and the race setup are kept per race. One websockets server
+    is shared by all races, a client chooses a race with the path
+    of its request, for example ws://127.0.0.1:5680/relay?lod=2.
+"""
+import asyncio
+import logging
+from typing import Dict, Optional, Union
+from urllib.parse import urlsplit
+
+import websockets
+
+from uctl2_back import uctl2_race
+from uctl2_back.config import Config
+from uctl2_back.control import CommandQueue, ControlChannel
+from uctl2_back.metrics_server import start_metrics_server
+from uctl2_back.notifier import Notifier
+from uctl2_back.race import Race
+from uctl2_back.race_feed import RaceFeed
+from uctl2_back.tracker import DEFAULT_MAX_AGE, TrackerPositions, run_feed
+
+DEFAULT_PORT = 5680
+
+
+class BroadcastedRace:
+
+    """
+        Race broadcasted by a registry
+    """
+
+    def __init__(self, race_id: str, config: Config, race: Race, feed: Optional[RaceFeed] = None,
+                 control: Optional[Union[ControlChannel, CommandQueue]] = None) -> None:
+        """
+            Creates a new broadcasted race
+
+            :param race_id: identifier of the race, used in the path of websockets requests
+            :param config: configuration of the race
+            :param race: instance of the race
+            :param feed: feed that gives records of the race, the race file is read by default
+            :param control: channel used by the manager to send commands, could be None
+        """
+        self.race_id = race_id
+        self.config = config
+        self.race = race
+        self.feed = feed
+        self.control = control
+
+        self.notifier = Notifier(race)
+        self.stop = asyncio.Event()
+
+        if config.tracker is None:
+            self.tracker = None
+        else:
+            self.tracker = TrackerPositions.create(race, config.tracker.get('maxAge', DEFAULT_MAX_AGE))
+
+    async def run(self) -> None:
+        """
+            Broadcasts the race until it is stopped
+        """
+        await asyncio.gather(self.notifier.broadcaster(), self._broadcast())
+
+    async def _broadcast(self) -> None:
+        # Starting the reception of gps positions
+        positions = None if self.tracker is None else asyncio.ensure_future(run_feed(self.tracker, self.config.tracker))
+
+        try:
+            await uctl2_race.broadcast_race(self.race, self.config, self.notifier, None, self.tracker, feed=self.feed,
+                                            control=self.control, stop=self.stop)
+        finally:
+            if positions is not None:
+                positions.cancel()
+
+            await self.notifier.stop_notifier()
+
+
+class RaceRegistry:
+
+    """
+        Runs the broadcast of several races in one event loop
+    """
+
+    def __init__(self) -> None:
+        self.races: Dict[str, BroadcastedRace] = {}
+
+    def add(self, race_id: str, config: Config, race: Race, feed: Optional[RaceFeed] = None,
+            control: Optional[Union[ControlChannel, CommandQueue]] = None) -> BroadcastedRace:
+        """
+            Adds a race to the registry
+
+            The first race is also sent to clients that do not give a race in their path.
+            When the registry holds a single race, it is sent to all clients whatever their path.
+
+            :param race_id: identifier of the race, used in the path of websockets requests
+            :param config: configuration of the race
+            :param race: instance of the race
+            :param feed: feed that gives records of the race, the race file is read by default
+            :param control: channel used by the manager to send commands, could be None
+            :return: the broadcasted race
+            :raises ValueError: if a race with the same identifier already exists
+        """
+        if race_id in self.races:
+            raise ValueError('The race %s is already registered' % (race_id,))
+
+        self.races[race_id] = BroadcastedRace(race_id, config, race, feed, control)
+
+        return self.races[race_id]
+
+    def get(self, path: str) -> Optional[BroadcastedRace]:
+        """
+            Gets the race requested by a client
+
+            :param path: path of the websocket request
+            :return: the requested race, or None if there is no race with this identifier
+        """
+        race_id = read_race_id(path)
+
+        if len(self.races) == 1:
+            return next(iter(self.races.values()))
+
+        if race_id == '' and len(self.races) > 0:
+            return self.races.get('', next(iter(self.races.values())))
+
+        return self.races.get(race_id)
+
+    async def handle_client(self, ws: websockets.WebSocketServerProtocol, path: str) -> None:
+        """
+            Gives a new client to the notifier of the requested race
+
+            :param ws: connection of the client
+            :param path: path of the websocket request
+        """
+        logger = logging.getLogger(__name__)
+
+        broadcasted_race = self.get(path)
+
+        if broadcasted_race is None:
+            logger.warning('Unknown race requested : %s', path)
+            await ws.close(1008, 'Unknown race')
+            return
+
+        await broadcasted_race.notifier.add_client(ws, path)
+
+    async def run(self, port: Optional[int] = DEFAULT_PORT, metrics_port: Optional[int] = None) -> None:
+        """
+            Broadcasts all races until they are stopped
+
+            :param port: port of the websockets server, None to broadcast events without server
+            :param metrics_port: port of the http server of metrics, None to not export metrics
+        """
+        logger = logging.getLogger(__name__)
+
+        metrics_runner = None
+        if metrics_port is not None:
+            notifiers = {race_id: broadcasted_race.notifier for race_id, broadcasted_race in self.races.items()}
+            metrics_runner = await start_metrics_server(notifiers, metrics_port)
+            logger.info('Metrics available on http://127.0.0.1:%d/metrics', metrics_port)
+
+        broadcasts = asyncio.gather(*(broadcasted_race.run() for broadcasted_race in self.races.values()))
+
+        try:
+            if port is None:
+                await broadcasts
+            else:
+                async with websockets.serve(self.handle_client, '127.0.0.1', port):
+                    await broadcasts
+        finally:
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
+
+    def stop(self, race_id: Optional[str] = None) -> None:
+        """
+            Tells broadcast loops to stop
+
+            This method can be called when a signal is received by the event loop.
+
+            :param race_id: identifier of the race to stop, None to stop all races
+        """
+        for broadcasted_race in self.races.values():
+            if race_id is None or broadcasted_race.race_id == race_id:
+                broadcasted_race.stop.set()
+
+
+def read_race_id(path: str) -> str:
+    """
+        Reads the identifier of the race requested by a client
+
+        :param path: path of the websocket request
+        :return: identifier of the race, an empty string if there is none
+    """
+    return urlsplit(path).path.strip('/')
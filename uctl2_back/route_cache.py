@@ -0,0 +1,195 @@
+"""
+    This module defines functions to store a processed route
+    in a binary file and to load it back with a memory map.
+
+    A cache file has the following layout :
+    * magic bytes (:const:`MAGIC`)
+    * size of the header (unsigned int, 4 bytes, little endian)
+    * header, a json object that contains the key of the route and the description of each array
+    * raw arrays, each one is aligned on :const:`ALIGNMENT` bytes
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from uctl2_back.stage import Stage
+
+# Type aliases
+RouteArrays = Dict[str, np.ndarray]
+
+CACHE_VERSION = 4
+CACHE_EXTENSION = '.routecache'
+
+MAGIC = b'UCTL2RC\0'
+HEADER_SIZE_FORMAT = '<I'
+ALIGNMENT = 64
+
+# Size of chunks used to hash a route file
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def compute_route_key(route_file: str, stages: List['Stage'], tolerances: Sequence[float] = ()) -> str:
+    """
+        Computes the key of a processed route
+
+        The key depends on the content of the route file, the layout
+        of stages, the simplification tolerances and the version of the cache format.
+
+        :param route_file: path to a gpx file
+        :param stages: list of stages
+        :param tolerances: tolerances of each level of detail
+        :return: hexadecimal key
+        :raises FileNotFoundError: if the route file does not exist
+    """
+    h = hashlib.sha256()
+
+    with open(route_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+
+    layout = [(stage.dst_from_start, stage.length, stage.is_timed) for stage in stages]
+    h.update(json.dumps({'version': CACHE_VERSION, 'stages': layout, 'tolerances': list(tolerances)}).encode())
+
+    return h.hexdigest()
+
+
+def get_cache_path(route_file: str) -> str:
+    """
+        Gets the path of the cache file associated to the given route file
+
+        :param route_file: path to a gpx file
+        :return: path to the cache file
+    """
+    return os.path.splitext(route_file)[0] + CACHE_EXTENSION
+
+
+def build_header(key: str, arrays: RouteArrays) -> Tuple[bytes, List[int], int]:
+    """
+        Builds the header of a cache file
+
+        :param key: key of the route
+        :param arrays: arrays to store
+        :return: the encoded header (with magic bytes and its size), offsets of each array and the total size
+    """
+    descriptions = {}
+    offsets = []
+
+    # Offsets are relative to the end of the header
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        descriptions[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offsets.append(offset)
+        offset += array.nbytes
+
+    raw_header = json.dumps({'key': key, 'arrays': descriptions}).encode()
+    header_size = len(MAGIC) + struct.calcsize(HEADER_SIZE_FORMAT) + len(raw_header)
+    padded_size = -(-header_size // ALIGNMENT) * ALIGNMENT
+
+    header = MAGIC + struct.pack(HEADER_SIZE_FORMAT, padded_size) + raw_header
+    header += b'\0' * (padded_size - header_size)
+
+    return header, [padded_size + x for x in offsets], padded_size + offset
+
+
+def load_route(buffer, key: str) -> Optional[RouteArrays]:
+    """
+        Reads arrays from a buffer with the cache format
+
+        Arrays are not copied : they are read-only views on the buffer.
+
+        :param buffer: an object supporting the buffer protocol (mmap, bytes, ...)
+        :param key: expected key of the route
+        :return: arrays, or None if the buffer is not valid or if the key does not match
+    """
+    magic_size = len(MAGIC)
+    size_end = magic_size + struct.calcsize(HEADER_SIZE_FORMAT)
+
+    if len(buffer) < size_end or not bytes(buffer[:magic_size]) == MAGIC:
+        return None
+
+    header_size, = struct.unpack(HEADER_SIZE_FORMAT, buffer[magic_size:size_end])
+
+    try:
+        header = json.loads(bytes(buffer[size_end:header_size]).rstrip(b'\0'))
+    except ValueError:
+        return None
+
+    if not header.get('key') == key:
+        return None
+
+    arrays = {}
+
+    try:
+        for name, description in header['arrays'].items():
+            dtype = np.dtype(description['dtype'])
+            shape = tuple(description['shape'])
+            count = int(np.prod(shape))
+
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=header_size + description['offset'])
+            arrays[name] = array.reshape(shape)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    return arrays
+
+
+def read_route_cache(path: str, key: str) -> Optional[RouteArrays]:
+    """
+        Loads a processed route from a cache file
+
+        The file is memory-mapped, its arrays are read lazily.
+
+        :param path: path to the cache file
+        :param key: expected key of the route
+        :return: arrays, or None if the file does not exist, is not valid or has another key
+    """
+    try:
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    return load_route(buffer, key)
+
+
+def write_route_cache(path: str, key: str, arrays: RouteArrays) -> None:
+    """
+        Stores a processed route in a cache file
+
+        The file is written in a temporary file that replaces
+        the previous cache once complete.
+
+        :param path: path to the cache file
+        :param key: key of the route
+        :param arrays: arrays to store
+        :raises OSError: if the file could not be written
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    header, offsets, size = build_header(key, arrays)
+
+    # Processes started at the same time could write the same cache, each one has its own temporary file
+    directory, name = os.path.split(os.path.abspath(path))
+    f = tempfile.NamedTemporaryFile('wb', dir=directory, prefix=name + '.', suffix='.tmp', delete=False)
+
+    try:
+        with f:
+            f.write(header)
+
+            for offset, array in zip(offsets, arrays.values()):
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(array.tobytes())
+
+            f.truncate(size)
+
+        os.replace(f.name, path)
+    except OSError:
+        os.unlink(f.name)
+        raise
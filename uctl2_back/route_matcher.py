@@ -0,0 +1,155 @@
+"""
+    This module defines the RouteMatcher class
+"""
+import math
+from typing import Optional
+
+import numpy as np
+
+from uctl2_back.uctl2_setup import EARTH_RADIUS
+
+
+class RouteMatcher:
+
+    """
+        Snaps gps positions onto a route
+
+        Segments of the route are indexed in a uniform grid : each cell contains
+        the segments that go through the cell or through one of its neighbours.
+        A position is only compared to the segments of its cell.
+    """
+
+    def __init__(self, racepoints: np.ndarray, cell_size: float = 100, max_jump: float = 1000, max_backward: float = 50) -> None:
+        """
+            Creates a new route matcher
+
+            A position further than cell_size from the route can not be matched.
+
+            :param racepoints: array of racepoints (lat, lon, alt, distance from start), sorted by distance
+            :param cell_size: size of a cell of the grid (in meters)
+            :param max_jump: maximum distance (in meters) covered between two positions of a team
+            :param max_backward: maximum distance (in meters) a team can go back between two positions
+            :raises ValueError: if cell_size is negative
+        """
+        if cell_size <= 0:
+            raise ValueError('cell size must be strictely positive')
+
+        racepoints = np.asarray(racepoints, dtype=np.float64).reshape(-1, 4)
+
+        self.cell_size = cell_size
+        self.max_jump = max_jump
+        self.max_backward = max_backward
+
+        # Local projection on a plane tangent to the first point of the route
+        self._origin = np.radians(racepoints[0, :2]) if len(racepoints) > 0 else np.zeros(2)
+        self._scale = np.cos(self._origin[0]) * EARTH_RADIUS
+
+        xy = self._project(racepoints[:, 0], racepoints[:, 1])
+
+        # Segment i goes from the racepoint i to the racepoint i + 1
+        self._starts = xy[:-1]
+        self._vectors = xy[1:] - xy[:-1]
+        self._squared_lengths = np.einsum('ij,ij->i', self._vectors, self._vectors)
+        self._offsets = racepoints[:-1, 3]
+        self._lengths = np.diff(racepoints[:, 3])
+
+        self._build_grid()
+
+    def _build_grid(self) -> None:
+        """
+            Indexes segments in the grid
+
+            A segment is added to every cell covered by its bounding box,
+            expanded by one cell in each direction. Cells are stored in a compressed form : segments of the cell
+            _cell_keys[i] are _segments[_cell_starts[i]:_cell_starts[i + 1]].
+        """
+        ends = self._starts + self._vectors
+        min_cells = np.floor(np.minimum(self._starts, ends) / self.cell_size).astype(np.int64) - 1
+        max_cells = np.floor(np.maximum(self._starts, ends) / self.cell_size).astype(np.int64) + 1
+
+        counts = np.prod(max_cells - min_cells + 1, axis=1)
+        segments = np.repeat(np.arange(len(counts)), counts)
+
+        # Position of each cell in the bounding box of its segment
+        ranks = np.arange(len(segments)) - np.repeat(np.cumsum(counts) - counts, counts)
+        widths = (max_cells[:, 1] - min_cells[:, 1] + 1)[segments]
+        cells = min_cells[segments] + np.column_stack((ranks // widths, ranks % widths))
+
+        keys = self._cell_key(cells[:, 0], cells[:, 1])
+        order = np.argsort(keys, kind='stable')
+
+        self._cell_keys, self._cell_starts = np.unique(keys[order], return_index=True)
+        self._cell_starts = np.append(self._cell_starts, len(order))
+        self._segments = segments[order]
+
+    @staticmethod
+    def _cell_key(x, y):
+        """ Combines the coordinates of a cell into one integer """
+        return (np.asarray(x, dtype=np.int64) << 32) + (np.asarray(y, dtype=np.int64) & 0xFFFFFFFF)
+
+    def _project(self, lat, lon) -> np.ndarray:
+        """ Projects gps coordinates on the local plane (in meters) """
+        lat, lon = np.radians(lat), np.radians(lon)
+
+        return np.column_stack(((lon - self._origin[1]) * self._scale, (lat - self._origin[0]) * EARTH_RADIUS))
+
+    def candidates(self, x: float, y: float) -> np.ndarray:
+        """
+            Finds segments that could be at less than cell_size of the given point
+
+            :param x: abscissa in the local plane
+            :param y: ordinate in the local plane
+            :return: indices of segments
+        """
+        key = (math.floor(x / self.cell_size) << 32) + (math.floor(y / self.cell_size) & 0xFFFFFFFF)
+        i = int(np.searchsorted(self._cell_keys, key))
+
+        if i == len(self._cell_keys) or not self._cell_keys[i] == key:
+            return self._segments[:0]
+
+        return self._segments[self._cell_starts[i]:self._cell_starts[i + 1]]
+
+    def match(self, lat: float, lon: float, previous_offset: Optional[float] = None) -> Optional[float]:
+        """
+            Snaps a gps position onto the route
+
+            When a previous offset is given, only the parts of the route between
+            previous_offset - max_backward and previous_offset + max_jump are considered :
+            it avoids snapping a team to another part of the route that goes
+            through the same place. If there is no such part near the position,
+            then the whole route is considered.
+
+            :param lat: latitude
+            :param lon: longitude
+            :param previous_offset: last known distance from the start of the team, could be None
+            :return: distance from the start (in meters) of the closest point on the route, or None if the position is too far from the route
+        """
+        x = (math.radians(lon) - self._origin[1]) * self._scale
+        y = (math.radians(lat) - self._origin[0]) * EARTH_RADIUS
+        segments = self.candidates(x, y)
+
+        if len(segments) == 0:
+            return None
+
+        # Projection of the point on each candidate segment
+        vectors = np.array((x, y)) - self._starts[segments]
+        squared_lengths = self._squared_lengths[segments]
+        dots = np.einsum('ij,ij->i', vectors, self._vectors[segments])
+        t = np.clip(np.divide(dots, squared_lengths, out=np.zeros(len(segments)), where=squared_lengths > 0), 0, 1)
+
+        deltas = vectors - t[:, np.newaxis] * self._vectors[segments]
+        distances = np.einsum('ij,ij->i', deltas, deltas)
+        offsets = self._offsets[segments] + t * self._lengths[segments]
+
+        if previous_offset is not None:
+            reachable = (offsets >= previous_offset - self.max_backward) & (offsets <= previous_offset + self.max_jump)
+
+            if reachable.any():
+                distances = np.where(reachable, distances, np.inf)
+
+        best = int(np.argmin(distances))
+
+        if distances[best] > self.cell_size ** 2:
+            return None
+
+        return float(offsets[best])
@@ -0,0 +1,135 @@
+"""
+    This module defines functions to share a processed route
+    between processes with shared memory.
+
+    A block of shared memory has the same layout as a cache file
+    (see :mod:`uctl2_back.route_cache`). It is created by the first process
+    that reads the route, other processes attach it without copying arrays.
+"""
+import logging
+from typing import Dict, List, Optional
+
+from uctl2_back.route_cache import MAGIC, RouteArrays, build_header, load_route
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # Shared memory is only available since python 3.8
+    shared_memory = None
+else:
+    class SharedBlock(shared_memory.SharedMemory):
+
+        """
+            Block of shared memory that can be garbage collected while arrays use it
+        """
+
+        def close(self) -> None:
+            try:
+                super().close()
+            except BufferError:
+                # Arrays are still used, the memory is unmapped when the process exits
+                pass
+
+NAME_PREFIX = 'uctl2_'
+
+# Number of characters of the route key used in the name of a block (names are limited to 31 characters on some systems)
+NAME_KEY_LENGTH = 20
+
+# Blocks used by this process : arrays are views on them, they must stay opened
+_attached_blocks: Dict[str, 'SharedBlock'] = {}
+_created_blocks: List['SharedBlock'] = []
+
+
+def get_block_name(key: str) -> str:
+    """
+        Gets the name of the block of shared memory associated to a route
+
+        :param key: key of the route
+        :return: name of the block
+    """
+    return NAME_PREFIX + key[:NAME_KEY_LENGTH]
+
+
+def attach_route(key: str) -> Optional[RouteArrays]:
+    """
+        Loads a processed route from shared memory
+
+        The block stays registered to the process that created it : it will not be
+        removed when this process exits.
+
+        :param key: key of the route
+        :return: arrays, or None if there is no valid block for this route (or if it is still being copied)
+    """
+    if shared_memory is None:
+        return None
+
+    name = get_block_name(key)
+
+    if name not in _attached_blocks:
+        try:
+            block = SharedBlock(name)
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+
+        # Prevents the resource tracker of this process from removing the block at exit
+        resource_tracker.unregister(block._name, 'shared_memory')
+        _attached_blocks[name] = block
+
+    return load_route(_attached_blocks[name].buf, key)
+
+
+def share_route(key: str, arrays: RouteArrays) -> Optional[RouteArrays]:
+    """
+        Copies a processed route into a new block of shared memory
+
+        If another process has created the block in the meantime, then
+        this block is used. The header is written after the arrays :
+        a block that is still being copied is not valid.
+
+        :param key: key of the route
+        :param arrays: arrays to share
+        :return: arrays stored in shared memory, or None if the route could not be shared
+    """
+    logger = logging.getLogger(__name__)
+
+    if shared_memory is None:
+        return None
+
+    header, offsets, size = build_header(key, arrays)
+
+    try:
+        block = SharedBlock(get_block_name(key), create=True, size=size)
+    except FileExistsError:
+        return attach_route(key)
+    except OSError as e:
+        logger.warning('Unable to share the route : %s', e)
+        return None
+
+    for offset, array in zip(offsets, arrays.values()):
+        block.buf[offset:offset + array.nbytes] = array.tobytes()
+
+    # Other processes may attach the block at any time : it is only valid
+    # once the header is written, magic bytes last
+    block.buf[len(MAGIC):len(header)] = header[len(MAGIC):]
+    block.buf[:len(MAGIC)] = MAGIC
+
+    _created_blocks.append(block)
+    _attached_blocks[block.name] = block
+
+    return load_route(block.buf, key)
+
+
+def release_shared_routes() -> None:
+    """
+        Removes blocks of shared memory created by this process
+
+        Processes that have attached a block can still use it,
+        it is freed once all of them have exited.
+    """
+    while len(_created_blocks) > 0:
+        block = _created_blocks.pop()
+
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,208 @@
+"""
+    This module defines an entry point to run a simulation
+    without the manager.
+
+    Teams of the configuration can be replaced by synthetic teams
+    in order to generate big race files for the broadcaster.
+
+    The broadcaster can run in the same event loop. With a virtual clock,
+    a whole race is replayed as fast as possible.
+
+    Usage : python uctl2_back/simulate.py config_path [--teams N] [--seed S] [--tick-step T] [--broadcast] [--virtual-clock]
+"""
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from uctl2_back import uctl2_race
+from uctl2_back.clock import Clock, VirtualClock, WallClock
+from uctl2_back.config import Config
+from uctl2_back.exceptions import InvalidConfigError
+from uctl2_back.notifier import Notifier
+from uctl2_back.shared_route import release_shared_routes
+from uctl2_back.simulator import Simulator
+from uctl2_back.uctl2 import load_config
+from uctl2_back.uctl2_setup import read_race
+
+# Bounds of synthetic paces (in seconds per kilometer)
+MIN_PACE = 240
+MAX_PACE = 480
+
+
+def generate_teams(count: int, random: np.random.Generator, min_pace: float = MIN_PACE, max_pace: float = MAX_PACE) -> List[Dict[str, Any]]:
+    """
+        Generates synthetic teams
+
+        Bib numbers start from 1, paces are uniformly drawn between min_pace and max_pace.
+
+        :param count: number of teams
+        :param random: random generator used to draw paces
+        :param min_pace: minimum pace (in seconds per kilometer)
+        :param max_pace: maximum pace (in seconds per kilometer)
+        :return: list of teams, with the same format than teams in the configuration
+        :raises ValueError: if count is negative
+    """
+    if count <= 0:
+        raise ValueError('count must be strictely positive')
+
+    paces = random.uniform(min_pace, max_pace, size=count).round()
+
+    return [{'bibNumber': i + 1, 'name': 'Team %d' % (i + 1,), 'pace': int(pace)} for i, pace in enumerate(paces)]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+        Parses command line arguments
+
+        :param argv: arguments, None to use sys.argv
+        :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='Runs a race simulation and writes the race file')
+    parser.add_argument('config', help='path to the configuration file')
+    parser.add_argument('--teams', type=int, help='number of synthetic teams, teams of the configuration are used by default')
+    parser.add_argument('--seed', type=int, help='seed of the random generator')
+    parser.add_argument('--tick-step', type=int, help='number of simulated seconds for one real second')
+    parser.add_argument('--output-config', help='writes the configuration with synthetic teams to this path (for the broadcaster)')
+    parser.add_argument('--broadcast', action='store_true', help='runs the broadcaster in the same process')
+    parser.add_argument('--port', type=int, help='port of the websockets server of the broadcaster, no server by default')
+    parser.add_argument('--virtual-clock', action='store_true', help='replays the race as fast as possible')
+
+    return parser.parse_args(argv)
+
+
+def create_simulator(config: Config, teams: Optional[int] = None, seed: Optional[int] = None) -> Simulator:
+    """
+        Creates a simulator without socketio server and computes its times
+
+        When a number of teams is given, teams of the configuration
+        are replaced by synthetic teams in the simulator, the given
+        configuration is not modified.
+
+        Paces of teams and times of the race are drawn from two
+        independent streams derived from the seed.
+
+        :param config: an instance to a configuration
+        :param teams: number of synthetic teams, None to keep teams of the configuration
+        :param seed: seed of the random generator, None for a random seed
+        :return: a new instance of Simulator
+    """
+    teams_seed, times_seed = np.random.SeedSequence(seed).spawn(2)
+
+    if teams is not None:
+        config = copy.copy(config)
+        config.teams = generate_teams(teams, np.random.default_rng(teams_seed))
+
+    sim = Simulator.create(config, seed=times_seed)
+    sim.compute_times()
+
+    return sim
+
+
+async def replay(config: Config, sim: Simulator, tick_step: int, clock: Clock, broadcast: bool = False, port: Optional[int] = None) -> None:
+    """
+        Runs a simulation, and optionally the broadcaster, until the end of the race
+
+        The clock must have one participant for the simulation, the broadcaster
+        joins the clock itself. Once the race is over, the broadcaster reads
+        the race file one last time before being stopped.
+
+        :param config: an instance to a configuration
+        :param sim: a simulator with computed times
+        :param tick_step: number of simulated seconds for one real second
+        :param clock: clock used by the simulation and the broadcaster
+        :param broadcast: True to run the broadcaster
+        :param port: port of the websockets server, None to broadcast events without server
+    """
+    logger = logging.getLogger(__name__)
+
+    simulation = sim.get_simulation(tick_step)
+    on_file_updated = lambda rows: logger.debug('Race file updated (%s)', simulation.race_time)
+    on_race_finished = lambda: logger.info('End of the simulation')
+
+    if not broadcast:
+        await simulation.run_async(clock, on_file_updated=on_file_updated, on_race_finished=on_race_finished)
+        return
+
+    race = read_race(config)
+    notifier = Notifier(race)
+
+    clock.join()
+    broadcaster = asyncio.ensure_future(uctl2_race.broadcast_race(race, config, notifier, None, clock=clock))
+    broadcaster.add_done_callback(lambda _: clock.leave())
+
+    tasks = [asyncio.ensure_future(notifier.broadcaster())]
+    if port is not None:
+        tasks.append(asyncio.ensure_future(notifier.start_notifier(port)))
+
+    try:
+        await simulation.run_async(clock, on_file_updated=on_file_updated, on_race_finished=on_race_finished)
+
+        # Lets the broadcaster read the final state of the race
+        await clock.sleep(2 * uctl2_race.REQUESTS_DELAY)
+    finally:
+        broadcaster.cancel()
+        await notifier.stop_notifier()
+        await asyncio.gather(broadcaster, *tasks, return_exceptions=True)
+
+        release_shared_routes()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+        Runs a simulation until the end of the race
+
+        :param argv: command line arguments, None to use sys.argv
+        :return: exit code
+    """
+    logger = logging.getLogger(__name__)
+    args = parse_args(argv)
+
+    try:
+        config = load_config(args.config)
+    except (FileNotFoundError, json.JSONDecodeError, InvalidConfigError):
+        # The error has already been logged by load_config
+        return -1
+    except OSError as e:
+        logger.error('Unable to read the configuration %s : %s', args.config, e)
+        return -1
+
+    tick_step = config.tick_step if args.tick_step is None else args.tick_step
+    sim = create_simulator(config, args.teams, args.seed)
+
+    # The broadcaster reads the same teams than the simulator
+    config.teams = list(sim.race_teams)
+
+    if args.output_config is not None:
+        with open(args.config, 'r') as f:
+            json_config = json.load(f)
+
+        json_config['teams'] = config.teams
+
+        with open(args.output_config, 'w') as f:
+            json.dump(json_config, f, indent=2)
+
+    logger.info('Simulating %d teams (tick step %d, duration %ds)', len(sim.race_teams), tick_step, sim.race_duration // tick_step)
+
+    clock = VirtualClock() if args.virtual_clock else WallClock()
+    start = time.time()
+
+    try:
+        asyncio.run(replay(config, sim, tick_step, clock, args.broadcast, args.port))
+    except KeyboardInterrupt:
+        sim.stop_simulation()
+
+    logger.info('Simulation replayed in %.1fs', time.time() - start)
+
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='[%(levelname)s] %(name)s - %(message)s', level=logging.INFO)
+    sys.exit(main())
@@ -2,17 +2,27 @@
     This module defines the Simulation class
 """
 import datetime
+import heapq
 import time
-from typing import TYPE_CHECKING, Any, Callable, List, Set, Tuple
+from itertools import repeat
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Set, Tuple
 
 from uctl2_back.race_file import process_file
 
 if TYPE_CHECKING:
+    from uctl2_back.clock import Clock
     from uctl2_back.simulator import Simulator
 
 # Type aliases
 StagesWithInts = List[Tuple[Set[int], Set[int]]]
 
+# (seconds since the start, bib, index of the timed stage, kind of crossing)
+Crossing = Tuple[float, int, int, int]
+
+# Kinds of crossing
+STAGE_ENTRANCE = 0
+STAGE_EXIT = 1
+
 
 class Simulation:
 
@@ -20,6 +30,10 @@ class Simulation:
         Represents a Simulation
 
         A simulation is run by a simulator with pre computed times
+
+        Entrance and exit times of each team in each timed stage
+        are stored in a priority queue : each tick only pops
+        crossings that are due.
     """
 
     def __init__(self, simulator: 'Simulator', tick_step: int) -> None:
@@ -40,54 +54,160 @@ class Simulation:
 
         self.stages_with_times: StagesWithInts = [(set(), set()) for stage in simulator.race_stages if stage.is_timed]
         self.race_time = simulator.start_time
-        self.remaining_teams = list(simulator.race_teams)
+        self.remaining_teams: Set[int] = set(team['bibNumber'] for team in simulator.race_teams)
         self.running = False
 
-    def run(self, on_file_updated: Callable[[List[Any]], Any] = None, on_race_finished=Callable[[], Any]) -> None:
+        self.crossings = compute_crossings(simulator)
+        heapq.heapify(self.crossings)
+
+    def advance(self, race_time: datetime.datetime) -> int:
+        """
+            Applies all crossings that happened before the given time
+
+            A team is added to the first set of a stage when it enters
+            the stage, and to the second one when it leaves the stage.
+            A team that leaves the last timed stage is removed from remaining teams.
+
+            :param race_time: current time of the race
+            :return: number of applied crossings
+        """
+        last_stage_index = len(self.stages_with_times) - 1
+        elapsed_time = (race_time - self.simulator.start_time).total_seconds()
+        count = 0
+
+        while len(self.crossings) > 0 and self.crossings[0][0] <= elapsed_time:
+            _, bib, stage_index, kind = heapq.heappop(self.crossings)
+            self.stages_with_times[stage_index][kind].add(bib)
+
+            if kind == STAGE_EXIT and stage_index == last_stage_index:
+                self.remaining_teams.discard(bib)
+
+            count += 1
+
+        return count
+
+    def run(self, on_file_updated: Callable[[List[Any]], Any] = None, on_race_finished: Callable[[], Any] = None,
+            update_file: Optional[Callable[[StagesWithInts], Any]] = None, sleep: Optional[Callable[[float], Any]] = None) -> None:
         """
             Runs the simulation
 
+            By default, the race file is written by the simulation. When update_file is given,
+            it is called with the current stages instead and on_file_updated is not used.
+
+            The simulation waits one second between two ticks. By default, it uses
+            the sleep function of the socketio server of the simulator, or time.sleep
+            if the simulator does not have one.
+
             :param on_file_updated: callback to a function to call when the file is updated
             :param on_race_finished: callback to a function to call when the race is over
+            :param update_file: function to call to write the race file, it must not keep a reference to the stages
+            :param sleep: function used to wait between two ticks
         """
+        if sleep is None:
+            sleep = time.sleep if self.simulator.socketio is None else self.simulator.socketio.sleep
+
         last_call = time.time()
         self.running = True
+        first_tick = True
 
         while self.running:
             current_time = time.time()
             loop_time = current_time - last_call
             last_call = current_time
 
-            self.race_time += datetime.timedelta(seconds=self.tick_step * loop_time)
+            if self.tick(loop_time, first_tick, on_file_updated, update_file, on_race_finished):
+                break
 
-            stage_time_index = 0
-            for i, stage in enumerate(self.simulator.race_stages):
-                if not stage.is_timed:
-                    continue
+            first_tick = False
+            sleep(1)
 
-                stage_times = self.stages_with_times[stage_time_index]
-                stage_time_index += 1
+    async def run_async(self, clock: 'Clock', on_file_updated: Callable[[List[Any]], Any] = None, on_race_finished: Callable[[], Any] = None,
+                        update_file: Optional[Callable[[StagesWithInts], Any]] = None) -> None:
+        """
+            Runs the simulation in an event loop
 
-                for j, team in enumerate(self.remaining_teams):
-                    if i == 0 or self.simulator.stages_inter_times[i - 1][j] <= self.race_time:
-                        stage_times[0].add(team['bibNumber'])
+            It behaves like :meth:`run` but the time is given by a clock.
+            With a virtual clock, the simulation runs as fast as possible.
 
-                    if self.simulator.stages_inter_times[i][j] <= self.race_time:
-                        stage_times[1].add(team['bibNumber'])
+            :param clock: clock used to measure and wait time
+            :param on_file_updated: callback to a function to call when the file is updated
+            :param on_race_finished: callback to a function to call when the race is over
+            :param update_file: function to call to write the race file, it must not keep a reference to the stages
+        """
+        # Elapsed time is measured with the monotonic time : changes of the system time do not move the race
+        last_call = clock.monotonic()
+        self.running = True
+        first_tick = True
 
-                        if stage_time_index == len(self.stages_with_times):
-                            self.remaining_teams.pop(j)
+        while self.running:
+            current_time = clock.monotonic()
+            loop_time = current_time - last_call
+            last_call = current_time
 
-            rows = process_file(self.simulator, self.stages_with_times)
-            if not on_file_updated is None:
-                on_file_updated(rows)
+            if self.tick(loop_time, first_tick, on_file_updated, update_file, on_race_finished):
+                break
 
-            if len(self.remaining_teams) == 0:
-                self.running = False
-                self.simulator.reset_simulation()
+            first_tick = False
+            await clock.sleep(1)
 
-                if not on_race_finished is None:
-                    on_race_finished()
-                break
+    def tick(self, loop_time: float, first_tick: bool, on_file_updated: Callable[[List[Any]], Any] = None,
+             update_file: Optional[Callable[[StagesWithInts], Any]] = None, on_race_finished: Callable[[], Any] = None) -> bool:
+        """
+            Moves the simulation forward
+
+            :param loop_time: real number of seconds since the last tick
+            :param first_tick: True if it is the first tick of the simulation, the race file is always written in this case
+            :param on_file_updated: callback to a function to call when the file is updated
+            :param update_file: function to call to write the race file, it must not keep a reference to the stages
+            :param on_race_finished: callback to a function to call when the race is over
+            :return: True if the race is over
+        """
+        self.race_time += datetime.timedelta(seconds=self.tick_step * loop_time)
+
+        # The race file is only written when a team has moved
+        if self.advance(self.race_time) > 0 or first_tick:
+            if not update_file is None:
+                update_file(self.stages_with_times)
+            else:
+                rows = process_file(self.simulator, self.stages_with_times)
+                if not on_file_updated is None:
+                    on_file_updated(rows)
+
+        if len(self.remaining_teams) > 0:
+            return False
+
+        self.running = False
+        self.simulator.reset_simulation()
+
+        if not on_race_finished is None:
+            on_race_finished()
+
+        return True
+
+
+def compute_crossings(simulator: 'Simulator') -> List[Crossing]:
+    """
+        Computes entrance and exit times of each team in timed stages
+
+        A team enters a timed stage when it leaves the previous stage,
+        it enters the first stage at the start of the race.
+
+        :param simulator: a simulator with computed times
+        :return: list of crossings (seconds since the start, bib, index of the timed stage, kind)
+    """
+    crossings: List[Crossing] = []
+    bibs = [team['bibNumber'] for team in simulator.race_teams]
+    inter_times = simulator.inter_times.tolist()
+
+    stage_time_index = 0
+    for i, stage in enumerate(simulator.race_stages):
+        if not stage.is_timed:
+            continue
+
+        entrance_times = [0.0] * len(bibs) if i == 0 else inter_times[i - 1]
+
+        crossings.extend(zip(entrance_times, bibs, repeat(stage_time_index), repeat(STAGE_ENTRANCE)))
+        crossings.extend(zip(inter_times[i], bibs, repeat(stage_time_index), repeat(STAGE_EXIT)))
+        stage_time_index += 1
 
-            self.simulator.socketio.sleep(1)
+    return crossings
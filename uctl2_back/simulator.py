@@ -1,17 +1,19 @@
 """
     This function defines the Simulator class
 """
+import collections.abc
 import datetime
-import random
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Union
 
-from flask_socketio import SocketIO
+import numpy as np
 
 from uctl2_back import race_file
 from uctl2_back.config import Config
 from uctl2_back.simulation import Simulation
 
 if TYPE_CHECKING:
+    from flask_socketio import SocketIO
+
     from uctl2_back.stage import Stage
 
 
@@ -22,7 +24,7 @@ class Simulator:
         for every team in the config file.
     """
 
-    def __init__(self, socketio: SocketIO):
+    def __init__(self, socketio: Optional['SocketIO'] = None, seed: Union[None, int, np.random.SeedSequence] = None):
         """
             Creates a new instance of Simulator
 
@@ -31,14 +33,27 @@ class Simulator:
             Some calculations are not made in this constructor but are required
             for running simulations.
 
-            :param config: an instance to a configuration
-            :param socketio: an instance to a socketio server
+            Simulated times are drawn from a random generator initialized
+            with the given seed : two simulators with the same seed
+            will generate the same races.
+
+            :param socketio: an instance to a socketio server, None to run without clients
+            :param seed: seed of the random generator, None for a random seed
         """
         self.socketio = socketio
         self.headers = ['Numéro', 'Nom', 'Distance']
-        self.rows: Dict[int, Any] = {}
-        self.stages_inter_times: List[List[datetime.datetime]] = []
         self.race_file = ''
+        self.race_file_writer = race_file.RaceFileWriter(self.race_file, self.headers)
+
+        self.random = np.random.default_rng(seed)
+
+        # Times in seconds since the start of the race, one row per stage and one column per team
+        self.split_times = np.empty((0, 0))
+        self.inter_times = np.empty((0, 0))
+        self.stage_ranks = np.empty((0, 0), dtype=np.int64)
+        self._stages_inter_times: Optional[List[List[datetime.datetime]]] = None
+
+        self.rows: collections.abc.Mapping = SimulatedRows(self)
 
         self.race_distance = 0
         self.race_name = ''
@@ -47,9 +62,10 @@ class Simulator:
         self.start_time: datetime.datetime = datetime.datetime.now()
 
         self._simulation: Optional[Simulation] = None
+        self._json: Optional[Dict[str, Any]] = None
 
     @classmethod
-    def create(cls, config: Config, socketio: SocketIO) -> 'Simulator':
+    def create(cls, config: Config, socketio: Optional['SocketIO'] = None, seed: Union[None, int, np.random.SeedSequence] = None) -> 'Simulator':
         """
             Creates a new instance of class Simulator based on the given configuration
 
@@ -57,10 +73,11 @@ class Simulator:
             the class constructor.
 
             :param config: an instance to a configuration
-            :param socketio: an instance to a socketio server
+            :param socketio: an instance to a socketio server, None to run without clients
+            :param seed: seed of the random generator, None for a random seed
             :return: a new instance of class Simulator
         """
-        sim = Simulator(socketio)
+        sim = Simulator(socketio, seed)
 
         distance = 0
         j = 1
@@ -74,6 +91,7 @@ class Simulator:
             j += 1
 
         sim.race_file = config.race_file
+        sim.race_file_writer = race_file.RaceFileWriter(config.race_file, sim.headers, config.encoding)
 
         sim.race_distance = distance
         sim.race_name = config.race_name
@@ -88,51 +106,30 @@ class Simulator:
             Computes simulated times for the given configuration
 
             Each call to this method will result of new simulated times.
-        """
-        stages_times: List[List[Tuple[int, int]]] = [[] for x in range(len(self.race_stages))]
-        self.stages_inter_times = [[] for x in range(len(self.race_stages))]
-
-        for team in self.race_teams:
-            values = {
-                'Numéro': team['bibNumber'],
-                'Nom': team['name'],
-                'Distance': self.race_distance / 1000
-            }
-
-            pace = team['pace']
-
-            j = 1
-            for i, stage in enumerate(self.race_stages):
-                pace += pace * random.uniform(-0.2, 0.2)
-                split_time = stage.length * pace / 1000
-
-                stages_times[i].append((team['bibNumber'], split_time))
-                entrance_time = self.start_time if i == 0 else self.stages_inter_times[i - 1][-1]
-
-                inter_time = entrance_time + datetime.timedelta(seconds=split_time)
-                self.stages_inter_times[i].append(inter_time)
-
-                if stage.is_timed:
-                    values['Interm (S%d)' % (j,)] = race_file.format_time(split_time)
-                    values['2%d|1' % (j,)] = race_file.format_datetime(entrance_time)
-                    values['3%d|1' % (j,)] = race_file.format_datetime(inter_time)
-                    j += 1
+            Times of all teams are drawn at once, rows of the race file
+            are only formatted when they are read.
 
-            self.rows[team['bibNumber']] = values
+            The pace of a team changes randomly (+/- 20%) at each stage.
+        """
+        stages_number = len(self.race_stages)
+        paces = np.array([team['pace'] for team in self.race_teams], dtype=np.float64)
+        lengths = np.array([stage.length for stage in self.race_stages], dtype=np.float64)
 
-        stages_times_sorted = map(sort_teams_times, stages_times)
+        variations = 1 + self.random.uniform(-0.2, 0.2, size=(stages_number, len(paces)))
+        stage_paces = paces * np.cumprod(variations, axis=0)
 
-        # Computes teams rank for each stages
-        j = 1
-        for i, stage_times in enumerate(stages_times_sorted):
-            if not self.race_stages[i].is_timed:
-                continue
+        self.split_times = lengths[:, np.newaxis] * stage_paces / 1000
+        self.inter_times = np.cumsum(self.split_times, axis=0)
 
-            for rank, stage_time in enumerate(stage_times):
-                bib, _ = stage_time
+        # Computes teams rank for each stages (the fastest team is ranked first)
+        self.stage_ranks = np.empty(self.split_times.shape, dtype=np.int64)
+        for i, stage_split_times in enumerate(self.split_times):
+            self.stage_ranks[i, np.argsort(stage_split_times, kind='stable')] = np.arange(1, len(paces) + 1)
 
-                self.rows[bib]['Clt Interm-1 (S%d)' % (j,)] = rank + 1
-            j += 1
+        self._stages_inter_times = None
+        self._json = None
+        self.rows = SimulatedRows(self)
+        self.race_file_writer.invalidate()
 
     def get_simulation(self, tick_step: int) -> Simulation:
         """
@@ -158,7 +155,12 @@ class Simulator:
         """
             Emits an event 'sim_status_updated' with the current
             simulation status (0=off, 1=on)
+
+            Nothing is emitted when the simulator has no socketio server.
         """
+        if self.socketio is None:
+            return
+
         self.socketio.emit('sim_status_updated', {
             'status': self.simulation_status
         })
@@ -168,18 +170,10 @@ class Simulator:
         """
             Gets the real duration in seconds of the simulation
         """
-        max_duration = 0
-
-        for i in range(len(self.race_teams)):
-            start_time = self.stages_inter_times[0][i]
-            end_time = self.stages_inter_times[-1][i]
-
-            duration = int((end_time - start_time).total_seconds())
-
-            if i == 0 or duration > max_duration:
-                max_duration = duration
+        if self.inter_times.size == 0:
+            return 0
 
-        return max_duration
+        return int(np.max(self.inter_times[-1] - self.inter_times[0]))
 
     def reset_simulation(self) -> None:
         """
@@ -190,6 +184,19 @@ class Simulator:
         self.stop_simulation()
         self._simulation = None
 
+    @property
+    def stages_inter_times(self) -> List[List[datetime.datetime]]:
+        """
+            Gets the time of each team at the end of each stage
+
+            Each item of the list represents a stage : it contains
+            a datetime for each team.
+        """
+        if self._stages_inter_times is None:
+            self._stages_inter_times = [[self.start_time + datetime.timedelta(seconds=x) for x in row] for row in self.inter_times.tolist()]
+
+        return self._stages_inter_times
+
     @property
     def simulation_status(self) -> int:
         """ Gets the status of the simulation (0=off, 1=on) """
@@ -210,31 +217,81 @@ class Simulator:
             Converts class attributes into JSON compatibles types
 
             This method is used to serialize an instance of this class.
+            Attributes that only change with new times are serialized once
+            until the next call to :meth:`compute_times`.
 
             :return: a dict containing class attributes
         """
-        return {
-            'headers': self.headers,
-            'rows': self.rows,
-            'stage_inter_times': [[inter_time.timestamp() for inter_time in inter_times] for inter_times in self.stages_inter_times],
-            'simulation_status': self.simulation_status,
-            'race_distance': self.race_distance,
-            'race_duration': self.race_duration,
-            'race_name': self.race_name,
-            'race_stages': [stage.serialize() for stage in self.race_stages],
-            'race_teams': list(self.race_teams),
-            'start_time': self.start_time.timestamp() if self.start_time else 0
-        }
+        if self._json is None:
+            self._json = {
+                'headers': self.headers,
+                'rows': dict(self.rows),
+                'stage_inter_times': [[inter_time.timestamp() for inter_time in inter_times] for inter_times in self.stages_inter_times],
+                'race_distance': self.race_distance,
+                'race_duration': self.race_duration,
+                'race_name': self.race_name,
+                'race_stages': [stage.serialize() for stage in self.race_stages],
+                'race_teams': list(self.race_teams),
+                'start_time': self.start_time.timestamp() if self.start_time else 0
+            }
 
+        return dict(self._json, simulation_status=self.simulation_status)
 
-def sort_teams_times(times: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
-    """
-        Sorts split times from a list of times
 
-        The given list contains a pair of a bib and
-        a split time
+class SimulatedRows(collections.abc.Mapping):
+
+    """
+        Rows of a simulated race file, indexed by bib number
 
-        :param times: list of times
-        :return: sorted times
+        A row is formatted the first time it is read.
     """
-    return sorted(times, key=lambda x: x[1])
+
+    def __init__(self, simulator: Simulator) -> None:
+        self.simulator = simulator
+        self.indices = {team['bibNumber']: i for i, team in enumerate(simulator.race_teams)} if simulator.split_times.size > 0 else {}
+        self._rows: Dict[int, Dict[str, Any]] = {}
+
+    def __getitem__(self, bib: int) -> Dict[str, Any]:
+        if bib not in self._rows:
+            self._rows[bib] = self.format_row(self.indices[bib])
+
+        return self._rows[bib]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.indices)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def format_row(self, team_index: int) -> Dict[str, Any]:
+        """
+            Formats the row of a team
+
+            :param team_index: index of the team in the list of teams
+            :return: the row, it associates a column name with its value
+        """
+        sim = self.simulator
+        team = sim.race_teams[team_index]
+
+        values = {
+            'Numéro': team['bibNumber'],
+            'Nom': team['name'],
+            'Distance': sim.race_distance / 1000
+        }
+
+        j = 1
+        for i, stage in enumerate(sim.race_stages):
+            if not stage.is_timed:
+                continue
+
+            split_time = sim.split_times[i, team_index]
+            inter_time = sim.inter_times[i, team_index]
+            entrance_time = sim.inter_times[i - 1, team_index] if i > 0 else 0
+
+            values['Interm (S%d)' % (j,)] = race_file.format_time(split_time)
+            values['2%d|1' % (j,)] = race_file.format_datetime(sim.start_time + datetime.timedelta(seconds=entrance_time))
+            values['3%d|1' % (j,)] = race_file.format_datetime(sim.start_time + datetime.timedelta(seconds=inter_time))
+            values['Clt Interm-1 (S%d)' % (j,)] = int(sim.stage_ranks[i, team_index])
+            j += 1
+
+        return values
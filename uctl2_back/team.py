@@ -40,7 +40,7 @@ class Team:
 
         self._covered_distance: float = 0
         self._progression: float = 0
-        self._current_location: Tuple[float, float] = self.race.plain_racepoints[0] if len(self.race.plain_racepoints) > 0 else (0, 0)
+        self._current_location: Tuple[float, float] = self.race.get_location(0)
         self._rank: int = 0
 
     def compute_overtaken_teams(self, teams: Iterable['Team']) -> List[int]:
@@ -74,7 +74,8 @@ class Team:
             Sets the covered distance
 
             The progression of the team will be updated as well
-            as the current_location.
+            as the current_location. The location is read from
+            the location table of the race.
 
             :param coveredDistance: new covered distance (in meters)
             :raises ValueError: if covered_distance is negative
@@ -84,28 +85,7 @@ class Team:
 
         self._covered_distance = covered_distance
         self._progression = covered_distance / self.race.distance
-
-        # racepoint = (lat, lon, alt, distance from start)
-        # plain_racepoint = (lat, lon)
-
-        # Computes number of racePoints from previous stages
-        # If the team is in the first stage, then i equals 0
-        if self.current_stage_index > 0:
-            i = sum(len(self.race.racepoints[k]) for k in range(self.current_stage_index))
-        else:
-            i = 0
-
-        current_stagepoints = self.race.racepoints[self.current_stage_index]
-        j = 0
-
-        # Counts the number of racepoints where the team has already been
-        while j < len(current_stagepoints) and current_stagepoints[j][3] <= covered_distance:
-            j += 1
-
-        if j > 0:
-            j -= 1
-
-        self._current_location = self.race.plain_racepoints[i + j]
+        self._current_location = self.race.get_location(covered_distance)
 
     @property
     def last_stage_rank(self) -> int:
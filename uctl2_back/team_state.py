@@ -49,6 +49,9 @@ class TeamState:
 
         self.start_time: Optional['datetime'] = None
         self.covered_distance: float = 0 if last_state is None else last_state.covered_distance
+
+        # Estimated speed (in meters per second of race) used to extrapolate the covered distance
+        self.speed: float = 0 if last_state is None else last_state.speed
         self.intermediate_times: List['datetime'] = []
         self.split_times: List[int] = []
         self.stage_ranks: List[int] = []
@@ -76,24 +79,29 @@ class TeamState:
 
         if self.start_time is None:
             self.covered_distance = 0
+            self.speed = 0
             return
 
         if self.team_finished.get_value():
             last_stage = stages[-1]
             self.covered_distance = last_stage.dst_from_start + last_stage.length
+            self.speed = 0
             return
 
         if len(self.split_times) == 0:
+            # Default pace when we don't known each team's pace yet
+            self.speed = 1000 / default_pace
+
             if self.current_stage.has_changed:
                 self.covered_distance = 0
             else:
-                # Default pace when we don't known each team's pace yet
                 self.covered_distance += loop_time * tick_step * 1000 / default_pace
             return
 
         current_stage_index: int = self.current_stage.get_value()
 
         # Computing the covered distance since the last loop (step distance)
+        # The speed of the previous stage is kept until the next reading
         if self.current_stage.has_changed:
             self.covered_distance = stages[current_stage_index].dst_from_start
         else:
@@ -102,6 +110,30 @@ class TeamState:
             elapsed_time = self.intermediate_times[self.current_time_index] - self.start_time
             average_speed = stage_dst_from_start / elapsed_time.total_seconds()
             self.covered_distance += average_speed * loop_time * tick_step
+            self.speed = average_speed
+
+    def extrapolate(self, tick_step: int, loop_time: float) -> None:
+        """
+            Moves the team forward with its last estimated speed
+
+            It is used between two readings of the race file.
+
+            :param tick_step: speed of the simulation (=1 if it is a real race)
+            :param loop_time: number of seconds since the last update of the covered distance
+        """
+        self.covered_distance += self.speed * loop_time * tick_step
+
+    def clear_changes(self) -> None:
+        """
+            Marks current values as read
+
+            It is used to keep the state of a team whose line of the race file
+            has not changed : :attr:`has_changed` of its properties gives False
+            like for a state read again from the same line.
+        """
+        self.current_stage.set_value(self.current_stage.get_value())
+        self.rank.set_value(self.rank.get_value())
+        self.team_finished.set_value(self.team_finished.get_value())
 
     def update_stage_times(self, transition_times: List[TransitionTime]) -> None:
         """
@@ -0,0 +1,249 @@
+"""
+    This module defines classes and functions to ingest
+    live gps positions sent by team trackers.
+
+    A position (ping) is a line with the following format :
+    bib,timestamp,latitude,longitude
+    where timestamp is a unix timestamp in seconds.
+"""
+import asyncio
+import collections
+import logging
+import math
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from uctl2_back.route_matcher import RouteMatcher
+
+if TYPE_CHECKING:
+    from uctl2_back.race import Race
+    from uctl2_back.race_state import RaceState
+
+Ping = collections.namedtuple('Ping', ['bib', 'timestamp', 'lat', 'lon'])
+
+# Default number of seconds after which a position is not used anymore
+DEFAULT_MAX_AGE = 60
+
+
+def parse_ping(line: str) -> Ping:
+    """
+        Reads a position from a line
+
+        :param line: line with the format bib,timestamp,latitude,longitude
+        :return: the position
+        :raises ValueError: if the line does not have the expected format or if a number is not finite
+    """
+    values = line.strip().split(',')
+
+    if not len(values) == 4:
+        raise ValueError('Invalid ping : %s' % (line,))
+
+    ping = Ping(bib=int(values[0]), timestamp=float(values[1]), lat=float(values[2]), lon=float(values[3]))
+
+    # float() accepts nan and inf, they can not be snapped onto the route
+    if not all(math.isfinite(value) for value in ping[1:]):
+        raise ValueError('Invalid ping : %s' % (line,))
+
+    return ping
+
+
+class TrackerPositions:
+
+    """
+        Stores the last position on the route of each team
+    """
+
+    def __init__(self, matcher: RouteMatcher, max_age: float = DEFAULT_MAX_AGE) -> None:
+        """
+            Creates a new store of positions
+
+            :param matcher: matcher used to snap positions onto the route
+            :param max_age: number of seconds after which a position is not used anymore
+        """
+        self.matcher = matcher
+        self.max_age = max_age
+        self.received = 0
+        self.rejected = 0
+
+        # bib -> (distance from the start, timestamp of the ping, reception time)
+        self._positions: Dict[int, Tuple[float, float, float]] = {}
+
+    @classmethod
+    def create(cls, race: 'Race', max_age: float = DEFAULT_MAX_AGE) -> 'TrackerPositions':
+        """
+            Creates a new store of positions for the route of the given race
+
+            :param race: instance of the race
+            :param max_age: number of seconds after which a position is not used anymore
+            :return: a new instance of TrackerPositions
+        """
+        racepoints = np.concatenate([np.asarray(stagepoints, dtype=np.float64).reshape(-1, 4) for stagepoints in race.racepoints] or [np.empty((0, 4))])
+
+        return cls(RouteMatcher(racepoints), max_age)
+
+    def get_offset(self, bib: int) -> Optional[float]:
+        """
+            Gets the last known distance from the start of a team
+
+            :param bib: bib number of the team
+            :return: distance from the start (in meters), or None if there is no recent position
+        """
+        position = self._positions.get(bib)
+
+        if position is None or time.time() - position[2] > self.max_age:
+            return None
+
+        return position[0]
+
+    def update(self, ping: Ping) -> Optional[float]:
+        """
+            Snaps a position onto the route and stores it
+
+            Positions older than the last one of the team
+            and positions too far from the route are ignored.
+
+            :param ping: a position
+            :return: distance from the start of the position, or None if it has been ignored
+        """
+        self.received += 1
+        previous = self._positions.get(ping.bib)
+
+        if previous is not None and ping.timestamp < previous[1]:
+            self.rejected += 1
+            return None
+
+        offset = self.matcher.match(ping.lat, ping.lon, None if previous is None else previous[0])
+
+        if offset is None:
+            self.rejected += 1
+            return None
+
+        self._positions[ping.bib] = (offset, ping.timestamp, time.time())
+
+        return offset
+
+    def update_from_line(self, line: str) -> Optional[float]:
+        """
+            Reads a position from a line and stores it
+
+            :param line: line with the format bib,timestamp,latitude,longitude
+            :return: distance from the start of the position, or None if it has been ignored
+        """
+        try:
+            ping = parse_ping(line)
+        except ValueError:
+            self.received += 1
+            self.rejected += 1
+            return None
+
+        return self.update(ping)
+
+    def update_race_state(self, race_state: 'RaceState') -> None:
+        """
+            Replaces estimated covered distances with real positions
+
+            Only teams that are running and have a recent position are updated.
+
+            :param race_state: current state of the race
+        """
+        for team_state in race_state.teams:
+            if team_state.start_time is None or team_state.team_finished.get_value():
+                continue
+
+            offset = self.get_offset(team_state.bib_number)
+
+            if offset is not None:
+                team_state.covered_distance = offset
+
+
+class TrackerProtocol(asyncio.DatagramProtocol):
+
+    """
+        Receives positions from udp datagrams
+
+        A datagram can contain many positions, one per line.
+    """
+
+    def __init__(self, positions: TrackerPositions) -> None:
+        self.positions = positions
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        for line in data.decode(errors='replace').splitlines():
+            if line.strip():
+                self.positions.update_from_line(line)
+
+
+async def replay_file(positions: TrackerPositions, path: str, speed: float = 1) -> None:
+    """
+        Replays positions stored in a file
+
+        The file contains one position per line, sorted by timestamp.
+        Delays between positions are respected, divided by the given speed.
+
+        :param positions: store of positions
+        :param path: path to the file
+        :param speed: speed of the replay
+        :raises ValueError: if speed is negative
+    """
+    if speed <= 0:
+        raise ValueError('speed must be strictely positive')
+
+    logger = logging.getLogger(__name__)
+
+    first_timestamp: Optional[float] = None
+    start = time.time()
+
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+
+            try:
+                ping = parse_ping(line)
+            except ValueError as e:
+                logger.debug(e)
+                continue
+
+            if first_timestamp is None:
+                first_timestamp = ping.timestamp
+
+            delay = (ping.timestamp - first_timestamp) / speed - (time.time() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            positions.update(ping)
+
+    logger.info('End of the tracker replay (%d positions, %d rejected)', positions.received, positions.rejected)
+
+
+async def run_feed(positions: TrackerPositions, options: Dict[str, Any]) -> None:
+    """
+        Receives positions from the feed described by the given options
+
+        Options come from the field "tracker" of the configuration :
+        * udpPort: positions are received on this udp port (localhost)
+        * replayFile: positions are read from this file
+        * replaySpeed: speed of the replay
+
+        This coroutine runs until it is cancelled or until the end of the replay.
+
+        :param positions: store of positions
+        :param options: options of the feed
+    """
+    logger = logging.getLogger(__name__)
+
+    if 'replayFile' in options:
+        await replay_file(positions, options['replayFile'], options.get('replaySpeed', 1))
+        return
+
+    if 'udpPort' in options:
+        loop = asyncio.get_event_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: TrackerProtocol(positions), local_addr=('127.0.0.1', options['udpPort']))
+        logger.info('Waiting for tracker positions on udp port %d', options['udpPort'])
+
+        try:
+            await loop.create_future()
+        finally:
+            transport.close()
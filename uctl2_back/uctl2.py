@@ -2,20 +2,22 @@
     This module defines entry functions to start
     the broadcast
 """
+import argparse
 import asyncio
 import json
 import logging
 import os.path
 import signal
 import sys
-from typing import Any, List
+from typing import Dict, List, Optional
 
-import aiohttp
-
-from uctl2_back import uctl2_race
 from uctl2_back.config import Config
+from uctl2_back.control import ControlChannel
+from uctl2_back.diagnostics import Diagnostics
 from uctl2_back.exceptions import InvalidConfigError, RaceError
-from uctl2_back.notifier import Notifier
+from uctl2_back.race_feed import RaceFeed
+from uctl2_back.registry import DEFAULT_PORT, RaceRegistry
+from uctl2_back.shared_route import release_shared_routes
 from uctl2_back.uctl2_setup import read_race
 
 root_logger = logging.getLogger()
@@ -75,16 +77,8 @@ def load_config(path: str) -> Config:
         raise
 
 
-async def main(config, race, notifier: Notifier):
-    # Starting the race file broadcasting
-    uctl2_race.broadcast_running = True
-    async with aiohttp.ClientSession() as session:
-        await uctl2_race.broadcast_race(race, config, notifier, session)
-
-    await notifier.stop_notifier()
-
-
-def setup(config: Config, handlers: List[logging.Handler] = [], loop=asyncio.get_event_loop()) -> bool:
+def setup(config: Config, handlers: List[logging.Handler] = [], loop=asyncio.get_event_loop(), feed: Optional[RaceFeed] = None,
+          control: Optional[ControlChannel] = None, port: Optional[int] = DEFAULT_PORT) -> bool:
     """
         Initializes all required stuff before starting the broadcast
 
@@ -96,52 +90,148 @@ def setup(config: Config, handlers: List[logging.Handler] = [], loop=asyncio.get
         If race informations can not be read from the given config
         then this function will return False and the broadcast wont be started.
 
-        The function :func:`stop_broadcast` will be calledwhen the event loop receive
-        a SIGINT or SIGTERM signal. This function will stop the broadcast and
-        the notifier.
-
         :param config: instance to the loaded config
         :param handlers: logging handlers for all sub loggers
         :param loop: event loop
+        :param feed: feed that gives records of the race, the race file is read by default
+        :param control: channel used by the manager to send commands, could be None
+        :param port: port of the websockets server, None to broadcast events without server
         :return True if the race have been correctly read from the config file, false if not
     """
-    for handler in handlers:
-        root_logger.addHandler(handler)
+    configure_logging(handlers)
 
-    root_logger.setLevel(logging.INFO)
+    registry = RaceRegistry()
 
     try:
-        race = read_race(config)
+        registry.add('', config, read_race(config), feed, control)
     except RaceError as e:
         root_logger.error(e)
         return False
 
-    notifier = Notifier(race)
+    run_registry(registry, loop, port, config.metrics_port)
 
-    loop.add_signal_handler(signal.SIGINT, stop_broadcast)
-    loop.add_signal_handler(signal.SIGTERM, stop_broadcast)
+    return True
 
-    loop.run_until_complete(asyncio.gather(notifier.start_notifier(5680), notifier.broadcaster(), main(config, race, notifier)))
-    loop.close()
+
+def setup_races(configs: Dict[str, Config], handlers: List[logging.Handler] = [], loop=asyncio.get_event_loop(),
+                port: int = DEFAULT_PORT) -> bool:
+    """
+        Initializes the broadcast of several races in one event loop
+
+        A client chooses a race with the path of its websocket request (/<race id>),
+        the first race is sent to clients that do not give a race.
+        Metrics of all races are exported on the first metricsPort of the configurations.
+
+        :param configs: instances of loaded configs, by race id
+        :param handlers: logging handlers for all sub loggers
+        :param loop: event loop
+        :param port: port of the websockets server
+        :return True if all races have been correctly read from config files, false if not
+    """
+    configure_logging(handlers)
+
+    registry = RaceRegistry()
+
+    try:
+        for race_id, config in configs.items():
+            registry.add(race_id, config, read_race(config))
+    except RaceError as e:
+        root_logger.error(e)
+        release_shared_routes()
+        return False
+
+    run_registry(registry, loop, port, get_metrics_port(configs))
 
     return True
 
 
-def stop_broadcast(*args: Any) -> None:
+def get_metrics_port(configs: Dict[str, Config]) -> Optional[int]:
     """
-        Tells the broadcast loop to stop
+        Gets the port of the http server of metrics of several races
 
-        This function should be called when a signal
-        is received by the event loop (SIGINT, SIGTERM)
+        Metrics of all races are exported by one server : the port is taken
+        from the first configuration that sets one, other ports are ignored.
 
-        :param args: not used here
+        :param configs: instances of loaded configs, by race id
+        :return: port of the http server of metrics, None to not export metrics
     """
-    uctl2_race.broadcast_running = False
+    metrics_ports = {race_id: config.metrics_port for race_id, config in configs.items() if config.metrics_port is not None}
+
+    if len(metrics_ports) == 0:
+        return None
+
+    metrics_port = next(iter(metrics_ports.values()))
+    ignored = [race_id for race_id, port in metrics_ports.items() if not port == metrics_port]
+
+    if len(ignored) > 0:
+        root_logger.warning('Metrics of all races are exported on port %d, metricsPort of %s is ignored', metrics_port, ', '.join(ignored))
+
+    return metrics_port
+
+
+def configure_logging(handlers: List[logging.Handler]) -> None:
+    """
+        Adds handlers to the root logger
+
+        :param handlers: logging handlers for all sub loggers
+    """
+    for handler in handlers:
+        root_logger.addHandler(handler)
+
+    root_logger.setLevel(logging.INFO)
+
+
+def run_registry(registry: RaceRegistry, loop, port: Optional[int], metrics_port: Optional[int] = None) -> None:
+    """
+        Broadcasts races of a registry until they are stopped
+
+        Races are stopped when the event loop receives a SIGINT or SIGTERM signal.
+        SIGUSR1 and SIGUSR2 trigger diagnostics (see :mod:`uctl2_back.diagnostics`).
+
+        :param registry: registry of races to broadcast
+        :param loop: event loop
+        :param port: port of the websockets server, None to broadcast events without server
+        :param metrics_port: port of the http server of metrics, None to not export metrics
+    """
+    loop.add_signal_handler(signal.SIGINT, registry.stop)
+    loop.add_signal_handler(signal.SIGTERM, registry.stop)
+    Diagnostics(loop).register()
+
+    try:
+        loop.run_until_complete(registry.run(port, metrics_port))
+    finally:
+        release_shared_routes()
+
+    loop.close()
+
+
+def read_race_ids(paths: List[str]) -> Dict[str, str]:
+    """
+        Gives an identifier to each configuration file
+
+        The identifier of a race is the name of its configuration file
+        without extension (config/relay.json -> relay).
+
+        :param paths: paths of configuration files
+        :return: paths by race id
+        :raises ValueError: if two configuration files have the same name
+    """
+    race_ids: Dict[str, str] = {}
+
+    for path in paths:
+        race_id = os.path.splitext(os.path.basename(path))[0]
+
+        if race_id in race_ids:
+            raise ValueError('Two configuration files are named %s' % (race_id,))
+
+        race_ids[race_id] = path
+
+    return race_ids
 
 
 if __name__ == '__main__':
     if len(sys.argv) == 1:
-        print('Usage: uctl2.py path_to_config_file')
+        print('Usage: uctl2.py path_to_config_file [path_to_config_file ...] [--port PORT]')
         configName = 'config.json'
         if not os.path.isfile(configName) and create_default_config(configName):
             print('A default configuration %s has been created' % (configName,))
@@ -154,9 +244,20 @@ if __name__ == '__main__':
     root_logger.addHandler(ch)
     root_logger.setLevel(logging.INFO)
 
+    parser = argparse.ArgumentParser(description='Broadcasts one or several races')
+    parser.add_argument('configs', nargs='+', help='paths to configuration files, one per race')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port of the websockets server')
+    args = parser.parse_args()
+
     try:
-        config = load_config(os.path.abspath(sys.argv[1]))
+        paths = read_race_ids(args.configs)
+        configs = {race_id: load_config(os.path.abspath(path)) for race_id, path in paths.items()}
     except Exception:
         sys.exit(-1)
 
-    setup(config, [ch])
+    if len(configs) == 1:
+        success = setup(next(iter(configs.values())), [ch], port=args.port)
+    else:
+        success = setup_races(configs, [ch], port=args.port)
+
+    sys.exit(0 if success else -1)
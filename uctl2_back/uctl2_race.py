@@ -5,93 +5,263 @@
 import asyncio
 import logging
 import time
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, List, Optional, Union
 
 from uctl2_back import events
-from uctl2_back.race_state import RaceState, RaceStatus, read_race_state_from_file
+from uctl2_back.clock import Clock, Ticker, WallClock
+from uctl2_back.control import SET_TICK_STEP, Command, CommandQueue, ControlChannel
+from uctl2_back.race_feed import FileFeed, RaceFeed
+from uctl2_back.race_shards import ShardedStateReader
+from uctl2_back.race_state import RaceState, RaceStatus, read_race_state
 from uctl2_back.exceptions import RaceEmptyError
+from uctl2_back.metrics import Metrics
 
 if TYPE_CHECKING:
     from uctl2_back.config import Config
     from uctl2_back.notifier import Notifier
     from uctl2_back.race import Race
+    from uctl2_back.tracker import TrackerPositions
 
 REQUESTS_DELAY = 2
 
-broadcast_running = True
+# Number of loops between two logs of metrics
+METRICS_LOG_INTERVAL = 30
 
-async def broadcast_race(race: 'Race', config: 'Config', notifier: 'Notifier', session):
+async def broadcast_race(race: 'Race', config: 'Config', notifier: 'Notifier', session, tracker: Optional['TrackerPositions'] = None,
+                         clock: Optional[Clock] = None, feed: Optional[RaceFeed] = None, control: Optional[Union[ControlChannel, CommandQueue]] = None,
+                         stop: Optional[asyncio.Event] = None):
     """
         Broadcasts the state of the race from a race file
 
+        When a tracker is given, covered distances of teams
+        are computed with their gps positions if they are recent enough.
+
+        Records of the race are read from a feed, the race file by default.
+        Reads are scheduled every :const:`REQUESTS_DELAY` seconds whatever the duration
+        of a loop, or earlier when the feed receives new records. The elapsed time
+        between two reads is measured with the monotonic time of the clock.
+
+        While the race is running, covered distances are extrapolated between two reads
+        every config.extrapolation_period seconds with the last estimated speed of each team,
+        then teams are ranked again. Only ranks events are sent by these loops.
+
+        When the field stateShards of the configuration is greater than 1,
+        states of teams are computed by several worker processes.
+
+        Durations of each phase of a loop are added to the metrics of the notifier,
+        they are logged every :const:`METRICS_LOG_INTERVAL` loops.
+
         :param config: a valid configuration
+        :param tracker: positions received from team trackers, could be None
+        :param clock: clock used to measure and wait time, the real time by default
+        :param feed: feed that gives records of the race, could be None
+        :param control: channel used by the manager to send commands, could be None
+        :param stop: event that stops the broadcast once it is set, None to broadcast until the task is cancelled
     """
     logger = logging.getLogger(__name__)
 
-    loop_time = 0
-    current_time = time.time()
+    if clock is None:
+        clock = WallClock()
+
+    if feed is None:
+        feed = FileFeed(config)
+
+    ticker = Ticker(clock, REQUESTS_DELAY)
+
+    # Extrapolations of covered distances between two reads, could be disabled
+    motion_ticker = Ticker(clock, config.extrapolation_period) if config.extrapolation_period > 0 else None
+    read_due = True
+
+    # The last wait has been paced by the motion ticker, it is not used while the race is not running
+    extrapolating = False
 
     state: Optional[RaceState] = None
     first_loop = True
 
-    while broadcast_running:
-        loop_time = int(time.time() - current_time)
-        current_time = time.time()
+    # The speed has been changed by the manager, the new status has not been sent yet
+    status_pending = False
 
-        try:
-            state = read_race_state_from_file(config, loop_time, state)
-        except IOError as e:
-            logger.error(e)
-            break
-        except RaceEmptyError:
-            logger.info('Waiting for race')
-            await asyncio.sleep(REQUESTS_DELAY)
-            continue
+    metrics = notifier.metrics
+    loops = 0
 
-        # Stores async tasks that have to be executed
-        # before the end of the loop
-        tasks = []
+    # Team states are computed by worker processes for big races, workers read the race file themselves
+    reader = None
+    if config.state_shards > 1:
+        if isinstance(feed, FileFeed):
+            reader = ShardedStateReader(config, config.state_shards)
+        else:
+            logger.warning('Team states are computed in one process, workers can only read the race file')
 
-        if first_loop:
-            # Doing some computations that have only be done once
-            first_loop = False
+    try:
+        while stop is None or not stop.is_set():
+            # Commands are applied even when the race can not be read
+            if control is not None and apply_commands(control.receive(), race, config):
+                status_pending = True
 
-            # The distance of the race does not change during the broadcast
-            race.distance = int(state.distance * 1000)
+            if motion_ticker is None:
+                loop_time = ticker.tick()
+            else:
+                # Extrapolations start again : the idle time is not counted as skipped ticks
+                if not extrapolating:
+                    motion_ticker.resync()
 
-            # Initializes teams with default values (progression, position on the map, ...)
-            for team_state in state.teams:
-                race.add_team(team_state.bib_number, team_state.name)
+                # Covered distances are updated at each loop : the elapsed time is counted from the previous loop
+                loop_time = motion_ticker.tick()
 
-            # Sends the first race state (initial informations) to all connected clients
-            tasks.append(asyncio.ensure_future(notifier.broadcast_event(events.RACE_SETUP, race.serialize())))
+                if not read_due:
+                    if status_pending:
+                        status_pending = False
+                        await notifier.broadcast_event(events.RACE_STATUS, events.create_race_status_event(race)['payload'])
 
-        if state.status.has_changed:
-            logger.debug('New race status : %s', state.status)
-            race.status = state.status.get_value()
+                    with metrics.timer('extrapolation'):
+                        for team_state in state.teams:
+                            team_state.extrapolate(config.tick_step, loop_time)
 
-            if state.status == RaceStatus.RUNNING:
-                # Updates race starting time with the current timestamp
-                race.start_time = int(time.time())
+                        if tracker is not None:
+                            tracker.update_race_state(state)
 
-            event = {
-                'race': config.race_name,
-                'status': state.status.get_value(),
-                'startTime': race.start_time,
-                'tickStep': config.tick_step
-            }
+                        update_teams(race, state, notifier, metrics, new_state=False)
 
-            tasks.append(asyncio.ensure_future(notifier.broadcast_event(events.RACE_STATUS, event)))
+                    await notifier.broadcast_events()
 
-            if state.status == RaceStatus.WAITING:
-                race.reset_teams()
-                if len(tasks) > 0:
-                    await asyncio.wait(tasks)
+                    read_due = await wait_next_loop(feed, clock, ticker, motion_ticker)
+                    continue
+
+                ticker.tick()
+
+            if ticker.missed > 0:
+                metrics.increment('ticks_skipped', ticker.missed)
 
-                await asyncio.sleep(REQUESTS_DELAY)
+            loop_start = time.perf_counter()
 
+            try:
+                if reader is None:
+                    with metrics.timer('read'):
+                        records = feed.read_records()
+
+                    with metrics.timer('state'):
+                        state = read_race_state(records, config, loop_time, state)
+                else:
+                    with metrics.timer('state'):
+                        state = reader.read(loop_time, state)
+            except IOError as e:
+                logger.error(e)
+                break
+            except RaceEmptyError:
+                logger.info('Waiting for race')
+
+                if status_pending:
+                    status_pending = False
+                    await notifier.broadcast_event(events.RACE_STATUS, events.create_race_status_event(race)['payload'])
+
+                extrapolating = False
+                await feed.wait(clock, ticker.delay())
                 continue
 
+            # Stores async tasks that have to be executed
+            # before the end of the loop
+            tasks = []
+
+            if first_loop:
+                # Doing some computations that have only be done once
+                first_loop = False
+
+                # The distance of the race does not change during the broadcast
+                race.distance = int(state.distance * 1000)
+
+                # Initializes teams with default values (progression, position on the map, ...)
+                for team_state in state.teams:
+                    race.add_team(team_state.bib_number, team_state.name)
+
+                # Sends the first race state (initial informations) to all connected clients
+                tasks.append(asyncio.ensure_future(notifier.broadcast_event(events.RACE_SETUP, race.serialize())))
+
+            # The new speed is sent with the next status change or right now
+            if status_pending and not state.status.has_changed:
+                event = events.create_race_status_event(race)
+                tasks.append(asyncio.ensure_future(notifier.broadcast_event(events.RACE_STATUS, event['payload'])))
+
+            status_pending = False
+
+            if state.status.has_changed:
+                logger.debug('New race status : %s', state.status)
+                race.status = state.status.get_value()
+
+                if state.status == RaceStatus.RUNNING:
+                    # Updates race starting time with the current timestamp
+                    race.start_time = int(clock.time())
+
+                event = events.create_race_status_event(race)
+                tasks.append(asyncio.ensure_future(notifier.broadcast_event(events.RACE_STATUS, event['payload'])))
+
+                if state.status == RaceStatus.WAITING:
+                    race.reset_teams()
+                    if len(tasks) > 0:
+                        await asyncio.wait(tasks)
+
+                    extrapolating = False
+                    await feed.wait(clock, ticker.delay())
+
+                    continue
+
+            metrics.increment('rows_parsed', len(state.teams))
+
+            last_update = feed.last_update if reader is None else reader.last_update
+            if last_update is not None:
+                metrics.set_gauge('last_update', last_update)
+
+            if tracker is not None:
+                with metrics.timer('tracker'):
+                    tracker.update_race_state(state)
+
+            update_teams(race, state, notifier, metrics)
+
+            tasks.append(asyncio.ensure_future(notifier.broadcast_events()))
+
+            # Waits for all async tasks
+            if len(tasks) > 0:
+                with metrics.timer('queue_wait'):
+                    await asyncio.wait(tasks)
+
+            metrics.add_time('loop', time.perf_counter() - loop_start)
+
+            loops += 1
+            if loops % METRICS_LOG_INTERVAL == 0:
+                metrics.log(logger)
+
+            if state.status == RaceStatus.WAITING:
+                logger.info('Waiting for race')
+
+            if ticker.delay() == 0:
+                # The loop has lasted longer than the period, the next one starts right now
+                metrics.increment('tick_overruns')
+
+            extrapolating = motion_ticker is not None and state.status == RaceStatus.RUNNING
+            read_due = await wait_next_loop(feed, clock, ticker, motion_ticker if extrapolating else None)
+    finally:
+        if reader is not None:
+            reader.close()
+
+    logger.info('End of the broadcast')
+
+
+def update_teams(race: 'Race', state: RaceState, notifier: 'Notifier', metrics: Metrics, new_state: bool = True) -> None:
+    """
+        Ranks teams by their covered distance, updates them and creates their events
+
+        Events of teams that have finished a stage or the race are only created
+        for a state that has just been read.
+
+        :param race: instance of the race
+        :param state: current state of the race
+        :param notifier: notifier used to send events
+        :param metrics: metrics of the broadcast
+        :param new_state: False if covered distances of the state have only been extrapolated
+    """
+    # Phases of extrapolations are measured separately
+    phase_prefix = '' if new_state else 'extrapolation_'
+
+    with metrics.timer(phase_prefix + 'sort'):
         # Sorts teams by their covered distance, in reverse order
         # The first team in the list is the leader of the race
         sorted_team_states = sorted(state.teams, key=lambda team: team.covered_distance, reverse=True)
@@ -102,35 +272,78 @@ async def broadcast_race(race: 'Race', config: 'Config', notifier: 'Notifier', s
             team = race.teams[team_state.bib_number]
             team.rank = rank + 1
 
-        # @TODO compute those events only for a limited number of teams
+    with metrics.timer(phase_prefix + 'update'):
         for team_state in sorted_team_states:
-            team = race.teams[team_state.bib_number]
-            team.update_from_state(team_state)
+            race.teams[team_state.bib_number].update_from_state(team_state)
 
-            if team_state.current_stage.has_changed and len(team_state.intermediate_times) > 0 and not team_state.start_time is None:
-                elapsed_time = team_state.intermediate_times[team.current_time_index] - team_state.start_time
-                team.pace = int(elapsed_time.total_seconds() * 1000 / team.covered_distance)
+    events_start = time.perf_counter()
+    teams_changed = 0
 
-                event = events.create_team_end_stage_event(team, team_state)
-                notifier.broadcast_event_later(event)
+    # @TODO compute those events only for a limited number of teams
+    for team_state in sorted_team_states:
+        team = race.teams[team_state.bib_number]
+        stage_changed = new_state and team_state.current_stage.has_changed
 
-            if team_state.team_finished.has_changed and team_state.team_finished.get_value():
-                event = events.create_team_end_race_event(race, team_state)
-                notifier.broadcast_event_later(event)
+        if stage_changed or team_state.rank.has_changed:
+            teams_changed += 1
 
-            if team_state.rank.has_changed and team.rank < team.old_rank:
-                event = events.create_team_rank_event(team, race.teams.values())
-                notifier.broadcast_event_later(event)
+        if stage_changed and len(team_state.intermediate_times) > 0 and not team_state.start_time is None:
+            elapsed_time = team_state.intermediate_times[team.current_time_index] - team_state.start_time
+            team.pace = int(elapsed_time.total_seconds() * 1000 / team.covered_distance)
 
-        tasks.append(asyncio.ensure_future(notifier.broadcast_events()))
+            event = events.create_team_end_stage_event(team, team_state)
+            notifier.broadcast_event_later(event)
 
-        # Waits for all async tasks
-        if len(tasks) > 0:
-            await asyncio.wait(tasks)
+        if new_state and team_state.team_finished.has_changed and team_state.team_finished.get_value():
+            event = events.create_team_end_race_event(race, team_state)
+            notifier.broadcast_event_later(event)
 
-        if state.status == RaceStatus.WAITING:
-            logger.info('Waiting for race')
+        if team_state.rank.has_changed and team.rank < team.old_rank:
+            event = events.create_team_rank_event(team, race.teams.values())
+            notifier.broadcast_event_later(event)
 
-        await asyncio.sleep(REQUESTS_DELAY)
+    metrics.add_time(phase_prefix + 'events', time.perf_counter() - events_start)
+    metrics.increment('teams_changed', teams_changed)
 
-    logger.info('End of the broadcast')
+
+async def wait_next_loop(feed: RaceFeed, clock: Clock, ticker: Ticker, motion_ticker: Optional[Ticker] = None) -> bool:
+    """
+        Waits for the next read of the race file or the next extrapolation of covered distances
+
+        :param feed: feed that gives records of the race
+        :param clock: clock used to wait
+        :param ticker: ticker of reads
+        :param motion_ticker: ticker of extrapolations, None to wait for the next read
+        :return: True if the next loop has to read the race file
+    """
+    read_delay = max(0.0, ticker.remaining())
+
+    if motion_ticker is None:
+        await feed.wait(clock, read_delay)
+        return True
+
+    received = await feed.wait(clock, min(read_delay, motion_ticker.delay()))
+
+    return received or ticker.remaining() <= 0
+
+
+def apply_commands(commands: List[Command], race: 'Race', config: 'Config') -> bool:
+    """
+        Applies commands sent by the manager
+
+        :param commands: received commands
+        :param race: instance of the race
+        :param config: configuration of the broadcast
+        :return: True if the speed of the race has changed
+    """
+    logger = logging.getLogger(__name__)
+    tick_step_changed = False
+
+    for kind, value in commands:
+        if kind == SET_TICK_STEP and value > 0 and not value == race.tick_step:
+            logger.info('New tick step : %d', value)
+            config.tick_step = value
+            race.tick_step = value
+            tick_step_changed = True
+
+    return tick_step_changed
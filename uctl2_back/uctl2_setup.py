@@ -3,14 +3,18 @@
     from a configuration. It should be used before the broadcast
     starts and not during its execution.
 """
-from typing import List, Tuple
+import logging
+from typing import BinaryIO, List, Sequence, Tuple
 
 import gpxpy
-from haversine import haversine
+import numpy as np
+from lxml import etree
 
 from uctl2_back.config import Config
 from uctl2_back.exceptions import RaceError
-from uctl2_back.race import Race
+from uctl2_back.race import Race, compute_location_table
+from uctl2_back.route_cache import RouteArrays, compute_route_key, get_cache_path, read_route_cache, write_route_cache
+from uctl2_back.shared_route import attach_route, share_route
 from uctl2_back.stage import Stage
 
 # Type aliases
@@ -18,30 +22,127 @@ Point = Tuple[float, float, float]
 Points = List[Point]
 PointsWithDistance = List[Tuple[float, float, float, int]]
 
+# Initial number of points allocated by read_trackpoints
+TRACKPOINTS_INITIAL_CAPACITY = 4096
+
+# Tolerances (in meters) of each level of detail of the route, level 0 is the full resolution
+SIMPLIFICATION_TOLERANCES = (0, 2, 10, 30)
+
+# Mean earth radius in meters, same value as the one used by the haversine module
+EARTH_RADIUS = 6371008.8
+
+
+def build_route(points: np.ndarray, stages: List[Stage]) -> RouteArrays:
+    """
+        Processes trackpoints of a route
+
+        The result contains the following arrays :
+        * distances: distance from the start of each trackpoint
+        * racepoints: trackpoints with their truncated distance from the start (latitude, longitude, elevation, distance)
+        * stage_bounds: racepoints of the stage i are between stage_bounds[i][0] (included) and stage_bounds[i][1] (excluded)
+        * lod<k>_indices and lod<k>_offsets: racepoints kept by each level of detail k > 0,
+          the ones of the stage i are between lod<k>_offsets[i] and lod<k>_offsets[i + 1]
+        * locations: location table of the route, see :func:`compute_location_table`
+
+        :param points: array of trackpoints
+        :param stages: list of stages
+        :return: processed route
+    """
+    distances = compute_distances_array(points)
+    racepoints = np.column_stack((np.asarray(points, dtype=np.float64).reshape(-1, 3), np.trunc(distances)))
+    stage_bounds = compute_stage_bounds(racepoints[:, 3], stages)
+
+    route = {
+        'distances': distances,
+        'racepoints': racepoints,
+        'stage_bounds': stage_bounds,
+        'locations': compute_location_table(np.column_stack((racepoints[:, :3], distances)))
+    }
+
+    for level, tolerance in enumerate(SIMPLIFICATION_TOLERANCES):
+        if level == 0:
+            continue
+
+        # Stages are simplified separately to keep their boundaries
+        indices = [start + simplify_points(racepoints[start:end], tolerance) for start, end in stage_bounds]
+
+        lod_offsets = np.zeros(len(stages) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in indices], out=lod_offsets[1:])
+
+        route['lod%d_indices' % (level,)] = np.concatenate(indices or [np.empty(0, dtype=np.int64)])
+        route['lod%d_offsets' % (level,)] = lod_offsets
+
+    return route
+
+
+def compute_stage_bounds(distances: np.ndarray, stages: List[Stage]) -> np.ndarray:
+    """
+        Computes the range of racepoints of each stage
+
+        Racepoints are sorted by their distance from the start, so
+        the end of each stage is found with a binary search.
+
+        The stage i ends with the last racepoint whose distance from the start is lesser
+        or equal to the end of the stage (dst_from_start + length).
+        The first stage starts with the first racepoint, the stage i > 0 starts
+        with the last racepoint of the stage i - 1 : consecutive stages share
+        their boundary point, so the route has no gap between two stages.
+        A stage without racepoints only contains that boundary point.
+
+        :param distances: sorted distances from the start of each racepoint
+        :param stages: list of stages
+        :return: array of shape (number of stages, 2), each row is a range [start, end[ of racepoints
+    """
+    bounds = np.zeros((len(stages), 2), dtype=np.int64)
+
+    if len(stages) == 0:
+        return bounds
+
+    ends = [stage.dst_from_start + stage.length for stage in stages]
+    bounds[:, 1] = np.searchsorted(distances, ends, side='right')
+    bounds[1:, 0] = np.maximum(bounds[:-1, 1] - 1, 0)
+
+    return bounds
+
 
 def compute_distances(points: Points) -> PointsWithDistance:
     """
         Computes the distrance (in meters) from the start for each point
 
+        This function is a tuple view of :func:`compute_distances_array`,
+        distances are truncated to integers.
+
         :param points: a list of points (latitude, longitude, elevation)
         :return: a list of points with a distance from the start (latitude, longitude, elevation, distance)
     """
-    points_with_distances = []
-    total_distance = 0
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    distances = compute_distances_array(coords)
+
+    return [(lat, lng, alt, int(distance)) for (lat, lng, alt), distance in zip(coords.tolist(), distances.tolist())]
 
-    for i, point in enumerate(points):
-        lat, lng, alt = point
 
-        if i == 0:
-            points_with_distances.append((lat, lng, alt, 0))
-        else:
-            # Haversine function returns a distance in kilometers
-            # But we want a distance in meters
-            total_distance += haversine(coords_from_point(point), coords_from_point(points[i - 1])) * 1000
+def compute_distances_array(points: Sequence[Point]) -> np.ndarray:
+    """
+        Computes the distance (in meters) from the start for each point
 
-            points_with_distances.append((lat, lng, alt, int(total_distance)))
+        All segment lengths are computed at once with the haversine formula,
+        then they are summed to get the distance from the start.
+
+        :param points: a list or an array of points (latitude, longitude, elevation)
+        :return: an array of float64 containing the distance from the start of each point
+    """
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 3)[:, :2]
+    distances = np.zeros(len(coords), dtype=np.float64)
 
-    return points_with_distances
+    if len(coords) < 2:
+        return distances
+
+    lat, lng = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+
+    d = np.sin(np.diff(lat) * 0.5) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lng) * 0.5) ** 2
+    np.cumsum(2 * EARTH_RADIUS * np.arcsin(np.sqrt(d)), out=distances[1:])
+
+    return distances
 
 
 def coords_from_point(point: Point) -> Tuple[float, float]:
@@ -77,57 +178,183 @@ def extract_trackpoints(gpx: gpxpy.gpx.GPX) -> Points:
     return points
 
 
+def simplify_points(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+        Simplifies a line with the Douglas-Peucker algorithm
+
+        Coordinates are projected on a plane tangent to the first point, thus
+        the tolerance is a distance in meters. The first and the last points
+        are always kept.
+
+        :param points: array of points, each point starts with a latitude and a longitude
+        :param tolerance: maximum distance (in meters) between a removed point and the simplified line
+        :return: sorted indices of kept points
+    """
+    size = len(points)
+
+    if size <= 2 or tolerance <= 0:
+        return np.arange(size, dtype=np.int64)
+
+    lat, lng = np.radians(points[:, 0]), np.radians(points[:, 1])
+    xy = np.column_stack(((lng - lng[0]) * np.cos(lat[0]), lat - lat[0])) * EARTH_RADIUS
+
+    keep = np.zeros(size, dtype=bool)
+    keep[[0, -1]] = True
+
+    ranges = [(0, size - 1)]
+    while ranges:
+        first, last = ranges.pop()
+
+        if last - first < 2:
+            continue
+
+        origin, segment = xy[first], xy[last] - xy[first]
+        vectors = xy[first + 1:last] - origin
+        segment_length = segment.dot(segment)
+
+        # Distances between interior points and the segment [first, last]
+        if segment_length > 0:
+            t = np.clip(vectors.dot(segment) / segment_length, 0, 1)
+            vectors = vectors - t[:, np.newaxis] * segment
+
+        distances = np.hypot(vectors[:, 0], vectors[:, 1])
+        farthest = int(np.argmax(distances))
+
+        if distances[farthest] > tolerance:
+            farthest += first + 1
+            keep[farthest] = True
+            ranges.append((first, farthest))
+            ranges.append((farthest, last))
+
+    return np.flatnonzero(keep).astype(np.int64)
+
+
+def read_trackpoints(source: BinaryIO) -> np.ndarray:
+    """
+        Extracts trackpoints from a gpx file without building a gpx object tree
+
+        The file is read with a streaming parser : each trackpoint
+        is stored into a preallocated array and then removed from the tree.
+        Points of all tracks and segments are concatenated, in the same order
+        as :func:`extract_trackpoints`.
+
+        :param source: gpx file opened in binary mode
+        :return: an array of shape (n, 3) containing points (latitude, longitude, elevation)
+        :raises RaceError: if the file is not a valid xml file or if a trackpoint is not valid
+    """
+    points = np.empty((TRACKPOINTS_INITIAL_CAPACITY, 3), dtype=np.float64)
+    size = 0
+
+    try:
+        for _, trackpoint in etree.iterparse(source, events=('end',), tag='{*}trkpt'):
+            if size == len(points):
+                points = np.resize(points, (2 * size, 3))
+
+            # elevation is not required for a point, we need to check if it has one before use it
+            elevation = trackpoint.findtext('{*}ele')
+
+            try:
+                points[size] = (trackpoint.get('lat'), trackpoint.get('lon'), elevation if elevation else 0)
+            except (TypeError, ValueError):
+                raise RaceError('Invalid trackpoint at line %d' % (trackpoint.sourceline,))
+
+            size += 1
+
+            # Frees the processed element and its previous siblings
+            trackpoint.clear()
+            while trackpoint.getprevious() is not None:
+                del trackpoint.getparent()[0]
+    except etree.XMLSyntaxError as e:
+        raise RaceError(e)
+
+    return points[:size].copy()
+
+
 def group_racepoints(points: PointsWithDistance, stages: List[Stage]) -> List[PointsWithDistance]:
     """
         Groups racepoints by stages
 
-        A racepoints belongs to a stage when its distance from start
-        is between the distance from start of the stage and
-        its length.
+        Stages are delimited by :func:`compute_stage_bounds`.
+        The result contains slices of the given points : they
+        are views when points is an array.
 
-        :param points: a list of points with their distances (lat, long, ele, dist)
+        :param points: a list or an array of points with their distances (lat, long, ele, dist)
         :param stages: list of stages
+        :return: racepoints of each stage
+    """
+    distances = np.asarray(points, dtype=np.float64).reshape(-1, 4)[:, 3]
+
+    return [points[start:end] for start, end in compute_stage_bounds(distances, stages)]
+
+
+def read_cached_route(config: Config, key: str) -> RouteArrays:
     """
-    racepoints_with_stages = []
-    last_racepoint = 0
+        Reads the processed route from its cache file, or builds it
+
+        :param config: instance of Config class
+        :param key: key of the route
+        :return: arrays of the processed route
+        :raises RaceError: if the route file can not be read
+    """
+    logger = logging.getLogger(__name__)
+
+    cache_path = get_cache_path(config.route_file)
+    route = read_route_cache(cache_path, key)
 
-    # Race points are grouped by their stage
-    for stage in stages:
-        # d = distance from the start at the end of the stage
-        target_distance = stage.dst_from_start + stage.length
-        stagepoints = []
+    if route is not None:
+        return route
 
-        # rp = (lat, lon, alt, distance from start)
-        for i, racepoint in enumerate(points[last_racepoint:]):
-            if racepoint[3] <= target_distance:
-                stagepoints.append(racepoint)
-            else:
-                last_racepoint += i - 1 if i > 0 else 0
-                break
+    logger.info('Processing route %s', config.route_file)
 
-        racepoints_with_stages.append(stagepoints)
+    with open(config.route_file, 'rb') as route_file:
+        points = read_trackpoints(route_file)
 
-    return racepoints_with_stages
+    route = build_route(points, config.stages)
+
+    try:
+        write_route_cache(cache_path, key, route)
+    except OSError as e:
+        logger.warning('Unable to write route cache %s : %s', cache_path, e)
+
+    return route
 
 
 def read_race(config: Config) -> Race:
     """
         Reads informations about the race in the given config
 
+        The processed route is stored in a cache file next to the route file.
+        It is reused while the route file and the stages do not change.
+        It is also shared with other processes through shared memory : the first
+        process that reads the route creates the block, next ones attach it.
+
         :param config: instance of Config class
         :return: an instance of class Race which contains race informations
         :raises RaceError: if race informations can not be read from the given config
     """
+    logger = logging.getLogger(__name__)
+
     try:
-        with open(config.route_file, 'r') as route_file:
-            gpx = gpxpy.parse(route_file)
-            points = extract_trackpoints(gpx)
+        key = compute_route_key(config.route_file, config.stages, SIMPLIFICATION_TOLERANCES)
     except FileNotFoundError:
         raise RaceError('File does not exist')
-    except (gpxpy.gpx.GPXException, gpxpy.gpx.GPXXMLSyntaxException) as e:
-        raise RaceError(e)
 
-    racepoints = compute_distances(points)
-    racepoints_with_stages = group_racepoints(racepoints, config.stages)
+    route = attach_route(key)
+
+    if route is None:
+        route = read_cached_route(config, key)
+        shared_route = share_route(key, route)
+
+        if shared_route is not None:
+            route = shared_route
+
+    racepoints = route['racepoints']
+    racepoints_with_stages = [racepoints[start:end] for start, end in route['stage_bounds']]
+
+    # Simplified racepoints are only used by clients, positions are computed with all racepoints
+    levels = [racepoints_with_stages]
+    for level in range(1, len(SIMPLIFICATION_TOLERANCES)):
+        indices, offsets = route['lod%d_indices' % (level,)], route['lod%d_offsets' % (level,)]
+        levels.append([racepoints[indices[start:end]] for start, end in zip(offsets[:-1], offsets[1:])])
 
-    return Race(config.race_name, racepoints_with_stages, config.stages, config.tick_step)
+    return Race(config.race_name, racepoints_with_stages, config.stages, config.tick_step, levels, route['locations'])